@@ -0,0 +1,173 @@
+import json
+import os
+import re
+
+SOURCE_EXTENSIONS = [".c", ".cc", ".cpp", ".cxx", ".h", ".hh", ".hpp",
+                     ".ic", ".i", ".y", ".yy", ".l"]
+COMPILED_EXTENSIONS = [".c", ".cc", ".cpp", ".cxx"]
+TEST_FILE_RE = re.compile(r"^(?:mysql-test/suite/(?P<suite>[^/]+)|mysql-test)"
+                          r"/(?P<kind>t|r)/(?P<test>[^/,.]+?)"
+                          # <test>-master.opt, -slave.opt and -client.opt
+                          r"(?:-(?:master|slave|client)(?=\.opt$))?"
+                          r"(?:,[^/]*)?\.(?:test|result|rdiff|opt|cnf)$")
+SUITE_FILE_RE = re.compile(r"^mysql-test/suite/(?P<suite>[^/]+)/")
+
+# Source directories whose name differs from the related mtr suites
+COMPONENT_SUITES = {
+    "storage/innobase": "innodb",
+    "storage/perfschema": "perfschema",
+    "storage/rocksdb": "rocksdb",
+    "storage/tokudb": "tokudb",
+    "sql/rpl": "rpl",
+    "sql/binlog": "binlog",
+    "sql/log_event": "rpl",
+    "sql/auth": "auth_sec",
+    "sql/gis": "gis",
+    "sql/sys_vars": "sys_vars",
+}
+
+
+def changed_files(src_dir, series):
+    """Files changed on the topic compared to its series branch.
+
+    Includes the uncommitted and the untracked files of the worktree.
+    """
+    import git
+    g = git.Git(src_dir)
+    changed = set(g.diff("--name-only", series + "...HEAD").splitlines())
+    changed.update(g.diff("--name-only", "HEAD").splitlines())
+    changed.update(g.ls_files("--others", "--exclude-standard").splitlines())
+    return set(f for f in changed if f)
+
+
+def existing_suites(src_dir):
+    suite_dir = os.path.join(src_dir, "mysql-test", "suite")
+    suites = ["main"]
+    if os.path.isdir(suite_dir):
+        suites += sorted(d for d in os.listdir(suite_dir)
+                         if os.path.isdir(os.path.join(suite_dir, d)))
+    return suites
+
+
+def compiled_sources(build_dir, src_prefix="/work/src/"):
+    """Source files of the build, from compile_commands.json.
+
+    Returns None if the build doesn't have a compilation database.
+    """
+    path = os.path.join(build_dir, "compile_commands.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        entries = json.load(f)
+    return set(e["file"][len(src_prefix):] for e in entries
+               if e["file"].startswith(src_prefix))
+
+
+def include_users(src_dir, include):
+    """Tests of mysql-test sourcing the given include file (by name)"""
+    name = os.path.basename(include)
+    pattern = re.compile(r"^\s*-*source\s+(?:\S*/)?" + re.escape(name) + r"\b",
+                         re.MULTILINE | re.IGNORECASE)
+    users = set()
+    top = os.path.join(src_dir, "mysql-test")
+    for dirpath, _, files in os.walk(top):
+        for f in files:
+            if not f.endswith(".test"):
+                continue
+            path = os.path.join(dirpath, f)
+            try:
+                with open(path, errors="replace") as fh:
+                    if not pattern.search(fh.read()):
+                        continue
+            except IOError:
+                continue
+            test = test_of(os.path.relpath(path, src_dir))
+            if test:
+                users.add(test)
+    return users
+
+
+def test_of(path):
+    match = TEST_FILE_RE.match(path)
+    if not match:
+        return None
+    return (match.group("suite") or "main") + "." + match.group("test")
+
+
+def component_suites(path, suites):
+    """Suites related to the source file, based on its directory"""
+    for prefix, suite in sorted(COMPONENT_SUITES.items(),
+                                key=lambda i: -len(i[0])):
+        if path.startswith(prefix):
+            return [s for s in suites if s.startswith(suite)]
+    parts = path.split("/")
+    if len(parts) > 2 and parts[0] in ["storage", "plugin"]:
+        return [s for s in suites if s.startswith(parts[1])]
+    return []
+
+
+def select_tests(changed, suites, compiled=None, src_dir=None):
+    """Maps the changed files to mtr suites and tests.
+
+    Returns (suites, tests, reasons) where reasons explains the selection
+    of every changed file.
+    """
+    selected_suites = set()
+    selected_tests = set()
+    reasons = []
+
+    for path in sorted(changed):
+        ext = os.path.splitext(path)[1]
+        test = test_of(path)
+        suite_match = SUITE_FILE_RE.match(path)
+
+        if test:
+            selected_tests.add(test)
+            reasons.append(path + ": test " + test)
+        elif path.startswith("mysql-test/") and ext == ".inc":
+            users = include_users(src_dir, path) if src_dir else set()
+            if users:
+                selected_tests.update(users)
+                reasons.append(path + ": sourced by " + str(len(users)) +
+                               " test(s)")
+            elif suite_match:
+                selected_suites.add(suite_match.group("suite"))
+                reasons.append(path + ": include of suite " +
+                               suite_match.group("suite"))
+            else:
+                reasons.append(path + ": include not used by any test")
+        elif suite_match:
+            selected_suites.add(suite_match.group("suite"))
+            reasons.append(path + ": suite file of " +
+                           suite_match.group("suite"))
+        elif ext in SOURCE_EXTENSIONS:
+            if (compiled is not None and ext in COMPILED_EXTENSIONS and
+                    path not in compiled):
+                reasons.append(path + ": not compiled in this build")
+                continue
+            related = component_suites(path, suites) or ["main"]
+            selected_suites.update(related)
+            reasons.append(path + ": source, suites " + ",".join(related))
+        elif os.path.basename(path) == "CMakeLists.txt" or ext == ".cmake":
+            selected_suites.add("main")
+            reasons.append(path + ": build system, suite main")
+        else:
+            reasons.append(path + ": no related tests")
+
+    # Tests of fully selected suites don't have to be listed
+    selected_tests = set(t for t in selected_tests
+                         if t.split(".", 1)[0] not in selected_suites)
+    return sorted(selected_suites), sorted(selected_tests), reasons
+
+
+def mtr_selection_args(suites, tests):
+    """mtr arguments running the selection.
+
+    mtr can't combine whole suites with single tests of other suites, so
+    in that case the tests are widened to their suites.
+    """
+    if suites:
+        all_suites = sorted(set(suites) |
+                            set(t.split(".", 1)[0] for t in tests))
+        return ["--suite=" + ",".join(all_suites)]
+    return list(tests)
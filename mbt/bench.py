@@ -0,0 +1,142 @@
+import math
+import re
+
+from .mbt_error import MbtError
+
+DEFAULT_IMAGE = "severalnines/sysbench"
+DEFAULT_PROFILE = {"cpus": "4", "memory": "8g"}
+PERCENTILES = [50, 95, 99]
+METRICS = (["tps", "qps", "latency_avg"] +
+           ["latency_p" + str(p) for p in PERCENTILES])
+
+# Two sided 95% critical values of Student's t distribution, by degrees of
+# freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+        2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+        2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+        2.048, 2.045, 2.042]
+
+TPS_RE = re.compile(r"^\s*transactions:\s+\d+\s+\(([\d.]+) per sec\.\)")
+QPS_RE = re.compile(r"^\s*queries:\s+\d+\s+\(([\d.]+) per sec\.\)")
+AVG_RE = re.compile(r"^\s*avg:\s+([\d.]+)")
+HISTOGRAM_RE = re.compile(r"^\s*([\d.]+)\s+\|\s*\**\s+(\d+)\s*$")
+
+
+def parse_spec(spec):
+    """Parses a topic/series/variant/installation installation spec"""
+    parts = spec.split("/")
+    if len(parts) != 4 or not all(parts):
+        raise MbtError("Invalid installation spec (expected "
+                       "topic/series/variant/installation): " + spec)
+    return tuple(parts)
+
+
+def histogram_percentiles(histogram, percentiles=PERCENTILES):
+    """Percentiles of a sysbench latency histogram of (value, count)"""
+    total = sum(count for _, count in histogram)
+    result = {}
+    for p in percentiles:
+        threshold = total * p / 100.0
+        seen = 0
+        for value, count in sorted(histogram):
+            seen += count
+            if seen >= threshold:
+                result[p] = value
+                break
+    return result
+
+
+def parse_output(output):
+    """Parses the report of a sysbench run executed with --histogram.
+
+    Returns a dict with the tps, qps, average latency and the latency
+    percentiles (ms).
+    """
+    result = {}
+    histogram = []
+    for line in output.splitlines():
+        for key, regex in [("tps", TPS_RE), ("qps", QPS_RE),
+                           ("latency_avg", AVG_RE)]:
+            match = regex.match(line)
+            if match:
+                result[key] = float(match.group(1))
+        match = HISTOGRAM_RE.match(line)
+        if match:
+            histogram.append((float(match.group(1)), int(match.group(2))))
+    if "tps" not in result:
+        raise MbtError("Couldn't parse the sysbench output")
+    for p, value in histogram_percentiles(histogram).items():
+        result["latency_p" + str(p)] = value
+    return result
+
+
+def mean(values):
+    return sum(values) / len(values)
+
+
+def stdev(values):
+    if len(values) < 2:
+        return 0.0
+    m = mean(values)
+    return math.sqrt(sum((v - m) ** 2 for v in values) / (len(values) - 1))
+
+
+def t_critical(df):
+    if df < 1:
+        return float("inf")
+    return T_95[df - 1] if df <= len(T_95) else 1.96
+
+
+def confidence_interval(values):
+    """Half width of the 95% confidence interval of the mean"""
+    if len(values) < 2:
+        return float("inf")
+    return t_critical(len(values) - 1) * stdev(values) / math.sqrt(len(values))
+
+
+def difference_interval(a, b):
+    """Difference of the means (b - a) and the half width of its 95%
+    confidence interval, using Welch's t-test"""
+    diff = mean(b) - mean(a)
+    if len(a) < 2 or len(b) < 2:
+        return diff, float("inf")
+    va = stdev(a) ** 2 / len(a)
+    vb = stdev(b) ** 2 / len(b)
+    if va + vb == 0:
+        return diff, 0.0
+    df = (va + vb) ** 2 / (va ** 2 / (len(a) - 1) + vb ** 2 / (len(b) - 1))
+    return diff, t_critical(int(df)) * math.sqrt(va + vb)
+
+
+def run_order(repetitions):
+    """Alternates which side runs first, to spread out any drift"""
+    order = []
+    for i in range(repetitions):
+        order += ["a", "b"] if i % 2 == 0 else ["b", "a"]
+    return order
+
+
+def report(a_runs, b_runs):
+    """Report lines comparing the metrics of the runs of both sides"""
+    lines = [("METRIC", "A", "B", "CHANGE", "")]
+    for metric in METRICS:
+        a = [r[metric] for r in a_runs if metric in r]
+        b = [r[metric] for r in b_runs if metric in r]
+        if not a or not b:
+            continue
+        diff, width = difference_interval(a, b)
+        base = mean(a)
+        if base:
+            change = "{:+.1f}% ±{:.1f}%".format(
+                    diff / base * 100, width / base * 100)
+        else:
+            change = ""
+        significant = width < abs(diff)
+        lines.append((metric,
+                      "{:.2f} ±{:.2f}".format(mean(a),
+                                              confidence_interval(a)),
+                      "{:.2f} ±{:.2f}".format(mean(b),
+                                              confidence_interval(b)),
+                      change,
+                      "significant" if significant else ""))
+    return lines
@@ -0,0 +1,105 @@
+import os
+import subprocess
+
+
+def copy_build(src, dst):
+    """Copies a build directory, preserving the timestamps.
+
+    Reflinks are used where the filesystem supports them. Hardlinks would
+    be cheaper, but compilers and linkers rewrite outputs in place, which
+    would corrupt the source build.
+    """
+    os.makedirs(dst, exist_ok=True)
+    subprocess.check_call(["cp", "-a", "--reflink=auto",
+                           os.path.join(src, "."), dst])
+
+
+def changed_files(base_src, topic_src):
+    """Files of the topic differing from the base worktree.
+
+    Both worktrees belong to the same repository, so their HEADs can be
+    compared directly. Uncommitted changes of either side count as
+    changes, and so do the untracked files of the topic.
+    """
+    import git
+    topic = git.Git(topic_src)
+    base = git.Git(base_src)
+    base_head = base.rev_parse("HEAD")
+    changed = set(topic.diff("--name-only", base_head, "HEAD").splitlines())
+    changed.update(topic.diff("--name-only", "HEAD").splitlines())
+    changed.update(base.diff("--name-only", "HEAD").splitlines())
+    changed.update(topic.ls_files("--others",
+                                  "--exclude-standard").splitlines())
+    return changed
+
+
+def unchanged_files(base_src, topic_src, changed=None):
+    """Tracked files with the same content in both worktrees"""
+    import git
+    if changed is None:
+        changed = changed_files(base_src, topic_src)
+    return [f for f in git.Git(topic_src).ls_files().splitlines()
+            if f not in changed]
+
+
+def align_mtimes(base_src, topic_src, files):
+    """Gives the files of the topic the timestamps of the base worktree.
+
+    The copied build outputs are then newer than every unchanged source,
+    so only the changed files are rebuilt. Returns the number of files
+    updated.
+    """
+    count = 0
+    for f in files:
+        try:
+            st = os.stat(os.path.join(base_src, f), follow_symlinks=False)
+            os.utime(os.path.join(topic_src, f),
+                     ns=(st.st_atime_ns, st.st_mtime_ns),
+                     follow_symlinks=False)
+            count += 1
+        except OSError:
+            pass
+    return count
+
+
+def touch_files(topic_src, files):
+    """Sets the timestamps of the files to the current time.
+
+    Changed files may be older than the copied build outputs (e.g. when
+    the base was built after the topic was checked out), they have to be
+    newer to be rebuilt. Returns the number of files touched.
+    """
+    count = 0
+    for f in files:
+        try:
+            os.utime(os.path.join(topic_src, f), follow_symlinks=False)
+            count += 1
+        except OSError:
+            pass
+    return count
+
+
+def rewrite_cache_paths(build_dir, replacements):
+    """Replaces paths in the CMakeCache.txt of the build.
+
+    The build containers always see the sources and the build at
+    /work/src and /work/build, only host paths have to be rewritten.
+    Returns the number of lines changed.
+    """
+    path = os.path.join(build_dir, "CMakeCache.txt")
+    if not os.path.isfile(path):
+        return 0
+    with open(path) as f:
+        lines = f.readlines()
+    changed = 0
+    for i, line in enumerate(lines):
+        new = line
+        for old_path, new_path in replacements:
+            new = new.replace(old_path, new_path)
+        if new != line:
+            lines[i] = new
+            changed += 1
+    if changed:
+        with open(path, "w") as f:
+            f.writelines(lines)
+    return changed
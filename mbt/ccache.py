@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import re
+
+CONTAINER_DIR = "/work/ccache"
+KEY_FILE = "mbt-key.json"
+
+
+def cache_key(buildconf):
+    """Name of the cache directory used by a build config.
+
+    Builds can only share a cache if they use the same image and the same
+    compiler environment, so both are part of the key.
+    """
+    image = re.sub(r"[^A-Za-z0-9_.-]", "_", buildconf["image"])
+    env = json.dumps(buildconf["environment"], sort_keys=True)
+    return image + "-" + hashlib.sha1(env.encode()).hexdigest()[:10]
+
+
+def cache_dir(conf, buildconf):
+    """Returns the host directory of the cache, creating it if needed."""
+    directory = os.path.abspath(os.path.join(conf.ccache_dir,
+                                             cache_key(buildconf)))
+    key_file = os.path.join(directory, KEY_FILE)
+    if not os.path.isfile(key_file):
+        os.makedirs(directory, exist_ok=True)
+        with open(key_file, "w") as f:
+            json.dump({"image": buildconf["image"],
+                       "environment": buildconf["environment"]}, f)
+    return directory
+
+
+def cache_volumes(conf, buildconf):
+    if not conf.ccache_dir:
+        return []
+    return [cache_dir(conf, buildconf) + ":" + CONTAINER_DIR]
+
+
+def cache_environment(conf):
+    if not conf.ccache_dir:
+        return {}
+    return {"CCACHE_DIR": CONTAINER_DIR,
+            # Sources are always mounted to the same place, which makes
+            # the cache usable between topics
+            "CCACHE_BASEDIR": "/work",
+            "CCACHE_MAXSIZE": conf.ccache_max_size}
+
+
+def cmake_launcher_args(conf):
+    if not conf.ccache_dir:
+        return []
+    return ["-DCMAKE_C_COMPILER_LAUNCHER=ccache",
+            "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache"]
+
+
+def existing_caches(conf):
+    """Returns (directory, key data) pairs for every cache created so far"""
+    if not conf.ccache_dir or not os.path.isdir(conf.ccache_dir):
+        return []
+    caches = []
+    for name in sorted(os.listdir(conf.ccache_dir)):
+        key_file = os.path.join(conf.ccache_dir, name, KEY_FILE)
+        if os.path.isfile(key_file):
+            with open(key_file) as f:
+                caches.append((os.path.abspath(os.path.dirname(key_file)),
+                               json.load(f)))
+    return caches
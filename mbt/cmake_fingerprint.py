@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+FINGERPRINT_FILE = "mbt-cmake-fingerprint.json"
+
+
+def fingerprint_inputs(cmake_cmd, env, image):
+    """The inputs deciding whether a build dir has to be reconfigured"""
+    return {"cmake": list(cmake_cmd), "environment": dict(env),
+            "image": image}
+
+
+def fingerprint_hash(inputs):
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True)
+                        .encode()).hexdigest()
+
+
+def read_fingerprint(build_dir):
+    try:
+        with open(os.path.join(build_dir, FINGERPRINT_FILE)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def write_fingerprint(build_dir, inputs):
+    with open(os.path.join(build_dir, FINGERPRINT_FILE), "w") as f:
+        json.dump(inputs, f, indent=1, sort_keys=True)
+
+
+def remove_fingerprint(build_dir):
+    try:
+        os.remove(os.path.join(build_dir, FINGERPRINT_FILE))
+    except OSError:
+        pass
+
+
+def describe_args(old, new):
+    """Describes the differences between two cmake argument lists"""
+
+    def by_name(args):
+        return dict((a.split("=", 1)[0], a) if a.startswith("-D") else (a, a)
+                    for a in args)
+
+    old = by_name(old)
+    new = by_name(new)
+    changes = []
+    for name in sorted(set(old) | set(new)):
+        if name not in old:
+            changes.append("cmake argument added: " + new[name])
+        elif name not in new:
+            changes.append("cmake argument removed: " + old[name])
+        elif old[name] != new[name]:
+            changes.append("cmake argument changed: " + old[name] + " -> " +
+                           new[name].split("=", 1)[-1])
+    return changes
+
+
+def changed_inputs(build_dir, inputs):
+    """Lists why the build dir has to be reconfigured with inputs.
+
+    Returns an empty list if the previous configuration used the same
+    inputs and is still in place.
+    """
+    if not os.path.isfile(os.path.join(build_dir, "CMakeCache.txt")):
+        return ["the build directory isn't configured"]
+    old = read_fingerprint(build_dir)
+    if old is None:
+        return ["no fingerprint of the previous configuration"]
+
+    changes = describe_args(old.get("cmake", []), inputs["cmake"])
+    old_env = old.get("environment", {})
+    new_env = inputs["environment"]
+    for name in sorted(set(old_env) | set(new_env)):
+        if old_env.get(name) != new_env.get(name):
+            changes.append("environment changed: " + name + "=" +
+                           str(old_env.get(name)) + " -> " +
+                           str(new_env.get(name)))
+    if old.get("image") != inputs["image"]:
+        changes.append("image changed: " + str(old.get("image")) + " -> " +
+                       inputs["image"])
+    return changes
@@ -0,0 +1,52 @@
+import gzip
+import os
+import selectors
+import sys
+
+CHUNK_SIZE = 64 * 1024
+
+
+def open_log(log_path):
+    if log_path.endswith(".gz"):
+        # Fast compression level: the log shouldn't compete with the build
+        return gzip.open(log_path, "ab", compresslevel=1)
+    return open(log_path, "ab")
+
+
+def stream_output(proc, log_path=None, echo=True):
+    """Copies the stdout and stderr pipes of proc until both are closed.
+
+    Data is moved in raw chunks, as soon as it's available, without
+    waiting for newlines or decoding anything. The process blocks in the
+    selector while there's no output, so this doesn't spin.
+
+    If log_path is given, everything is also written to that file (gzip
+    compressed if it ends with .gz). With echo disabled, the output only
+    goes to the log.
+    """
+    targets = {}
+    if proc.stdout:
+        targets[proc.stdout.fileno()] = sys.stdout
+    if proc.stderr:
+        targets[proc.stderr.fileno()] = sys.stderr
+
+    log = open_log(log_path) if log_path else None
+    try:
+        with selectors.DefaultSelector() as sel:
+            for fd in targets:
+                sel.register(fd, selectors.EVENT_READ)
+            while sel.get_map():
+                for key, _ in sel.select():
+                    data = os.read(key.fd, CHUNK_SIZE)
+                    if not data:
+                        sel.unregister(key.fd)
+                        continue
+                    if echo:
+                        out = targets[key.fd]
+                        out.buffer.write(data)
+                        out.flush()
+                    if log:
+                        log.write(data)
+    finally:
+        if log:
+            log.close()
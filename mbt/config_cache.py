@@ -0,0 +1,90 @@
+import importlib
+import os
+import pickle
+import sys
+
+from . import mbt_configurator
+
+CACHE_VERSION = 1
+
+
+def cache_file(root_dir):
+    return os.path.join(root_dir, ".mbt", "config.cache")
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def evaluate_config(root_dir):
+    """Runs configure_mbt() from the workspace config.
+
+    Returns the configuration, and the list of files it depends on: the
+    config itself, every module imported while evaluating it, and the
+    configurator class which the cached object relies on.
+    """
+    before = set(sys.modules)
+    sys.modules.pop("mbt_config", None)
+    sys.path.insert(0, root_dir)
+    try:
+        conf = importlib.import_module("mbt_config").configure_mbt()
+    finally:
+        sys.path.remove(root_dir)
+
+    deps = set([os.path.join(root_dir, "mbt_config.py"),
+                mbt_configurator.__file__,
+                __file__])
+    for name in set(sys.modules) - before:
+        path = getattr(sys.modules[name], "__file__", None)
+        if path:
+            deps.add(path)
+    return conf, sorted(deps)
+
+
+def read_cache(path):
+    """Returns the cached configuration, or None if it's missing or stale"""
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+
+    if (not isinstance(data, dict) or
+            data.get("version") != CACHE_VERSION or
+            data.get("python") != sys.version):
+        return None
+    for dep, stamp in data["deps"].items():
+        if file_stamp(dep) != stamp:
+            return None
+    return data["config"]
+
+
+def write_cache(path, conf, deps):
+    data = {"version": CACHE_VERSION,
+            "python": sys.version,
+            "deps": {dep: file_stamp(dep) for dep in deps},
+            "config": conf}
+    try:
+        payload = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        # e.g. the config stores lambdas: it just won't be cached
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + "." + str(os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def load_config(root_dir):
+    """Returns the workspace configuration, using the cache if possible"""
+    path = cache_file(root_dir)
+    conf = read_cache(path)
+    if conf is None:
+        conf, deps = evaluate_config(root_dir)
+        write_cache(path, conf, deps)
+    return conf
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import shutil
+
+from .build_seed import copy_build
+
+SNAPSHOTS_DIR = os.path.join(".mbt", "snapshots")
+MYSQLD_PATHS = ["bin/mysqld-debug", "bin/mysqld",
+                "sql/mysqld-debug", "sql/mysqld"]
+# Files identifying a single server, which can't be shared between clones
+UNIQUE_FILES = ["auto.cnf"]
+
+
+def build_mysqld(build_dir):
+    """The mysqld binary of the build, or None if it isn't built"""
+    for path in MYSQLD_PATHS:
+        if os.path.isfile(os.path.join(build_dir, path)):
+            return os.path.join(build_dir, path)
+    return None
+
+
+def snapshot_key(commit, mysqld, init_args):
+    """Identifies the datadir initialized by a build.
+
+    The stat of the mysqld binary changes with every rebuild, which
+    invalidates the snapshots of earlier builds of the same commit.
+    """
+    st = os.stat(mysqld)
+    data = json.dumps([commit, st.st_size, st.st_mtime_ns, init_args])
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+def snapshot_dir(root_dir, series, variant):
+    return os.path.join(root_dir, SNAPSHOTS_DIR, series + "-" + variant)
+
+
+def find_snapshot(root_dir, series, variant, key):
+    path = os.path.join(snapshot_dir(root_dir, series, variant), key)
+    return path if os.path.isdir(path) else None
+
+
+def save_snapshot(root_dir, series, variant, key, datadir):
+    """Copies an initialized datadir into the snapshots.
+
+    Snapshots of the series / variant with other keys belong to earlier
+    builds, they are removed. Returns the path of the snapshot.
+    """
+    base = snapshot_dir(root_dir, series, variant)
+    path = os.path.join(base, key)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    copy_build(datadir, tmp_path)
+    for name in UNIQUE_FILES:
+        if os.path.isfile(os.path.join(tmp_path, name)):
+            os.remove(os.path.join(tmp_path, name))
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+    for name in os.listdir(base):
+        if name != key:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    return path
+
+
+def clone_snapshot(snapshot, datadir):
+    """Initializes the datadir with a copy of the snapshot.
+
+    Reflinks are used where the filesystem supports them, the server
+    writes its files in place, so hardlinks would corrupt the snapshot.
+    """
+    copy_build(snapshot, datadir)
@@ -0,0 +1,92 @@
+import functools
+import json
+import os
+
+from .mbt_error import MbtError
+from .warm_containers import docker
+
+LOCK_FILE = "mbt-images.lock"
+
+
+def config_images(config):
+    """The distinct images used by the build configs"""
+    return sorted(set(bc["image"] for bc in config.build_configs.values()))
+
+
+def repository(image):
+    """The image name without its tag or digest"""
+    name = image.split("@", 1)[0]
+    if ":" in name.rsplit("/", 1)[-1]:
+        name = name.rsplit(":", 1)[0]
+    return name
+
+
+def local_digest(image):
+    """The pinnable reference of a local image, or None if it's missing.
+
+    Pulled images are referenced by their repository digest, images only
+    built locally by their image ID.
+    """
+    result = docker("image", "inspect", "--format",
+                    "{{json .RepoDigests}} {{.Id}}", image)
+    if result.returncode != 0:
+        return None
+    digests, image_id = result.stdout.strip().rsplit(" ", 1)
+    for digest in json.loads(digests) or []:
+        if repository(digest) == repository(image):
+            return digest
+    return image_id
+
+
+def pull(image):
+    return docker("pull", "--quiet", image).returncode == 0
+
+
+def sync_image(image, pinned=None, update=False):
+    """Makes the image available locally, returns (reference, action).
+
+    A pinned image is only pulled (by its digest) when it's missing. With
+    update, or without a pin, the tag is pulled and resolved again.
+    """
+    if pinned and not update:
+        if local_digest(pinned):
+            return pinned, "verified"
+        if pull(pinned):
+            return pinned, "pulled pinned digest"
+        raise MbtError("Can't pull the pinned " + pinned)
+    pulled = pull(image)
+    reference = local_digest(image)
+    if reference is None:
+        raise MbtError("Can't pull " + image + ", and it doesn't exist "
+                       "locally")
+    return reference, "pulled" if pulled else "local image"
+
+
+def lock_path(root_dir):
+    return os.path.join(root_dir, LOCK_FILE)
+
+
+def read_lock(root_dir):
+    try:
+        with open(lock_path(root_dir)) as f:
+            return json.load(f)
+    except IOError:
+        return {}
+
+
+def write_lock(root_dir, pins):
+    path = lock_path(root_dir)
+    with open(path + ".tmp", "w") as f:
+        json.dump(pins, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+
+@functools.lru_cache(maxsize=None)
+def cached_lock(root_dir):
+    return read_lock(root_dir)
+
+
+def pinned_image(image, root_dir=None):
+    """The image reference pinned in the lock file of the workspace"""
+    return cached_lock(root_dir or os.getcwd()).get(image, image)
@@ -0,0 +1,113 @@
+import os
+import shutil
+
+LINK_CONFIG = "link.cnf"
+INCLUDE_LINE = "!include /work/install/etc/" + LINK_CONFIG + "\n"
+# Directories with the executables and the plugins of builds without the
+# bin/ and plugin_output_directory/ layout of 8.0
+EXECUTABLE_DIRS = ["sql", "client", "extra"]
+PLUGIN_DIRS = ["plugin", "storage"]
+LINKED_PATHS = ["bin", "scripts", os.path.join("lib", "plugin")]
+
+
+def has_bin_layout(build_dir):
+    """Whether the build collects its executables in bin/, like 8.0"""
+    return os.path.isdir(os.path.join(build_dir, "bin"))
+
+
+def executables(build_dir, dirs=EXECUTABLE_DIRS):
+    """The executables built in the directories, by name"""
+    found = {}
+    for d in dirs:
+        path = os.path.join(build_dir, d)
+        if not os.path.isdir(path):
+            continue
+        for name in sorted(os.listdir(path)):
+            f = os.path.join(path, name)
+            if "." not in name and os.path.isfile(f) and os.access(f,
+                                                                   os.X_OK):
+                found.setdefault(name, d + "/" + name)
+    return found
+
+
+def plugins(build_dir, dirs=PLUGIN_DIRS):
+    """The plugin libraries built in the directories, by name"""
+    found = {}
+    for d in dirs:
+        for root, subdirs, files in os.walk(os.path.join(build_dir, d)):
+            subdirs.sort()
+            for name in sorted(files):
+                if name.endswith(".so"):
+                    found.setdefault(name, os.path.relpath(
+                        os.path.join(root, name), build_dir))
+    return found
+
+
+def is_linked(install_dir):
+    return os.path.isfile(os.path.join(install_dir, "etc", LINK_CONFIG))
+
+
+def link_dir(path, links):
+    os.makedirs(path)
+    for name, target in links.items():
+        os.symlink("/work/build/" + target, os.path.join(path, name))
+
+
+def link_installation(build_dir, install_dir):
+    """Links the installation to the outputs of the build.
+
+    The links point to the paths of the build and the sources in the
+    containers, the server finds its messages, character sets and plugins
+    through the etc/link.cnf included by my.cnf. Returns the number of
+    links created.
+    """
+    remove_links(install_dir)
+    if has_bin_layout(build_dir):
+        os.symlink("/work/build/bin", os.path.join(install_dir, "bin"))
+        os.makedirs(os.path.join(install_dir, "lib"), exist_ok=True)
+        os.symlink("/work/build/plugin_output_directory",
+                   os.path.join(install_dir, "lib", "plugin"))
+        count = 2
+        settings = [("lc-messages-dir", "/work/build/share"),
+                    ("character-sets-dir", "/work/src/share/charsets")]
+    else:
+        bins = executables(build_dir)
+        libs = plugins(build_dir)
+        link_dir(os.path.join(install_dir, "bin"), bins)
+        link_dir(os.path.join(install_dir, "lib", "plugin"), libs)
+        os.symlink("/work/build/scripts", os.path.join(install_dir,
+                                                       "scripts"))
+        count = len(bins) + len(libs) + 1
+        settings = [("lc-messages-dir", "/work/build/sql/share"),
+                    ("character-sets-dir", "/work/src/sql/share/charsets")]
+    settings.append(("plugin-dir", "/work/install/lib/plugin"))
+
+    with open(os.path.join(install_dir, "etc", LINK_CONFIG), "w") as f:
+        f.write("[mysqld]\n")
+        f.writelines(k + "=" + v + "\n" for k, v in settings)
+    config_file = os.path.join(install_dir, "etc", "my.cnf")
+    with open(config_file) as f:
+        lines = f.readlines()
+    if INCLUDE_LINE not in lines:
+        with open(config_file, "a") as f:
+            f.write("\n" + INCLUDE_LINE)
+    return count
+
+
+def remove_links(install_dir):
+    """Turns a linked installation back into an empty one, keeping its
+    configuration and data"""
+    for path in LINKED_PATHS:
+        path = os.path.join(install_dir, path)
+        if os.path.islink(path):
+            os.unlink(path)
+        elif os.path.isdir(path):
+            shutil.rmtree(path)
+    if not is_linked(install_dir):
+        return
+    os.remove(os.path.join(install_dir, "etc", LINK_CONFIG))
+    config_file = os.path.join(install_dir, "etc", "my.cnf")
+    with open(config_file) as f:
+        lines = f.readlines()
+    with open(config_file, "w") as f:
+        f.writelines(line for line in lines if line != INCLUDE_LINE)
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+from fnmatch import fnmatchcase
+
+from .mbt_error import MbtError
+
+
+def select_builds(config, series_patterns, variant_patterns):
+    """Returns the (series, variant) pairs matching any of the globs.
+
+    The order follows the configuration: series in the order they were
+    added, variants sorted by name.
+    """
+
+    def matches(name, patterns):
+        return any(fnmatchcase(name, p) for p in patterns)
+
+    series = [s for s in config.series if matches(s, series_patterns)]
+    variants = sorted(v for v in config.build_configs
+                      if matches(v, variant_patterns))
+
+    if not series:
+        raise MbtError("No series matches: " + ", ".join(series_patterns))
+    if not variants:
+        raise MbtError("No variant matches: " + ", ".join(variant_patterns))
+
+    return [(s, v) for s in series for v in variants]
+
+
+class StatusTable:
+    """Live per-build status table.
+
+    On a terminal the table is redrawn in place every second, otherwise
+    a line is printed for every status change.
+    """
+
+    def __init__(self, names, out=None):
+        self.out = out or sys.stdout
+        self.names = list(names)
+        self.status = {n: "queued" for n in self.names}
+        self.started = {}
+        self.finished = {}
+        self.lock = threading.Lock()
+        self.live = self.out.isatty()
+        self.drawn = 0
+        self.stopped = threading.Event()
+        self.width = max(len(n) for n in self.names) if self.names else 0
+
+    def __enter__(self):
+        if self.live:
+            self.draw()
+            self.ticker = threading.Thread(target=self.tick, daemon=True)
+            self.ticker.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stopped.set()
+        if self.live:
+            self.ticker.join()
+        self.draw()
+
+    def tick(self):
+        while not self.stopped.wait(1):
+            self.draw()
+
+    def set(self, name, status, final=False):
+        with self.lock:
+            now = time.monotonic()
+            self.started.setdefault(name, now)
+            if final:
+                self.finished[name] = now
+            self.status[name] = status
+        if self.live:
+            self.draw()
+        else:
+            self.out.write(self.line(name) + "\n")
+            self.out.flush()
+
+    def elapsed(self, name):
+        if name not in self.started:
+            return ""
+        end = self.finished.get(name, time.monotonic())
+        secs = int(end - self.started[name])
+        return "{}:{:02d}".format(secs // 60, secs % 60)
+
+    def line(self, name):
+        return "{}  {:<12} {:>8}".format(name.ljust(self.width),
+                                         self.status[name],
+                                         self.elapsed(name))
+
+    def draw(self):
+        with self.lock:
+            lines = [self.line(n) for n in self.names]
+            if self.live and self.drawn:
+                self.out.write("\033[" + str(self.drawn) + "F")
+            self.out.write("".join(line + "\033[K\n" if self.live
+                                   else line + "\n" for line in lines))
+            self.drawn = len(lines)
+            self.out.flush()
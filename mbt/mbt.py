@@ -1,18 +1,39 @@
 
-import git
 import sys
 import os
 import shutil
 import subprocess
 import signal
 import tempfile
+import threading
+import time
+import json
 
 from .mbt_root import MbtRoot
+from .mbt_error import MbtError
 from .mbt_params import MbtParams
 from .directory_context import DirectoryContext
+from .config_cache import load_config
+from .command_output import open_log, stream_output
+from . import ccache
+from . import warm_containers
+from . import tmpfs
+from . import cmake_fingerprint
+from . import images
+from . import resource_profiles
+from . import ports
+from . import link_install
+from .resources import (host_cpu_count, host_memory, split_resources,
+                        docker_limit_args, memory_per_job, build_parallelism,
+                        has_parallelism_args, running_builds, running_build,
+                        MB)
 
 active_procs = []
 
+# git worktree add writes .git/config (branch tracking), concurrent runs
+# would fail on its lock
+worktree_lock = threading.Lock()
+
 
 def close_procs(s, f):
     for pid in active_procs:
@@ -20,39 +41,82 @@ def close_procs(s, f):
         # using SIGTERM as a docker workaround for now
         # Needs refactoing and docker stop
         os.kill(pid, signal.SIGTERM)
-    sys.exit(0)
+    sys.exit(128 + s)
 
 
 signal.signal(signal.SIGINT, close_procs)
 
 
 def import_config(root):
-    sys.path.append(root.root_dir())
-    from mbt_config import configure_mbt
-    return configure_mbt()
+    return load_config(root.root_dir())
 
 
 def repo_object(conf):
+    import git
     repo_dir = os.path.join(os.getcwd(), "master")
     return git.Repo.init(repo_dir)
 
 
-def add_worktree(repo, loc, branch, ref):
+def open_index():
+    from .workspace_index import WorkspaceIndex
+    return WorkspaceIndex(os.getcwd())
+
+
+def open_history():
+    from .telemetry import BuildHistory
+    return BuildHistory(os.getcwd())
+
+
+def record_invocation(command, topic, version, preset, started, rc,
+                      stats):
+    cpu_time, peak_memory = stats
+    with open_history() as history:
+        history.record(command, topic, version, preset,
+                       source_commit(topic, version), started,
+                       time.time() - started, cpu_time, peak_memory, rc)
+
+
+def run_with_telemetry(command, topic, version, preset, cmd, run,
+                       suffix=""):
+    """Runs run(cmd), with cmd wrapped to measure its resource usage.
+
+    The wall time, CPU time, peak memory and exit code of the command are
+    stored in the build history.
+    """
+    from . import telemetry
+    name = telemetry.stats_name(command, suffix)
+    started = time.time()
+    rc = run(telemetry.wrap_command(cmd, name))
+    record_invocation(command, topic, version, preset, started, rc,
+                      telemetry.read_stats(os.path.join("topics", topic,
+                                                        version+"-"+preset),
+                                           name))
+    return rc
+
+
+def add_worktree(repo, loc, branch, ref, jobs=1):
+    import git
     print("Adding worktree: "+loc)
-    if branch in repo.heads:
-        # TODO: sanity check the ref
-        # TODO: prune
-        repo.git.worktree("add", "../"+loc, branch)
-    else:
-        repo.git.worktree("add", "../"+loc, "-b", branch, ref)
+    with worktree_lock:
+        if branch in repo.heads:
+            # TODO: sanity check the ref
+            # TODO: prune
+            repo.git.worktree("add", "../"+loc, branch)
+        else:
+            repo.git.worktree("add", "../"+loc, "-b", branch, ref)
     if os.path.isfile(os.path.join(loc, ".gitmodules")):
-        print("... Initializing submodules")
+        print("Initializing submodules: "+loc)
         subrepo = git.Repo(loc)
-        for sm in subrepo.submodules:
-            sm.update("--init", "--recursive")
+        subrepo.git.submodule("update", "--init", "--recursive",
+                              "--jobs", str(jobs))
 
 
-def init_mbt(conf, repo):
+def init_mbt(repo, param_handler, args):
+    from .parallel import run_parallel, default_jobs
+    param_handler.add_int_arg("jobs", default_jobs())
+    ctx = param_handler.parse(args)
+    conf = param_handler.config
+
     with repo.config_writer() as cw:
         if conf.user_name:
             if not cw.has_section("user"):
@@ -70,42 +134,105 @@ def init_mbt(conf, repo):
             repo.create_remote(name, url)
         except Exception:
             pass
-        repo.remotes[name].fetch()
+
+    # A single fetch, concurrent ones would overwrite each other's
+    # FETCH_HEAD
+    print("Fetching remotes...")
+    if conf.remotes:
+        repo.git.fetch("--multiple", "--jobs=" + str(ctx.jobs),
+                       *conf.remotes)
+
+    series = [ver for ver in conf.series if not os.path.isdir("versions/"+ver)]
+    submodule_jobs = submodule_job_count(ctx.jobs, len(series))
+
+    def checkout_series(ver):
+        return lambda: add_worktree(repo, "versions/"+ver, ver,
+                                    "origin/"+ver, submodule_jobs)
+
     print("Checking out series...")
-    for ver in conf.series:
-        print(ver+"...")
-        if not os.path.isdir("versions/"+ver):
-            add_worktree(repo, "versions/"+ver, ver, "origin/"+ver)
+    run_parallel([(ver, checkout_series(ver)) for ver in series],
+                 ctx.jobs, "checkout")
+
+
+def submodule_job_count(jobs, worktrees):
+    """Submodule update jobs per worktree, so the worktrees checked out in
+    parallel share the jobs budget"""
+    return max(1, jobs // max(1, min(jobs, worktrees)))
 
 
 def create_topic(repo, param_handler, args):
+    from .parallel import run_parallel, default_jobs
     param_handler.add_topic_arg()
+    param_handler.add_int_arg("jobs", default_jobs())
     ctx = param_handler.parse(args)
 
-    for ver in param_handler.config.series:
+    submodule_jobs = submodule_job_count(ctx.jobs,
+                                         len(param_handler.config.series))
+
+    def checkout_series(ver):
         branch = "ps-"+ver+"-"+ctx.topic
-        add_worktree(repo, "topics/"+ctx.topic+"/"+ver, branch, ver)
+        return lambda: add_worktree(repo, "topics/"+ctx.topic+"/"+ver,
+                                    branch, ver, submodule_jobs)
+
+    try:
+        run_parallel([(ver, checkout_series(ver))
+                      for ver in param_handler.config.series],
+                     ctx.jobs, "checkout")
+    finally:
+        with open_index() as index:
+            for ver in param_handler.config.series:
+                if os.path.isdir("topics/"+ctx.topic+"/"+ver):
+                    index.update("checkout", ctx.topic, ver, state="created")
+
+
+def command_log_path(conf, name, topic, version, preset):
+    if not conf.log_dir:
+        return None
+    os.makedirs(conf.log_dir, exist_ok=True)
+    return os.path.join(conf.log_dir,
+                        time.strftime("%Y%m%d-%H%M%S") + "-" +
+                        "-".join([name, topic, version, preset]) +
+                        ".log.gz")
+
+
+def run_command(args, replace_curr, log_path=None, echo=True):
+    if echo:
+        print(args)
+    if log_path:
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with open_log(log_path) as log:
+            log.write((str(args) + "\n").encode())
+
+    if replace_curr and not log_path:
+        os.execvp(args[0], args)
 
+    # Without replacing the current process, it's kept interactive only when
+    # the output goes to the terminal
+    cmd = subprocess.Popen(args,
+                           stdin=None if echo else subprocess.DEVNULL,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE)
+    pid = cmd.pid
+    active_procs.append(pid)
+    stream_output(cmd, log_path, echo)
+    cmd.wait()
+    active_procs.remove(pid)
+    return cmd.returncode
 
-def run_command(args, replace_curr):
-    print(args)
-    if replace_curr:
-        os.execvp(args[0], args)
-    else:
-        cmd = subprocess.Popen(args,
-                               stdout=subprocess.PIPE,
-                               universal_newlines=True)
-        pid = cmd.pid
-        active_procs.append(pid)
-        while cmd.poll() is None:
-            sys.stdout.write(cmd.stdout.readline())
-        sys.stdout.write(cmd.stdout.read())
-        active_procs.remove(pid)
 
+def interactive(echo):
+    """Whether a command not replacing mbt runs in the terminal.
 
-def exec_docker_command(container, cmd, replace_curr=True, docker_args=[]):
-    if replace_curr:
-        docker_args += ["-t"]
+    These get a tty too, so a Ctrl-C reaches the command in the container
+    (docker exec doesn't forward signals).
+    """
+    return echo and sys.stdin.isatty() and sys.stdout.isatty()
+
+
+def exec_docker_command(container, cmd, replace_curr=True, docker_args=[],
+                        log_path=None, echo=True):
+    if replace_curr or interactive(echo):
+        docker_args = docker_args + ["-t"]
 
     docker_args = (["/usr/bin/docker", "exec", "--privileged", "-i"] +
                    docker_args +
@@ -113,11 +240,10 @@ def exec_docker_command(container, cmd, replace_curr=True, docker_args=[]):
                    cmd
                    )
 
-    run_command(docker_args, replace_curr)
+    return run_command(docker_args, replace_curr, log_path, echo)
 
 
-def run_docker_command(img, volumes, work_dir, env, args, replace_curr=True,
-                       docker_args=[]):
+def docker_volume_args(volumes):
 
     def proc_volume_arg(v):
         curr_dir = os.getcwd()
@@ -129,16 +255,26 @@ def run_docker_command(img, volumes, work_dir, env, args, replace_curr=True,
             a[1] = "/work/" + a[1]
         return "-v" + a[0] + "/:" + a[1]
 
-    volumes = list(map(proc_volume_arg, volumes))
+    return list(map(proc_volume_arg, volumes))
+
+
+def docker_env_args(env):
 
     def proc_env_arg(v):
         return ["-e", v[0]+"="+v[1]]
 
     base_env = {"DISPLAY": os.environ["DISPLAY"]}
-    env = sum(list(map(proc_env_arg, {**env, **base_env}.items())), [])
+    return sum(list(map(proc_env_arg, {**env, **base_env}.items())), [])
 
-    if replace_curr:
-        docker_args += ["-t"]
+
+def run_docker_command(img, volumes, work_dir, env, args, replace_curr=True,
+                       docker_args=[], log_path=None, echo=True):
+    img = images.pinned_image(img)
+    volumes = docker_volume_args(volumes)
+    env = docker_env_args(env)
+
+    if replace_curr or interactive(echo):
+        docker_args = docker_args + ["-t"]
 
     docker_args = (["/usr/bin/docker", "run", "--privileged", "--rm", "-i", ] +
                    volumes +
@@ -150,10 +286,46 @@ def run_docker_command(img, volumes, work_dir, env, args, replace_curr=True,
                    args
                    )
 
-    run_command(docker_args, replace_curr)
-
-
-def run_docker_build_command(conf, topic, version, preset, work_dir, args):
+    return run_command(docker_args, replace_curr, log_path, echo)
+
+
+def ensure_warm_container(conf, name, img, volumes, env):
+    """Starts the named warm container, unless it's already running.
+
+    Containers started with a different image or build environment are
+    recreated.
+    """
+    img = images.pinned_image(img)
+    fingerprint = warm_containers.fingerprint(warm_containers.image_id(img),
+                                              volumes, env)
+    state = warm_containers.container_state(name)
+    if state is not None and state != (True, fingerprint):
+        if state[0]:
+            print("Image or build config changed, recreating " + name)
+        warm_containers.stop_container(name)
+        state = None
+
+    if state is None:
+        print("Starting warm container " + name)
+        subprocess.check_call(
+                ["/usr/bin/docker", "run", "-d", "--privileged", "--rm",
+                 "--name", name,
+                 "--label", warm_containers.LABEL + "=1",
+                 "--label",
+                 warm_containers.FINGERPRINT_LABEL + "=" + fingerprint] +
+                docker_volume_args(volumes) +
+                docker_env_args(env) +
+                ["--network", "mbt"] +
+                [img] +
+                ["sh", "-c",
+                 warm_containers.idle_loop(conf.warm_idle_timeout)],
+                stdout=subprocess.DEVNULL)
+    return name
+
+
+def run_docker_build_command(conf, topic, version, preset, work_dir, args,
+                             replace_curr=True, docker_args=[],
+                             log_path=None, echo=True):
     src_dir = os.path.join("topics", topic, version)
     build_dir = os.path.join("topics", topic, version+"-"+preset)
 
@@ -169,18 +341,40 @@ def run_docker_build_command(conf, topic, version, preset, work_dir, args):
                # Required for git subtree to work correctly,
                # as it uses absolute paths, and needs the master dir
                os.path.join(os.getcwd(), "master")]
-
-    run_docker_command(
+    volumes += ccache.cache_volumes(conf, buildconf)
+    env = {**buildconf["environment"], **ccache.cache_environment(conf)}
+
+    # Commands with custom docker arguments (e.g. resource limits) need
+    # their own container
+    if conf.warm_idle_timeout and not docker_args:
+        container = ensure_warm_container(
+                conf,
+                warm_containers.container_name(topic, version, preset),
+                buildconf["image"],
+                volumes,
+                env)
+        return exec_docker_command(container,
+                                   warm_containers.wrap_command(args),
+                                   replace_curr,
+                                   ["-w", work_dir],
+                                   log_path,
+                                   echo)
+
+    return run_docker_command(
             buildconf["image"],
             volumes,
             work_dir,
-            buildconf["environment"],
-            args
+            env,
+            args,
+            replace_curr,
+            docker_args,
+            log_path,
+            echo
             )
 
 
 def run_installed_command(conf, topic, version, preset, install_tag, cmd,
-                          docker_args=[], replace_current=False):
+                          docker_args=[], replace_current=True):
     src_dir = os.path.join("topics", topic, version)
     build_dir = os.path.join("topics", topic, version+"-"+preset)
 
@@ -198,13 +392,13 @@ def run_installed_command(conf, topic, version, preset, install_tag, cmd,
                # as it uses absolute paths, and needs the master dir
                os.path.join(os.getcwd(), "master")]
 
-    run_docker_command(
+    return run_docker_command(
             buildconf["image"],
             volumes,
             "/work/install",
             buildconf["environment"],
             cmd,
-            True,
+            replace_current,
             docker_args
             )
 
@@ -222,6 +416,7 @@ def exec_installed_command(conf, topic, version, preset, install_tag, cmd,
 
 
 def run_pull(repo, param_handler, args):
+    import git
     param_handler.add_remote_arg()
     ctx = param_handler.parse(args)
 
@@ -234,6 +429,7 @@ def run_pull(repo, param_handler, args):
 
 
 def run_push(config):
+    import git
     print("Pushing...")
     for ver in config.series:
         print(" "+ver+"...")
@@ -277,12 +473,23 @@ def detect_mysqld_executable(topic, version, preset):
     raise Exception("Couldn't find mysqld executable")
 
 
+def record_installation(ctx, state):
+    port = installation_port(ctx.topic, ctx.series, ctx.variant,
+                             ctx.installation)
+    with open_index() as index:
+        index.update("installation", ctx.topic, ctx.series, ctx.variant,
+                     ctx.installation, state=state, port=port)
+
+
 def install_build(param_handler, args):
     param_handler.add_topic_arg()
     param_handler.add_series_arg()
     param_handler.add_variant_arg()
     param_handler.add_installation_arg()
     param_handler.add_boolean_arg("init")
+    param_handler.add_boolean_arg("from-snapshot")
+    param_handler.add_boolean_arg("link")
+    param_handler.add_string_arg("tmpfs")
     param_handler.add_remaining_args()
     ctx = param_handler.parse(args)
 
@@ -300,47 +507,87 @@ def install_build(param_handler, args):
 
     config_file = os.path.join(install_dir, "etc", "my.cnf")
     if not os.path.isfile(config_file):
+        with open_index() as index:
+            port = index.reserve_port(ctx.topic, ctx.series, ctx.variant,
+                                      ctx.installation, ports.allocate_port)
+        print("Allocated port " + str(port))
 
         my_cnf_content = """
 [client]
-port=10000
+port={port}
 socket=/work/install/var/mysql.sock
 user=root
 [mysqld]
 basedir=/work/install/
 datadir=/work/install/data
 tmpdir=/work/install/tmp
-port=10000
+port={port}
 socket=/work/install/var/mysql.sock
 pid-file=/work/install/var/mysql.pid
 console
 server-id=1
 max_connections=1000
-        """
+        """.format(port=port)
 
         config = open(os.path.join(install_dir, "etc", "my.cnf"), "w")
         config.write(my_cnf_content)
         config.close()
 
-    buildconf = param_handler.config.build_configs[ctx.variant]
-
-    volumes = [src_dir+":src",
-               build_dir+":build",
-               install_dir+":install",
-               # Required for git subtree to work correctly,
-               # as it uses absolute paths, and needs the master dir
-               os.path.join(os.getcwd(), "master")]
+    conf = param_handler.config
+    buildconf = conf.build_configs[ctx.variant]
 
-    run_docker_command(
-            buildconf["image"],
-            volumes,
-            "/work/build",
-            buildconf["environment"],
-            [detect_build_tool(ctx.topic, ctx.series, ctx.variant), "install"],
-            False
-            )
-
-    if ctx.init:
+    if ctx.link:
+        count = link_install.link_installation(build_dir, install_dir)
+        print("Linked the installation to the build (" + str(count) +
+              " links)")
+        record_installation(ctx, "linked")
+    else:
+        # make install would write through the links into the build
+        if link_install.is_linked(install_dir):
+            link_install.remove_links(install_dir)
+
+        volumes = [src_dir+":src",
+                   build_dir+":build",
+                   install_dir+":install",
+                   # Required for git subtree to work correctly,
+                   # as it uses absolute paths, and needs the master dir
+                   os.path.join(os.getcwd(), "master")]
+        volumes += ccache.cache_volumes(conf, buildconf)
+
+        rc = run_with_telemetry(
+                "install", ctx.topic, ctx.series, ctx.variant,
+                [detect_build_tool(ctx.topic, ctx.series, ctx.variant),
+                 "install"],
+                lambda cmd: run_docker_command(
+                    buildconf["image"],
+                    volumes,
+                    "/work/build",
+                    {**buildconf["environment"],
+                     **ccache.cache_environment(conf)},
+                    cmd,
+                    False
+                    ))
+        record_installation(ctx, "installed" if rc == 0 else "install-failed")
+        if rc:
+            sys.exit(rc)
+
+    snapshot_key = None
+    if ctx.from_snapshot:
+        from . import datadir_snapshots
+        snapshot_key = datadir_snapshot_key(ctx, build_dir)
+        snapshot = datadir_snapshots.find_snapshot(os.getcwd(), ctx.series,
+                                                   ctx.variant, snapshot_key)
+        if snapshot:
+            data_dir = os.path.join(install_dir, "data")
+            if os.path.isdir(data_dir) and os.listdir(data_dir):
+                raise MbtError("The installation is already initialized: " +
+                               data_dir)
+            print("Cloning the datadir from " + snapshot)
+            datadir_snapshots.clone_snapshot(snapshot, data_dir)
+            record_installation(ctx, "initialized")
+            return
+
+    if ctx.init or ctx.from_snapshot:
 
         if ctx.series == "5.7" or ctx.series == "8.0":
             mysql_exe = detect_mysqld_executable(ctx.topic,
@@ -354,15 +601,63 @@ max_connections=1000
             init_cmd = ["./scripts/mysql_install_db",
                         "--defaults-file=/work/install/etc/my.cnf",
                         ]
+            if link_install.is_linked(install_dir):
+                init_cmd += ["--srcdir=/work/src", "--builddir=/work/build"]
 
-        run_installed_command(
+        init_cmd, docker_args = installed_tmpfs_command(
+                conf, ctx, init_cmd + ctx.remaining_args)
+        rc = run_installed_command(
                 param_handler.config,
                 ctx.topic,
                 ctx.series,
                 ctx.variant,
                 ctx.installation,
-                init_cmd + ctx.remaining_args
+                init_cmd,
+                docker_args,
+                replace_current=False
                 )
+        record_installation(ctx, "initialized" if rc == 0 else "init-failed")
+        if rc:
+            sys.exit(rc)
+
+    if snapshot_key:
+        path = datadir_snapshots.save_snapshot(
+                os.getcwd(), ctx.series, ctx.variant, snapshot_key,
+                os.path.join(install_dir, "data"))
+        print("Saved the datadir snapshot " + path)
+
+
+def datadir_snapshot_key(ctx, build_dir):
+    """The key of the snapshot initialized by the current build"""
+    from . import datadir_snapshots
+    mysqld = datadir_snapshots.build_mysqld(build_dir)
+    if mysqld is None:
+        raise MbtError("Couldn't find the mysqld executable of " + build_dir)
+    return datadir_snapshots.snapshot_key(
+            source_commit(ctx.topic, ctx.series), mysqld, ctx.remaining_args)
+
+
+def add_resource_args(param_handler):
+    param_handler.add_string_arg("profile")
+    param_handler.add_string_arg("cpus")
+    param_handler.add_string_arg("cpuset")
+    param_handler.add_int_arg("numa-node")
+    param_handler.add_string_arg("memory")
+    param_handler.add_boolean_arg("hugepages")
+
+
+def resource_profile(conf, ctx, buildconf=None, default=None):
+    """The resource limits of a server, printed for the record"""
+    profile = resource_profiles.resolve_profile(
+            conf,
+            buildconf or conf.build_configs[ctx.variant],
+            ctx.profile,
+            {"cpus": ctx.cpus, "cpuset": ctx.cpuset,
+             "numa_node": ctx.numa_node, "memory": ctx.memory,
+             "hugepages": ctx.hugepages or None},
+            default or resource_profiles.DEFAULT_PROFILE)
+    print("Resource limits: " + resource_profiles.describe(profile))
+    return profile
 
 
 def run_mysqld(param_handler, args):
@@ -372,9 +667,12 @@ def run_mysqld(param_handler, args):
     param_handler.add_installation_arg()
     param_handler.add_boolean_arg("valgrind")
     param_handler.add_boolean_arg("massif")
-    param_handler.add_int_arg("port", 10000)
+    param_handler.add_int_arg("port")
+    param_handler.add_string_arg("tmpfs")
+    add_resource_args(param_handler)
     param_handler.add_remaining_args()
     ctx = param_handler.parse(args)
+    profile = resource_profile(param_handler.config, ctx)
 
     container_name = ("mysqld-"+ctx.topic +
                       "-"+ctx.series +
@@ -391,21 +689,33 @@ def run_mysqld(param_handler, args):
                        "--massif-out-file=/work/install/massif.out"]
                       + mysqld_cmd)
 
-    port = str(ctx.port)
+    port = installation_port(ctx.topic, ctx.series, ctx.variant,
+                             ctx.installation)
+    port_args = []
+    if ctx.port is not None and ctx.port != port:
+        port_args = ["--port=" + str(ctx.port)]
+        port = ctx.port
+    port = str(port)
 
+    mysqld_cmd, tmpfs_args = installed_tmpfs_command(
+            param_handler.config, ctx,
+            mysqld_cmd +
+            ["--defaults-file=/work/install/etc/my.cnf"]
+            + port_args
+            + resource_profiles.mysqld_args(profile)
+            + ctx.remaining_args)
     run_installed_command(
             param_handler.config,
             ctx.topic,
             ctx.series,
             ctx.variant,
             ctx.installation,
-            mysqld_cmd +
-            ["--defaults-file=/work/install/etc/my.cnf"]
-            + ctx.remaining_args,
+            mysqld_cmd,
             ["--expose="+port,
              "-p="+port+":"+port,
-             "--name", container_name,
-             "--cpus=1"]
+             "--name", container_name]
+            + resource_profiles.docker_args(profile)
+            + tmpfs_args
             )
 
 
@@ -429,6 +739,145 @@ def exec_local_mysql(param_handler, args):
             )
 
 
+def installation_port(topic, version, preset, install_tag):
+    """The server port configured in the my.cnf of the installation"""
+    return ports.read_port(os.path.join("topics", topic,
+                                        version+"-"+preset+"-inst-" +
+                                        install_tag,
+                                        "etc", "my.cnf"))
+
+
+def start_bench_server(conf, spec, name, limits, server_args):
+    """Starts the server of the installation in the background, and waits
+    until it accepts connections"""
+    topic, series, variant, installation = spec
+    rc = run_installed_command(
+            conf, topic, series, variant, installation,
+            [detect_mysqld_executable(topic, series, variant),
+             "--defaults-file=/work/install/etc/my.cnf"] + server_args,
+            ["-d", "--name", name] + limits,
+            replace_current=False)
+    if rc:
+        raise MbtError("Couldn't start " + "/".join(spec))
+
+    client = ["--defaults-file=/work/install/etc/my.cnf"]
+    for _ in range(120):
+        if exec_docker_command(name, ["./bin/mysqladmin"] + client + ["ping"],
+                               False, ["-w", "/work/install"],
+                               echo=False) == 0:
+            break
+        time.sleep(1)
+    else:
+        raise MbtError("The server of " + "/".join(spec) + " didn't start")
+
+    # The insecure root user only accepts local connections
+    exec_docker_command(name, ["./bin/mysql", "--force"] + client +
+                        ["-e", "CREATE DATABASE IF NOT EXISTS sbtest; "
+                         "CREATE USER 'sbtest'@'%'; "
+                         "GRANT ALL ON sbtest.* TO 'sbtest'@'%'"],
+                        False, ["-w", "/work/install"], echo=False)
+
+
+def stop_bench_server(name):
+    # A clean shutdown, the next run of the side shouldn't start with a
+    # crash recovery
+    warm_containers.docker("stop", "--time", "600", name)
+    warm_containers.stop_container(name)
+
+
+def run_sysbench(ctx, host, port, action, log_path):
+    cmd = (["sysbench", ctx.workload,
+            "--db-driver=mysql",
+            "--mysql-host=" + host,
+            "--mysql-port=" + str(port),
+            "--mysql-user=sbtest",
+            "--mysql-db=sbtest",
+            "--tables=" + str(ctx.tables),
+            "--table-size=" + str(ctx.table_size),
+            "--threads=" + str(ctx.threads)] +
+           ctx.remaining_args)
+    if action == "run":
+        cmd += ["--time=" + str(ctx.time),
+                "--warmup-time=" + str(ctx.warmup),
+                "--report-interval=0",
+                "--histogram=on"]
+    rc = run_docker_command(ctx.image, [], "/", {}, cmd + [action], False,
+                            log_path=log_path, echo=False)
+    if rc:
+        raise MbtError("sysbench " + action + " failed, see " + log_path)
+    with open(log_path) as f:
+        return f.read()
+
+
+def bench(param_handler, args):
+    from . import bench as sb
+    param_handler.add_string_arg("a", help="topic/series/variant/installation")
+    param_handler.add_string_arg("b", help="topic/series/variant/installation")
+    param_handler.add_string_arg("image", sb.DEFAULT_IMAGE)
+    param_handler.add_string_arg("workload", "oltp_read_write")
+    param_handler.add_int_arg("threads", 16)
+    param_handler.add_int_arg("time", 60)
+    param_handler.add_int_arg("warmup", 10)
+    param_handler.add_int_arg("tables", 4)
+    param_handler.add_int_arg("table-size", 100000)
+    param_handler.add_int_arg("repetitions", 5)
+    add_resource_args(param_handler)
+    param_handler.add_remaining_args()
+    ctx = param_handler.parse(args)
+    conf = param_handler.config
+
+    if not ctx.a or not ctx.b:
+        raise MbtError("Both --a and --b installations are required")
+    specs = {"a": sb.parse_spec(ctx.a), "b": sb.parse_spec(ctx.b)}
+    if specs["a"] == specs["b"]:
+        raise MbtError("The two installations have to be different")
+    run_id = time.strftime("%Y%m%d-%H%M%S")
+    log_dir = os.path.join(".mbt", "bench", run_id)
+    # Both sides use the profile of the A variant, unless given explicitly
+    profile = resource_profile(conf, ctx, conf.build_configs[specs["a"][2]],
+                               sb.DEFAULT_PROFILE)
+    limits = resource_profiles.docker_args(profile)
+    names = {side: "mbt-bench-" + run_id + "-" + side for side in specs}
+    ports = {side: installation_port(*spec) for side, spec in specs.items()}
+    print("A: " + ctx.a)
+    print("B: " + ctx.b)
+    print(ctx.workload + " with " + str(ctx.threads) + " threads, " +
+          str(ctx.repetitions) + " x " + str(ctx.time) + "s per side")
+
+    # Only one server runs at a time, so the background work of the idle
+    # side (flushing, purge) can't disturb the measured one. Every run
+    # starts from freshly prepared tables.
+    runs = {"a": [], "b": []}
+    try:
+        for i, side in enumerate(sb.run_order(ctx.repetitions)):
+            prefix = os.path.join(log_dir, side + "-")
+            suffix = str(i // 2) + ".log"
+            start_bench_server(conf, specs[side], names[side], limits,
+                               resource_profiles.mysqld_args(profile))
+            for action in ["cleanup", "prepare"]:
+                run_sysbench(ctx, names[side], ports[side], action,
+                             prefix + action + suffix)
+            output = run_sysbench(ctx, names[side], ports[side], "run",
+                                  prefix + "run" + suffix)
+            stop_bench_server(names[side])
+            runs[side].append(sb.parse_output(output))
+            print("[" + str(i + 1) + "/" + str(2 * ctx.repetitions) + "] " +
+                  side.upper() + ": " +
+                  "{:.1f} tps".format(runs[side][-1]["tps"]))
+    finally:
+        for name in names.values():
+            warm_containers.stop_container(name)
+
+    lines = sb.report(runs["a"], runs["b"])
+    print()
+    print_table(lines)
+    print("(mean ±95% confidence interval, latencies in ms, logs in " +
+          log_dir + ")")
+    with open(os.path.join(log_dir, "results.json"), "w") as f:
+        json.dump({"a": ctx.a, "b": ctx.b, "resources": profile,
+                   "runs": runs}, f, indent=1)
+
+
 def exec_local_bash(param_handler, args):
     param_handler.add_topic_arg()
     param_handler.add_series_arg()
@@ -469,28 +918,141 @@ def run_local_bash(param_handler, args):
             )
 
 
+def cmake_command(conf, preset):
+    buildconf = conf.build_configs[preset]
+
+    def proc_cmake_arg(v):
+        return "-D"+v[0] + "=" + v[1]
+
+    return (["cmake", "../src"] +
+            list(map(proc_cmake_arg, buildconf["config"].items())) +
+            ccache.cmake_launcher_args(conf))
+
+
+def cmake_inputs(conf, preset, cmake_cmd):
+    buildconf = conf.build_configs[preset]
+    return cmake_fingerprint.fingerprint_inputs(
+            cmake_cmd,
+            {**buildconf["environment"], **ccache.cache_environment(conf)},
+            warm_containers.image_id(images.pinned_image(buildconf["image"])))
+
+
+def record_build(topic, version, preset, **fields):
+    # Walking the build tree is too slow after every make, the size is
+    # only measured by list --sizes and --rescan
+    with open_index() as index:
+        index.update("build", topic, version, preset, **fields)
+
+
+def seed_candidate(ctx):
+    """The topic with the most recent successful build of the same series
+    and variant"""
+    with open_index() as index:
+        builds = [row for row in index.query("build", series=ctx.series,
+                                             variant=ctx.variant)
+                  if row["topic"] != ctx.topic and row["state"] == "built"]
+    if not builds:
+        raise MbtError("No built " + ctx.series + " " + ctx.variant +
+                       " build to seed from")
+    return max(builds, key=lambda row: row["last_build"] or 0)["topic"]
+
+
+def seed_build(ctx, base_topic):
+    """Initializes the build dir of the topic with a copy of the build of
+    base_topic, so only the differences have to be rebuilt"""
+    from . import build_seed
+    build_dir = os.path.join("topics", ctx.topic, ctx.series+"-"+ctx.variant)
+    src_dir = os.path.join("topics", ctx.topic, ctx.series)
+    base_build = os.path.join("topics", base_topic,
+                              ctx.series+"-"+ctx.variant)
+    base_src = os.path.join("topics", base_topic, ctx.series)
+    if not os.path.isfile(os.path.join(base_build, "CMakeCache.txt")):
+        raise MbtError("Not a configured build: " + base_build)
+    if os.path.isdir(build_dir) and os.listdir(build_dir):
+        raise MbtError("The build directory isn't empty: " + build_dir)
+
+    print("Copying " + base_build + " to " + build_dir)
+    build_seed.copy_build(base_build, build_dir)
+    changed = build_seed.changed_files(base_src, src_dir)
+    unchanged = build_seed.unchanged_files(base_src, src_dir, changed)
+    aligned = build_seed.align_mtimes(base_src, src_dir, unchanged)
+    touched = build_seed.touch_files(src_dir, changed)
+    print("Aligned the timestamps of " + str(aligned) +
+          " unchanged source files, touched " + str(touched) +
+          " changed files")
+    build_seed.rewrite_cache_paths(
+            build_dir, [(os.path.abspath(base_build) + "/",
+                         os.path.abspath(build_dir) + "/"),
+                        (os.path.abspath(base_src) + "/",
+                         os.path.abspath(src_dir) + "/")])
+    record_build(ctx.topic, ctx.series, ctx.variant, state="seeded")
+
+
 def create_build(param_handler, args):
     param_handler.add_topic_arg()
     param_handler.add_series_arg()
     param_handler.add_variant_arg()
+    param_handler.add_boolean_arg("force")
+    param_handler.add_boolean_arg("seed")
+    param_handler.add_string_arg("seed-from")
     param_handler.add_remaining_args()
     ctx = param_handler.parse(args)
 
-    buildconf = param_handler.config.build_configs[ctx.variant]
-
-    def proc_cmake_arg(v):
-        return "-D"+v[0] + "=" + v[1]
-
-    cmake_args = list(map(proc_cmake_arg, buildconf["config"].items()))
-
-    run_docker_build_command(param_handler.config,
-                             ctx.topic,
-                             ctx.series,
-                             ctx.variant,
-                             "/work/build",
-                             ["cmake", "../src"]
-                             + cmake_args
-                             + ctx.remaining_args)
+    conf = param_handler.config
+    build_dir = os.path.join("topics", ctx.topic, ctx.series+"-"+ctx.variant)
+    if ctx.seed or ctx.seed_from:
+        seed_build(ctx, ctx.seed_from or seed_candidate(ctx))
+    cmake_cmd = cmake_command(conf, ctx.variant) + ctx.remaining_args
+    inputs = cmake_inputs(conf, ctx.variant, cmake_cmd)
+
+    changes = cmake_fingerprint.changed_inputs(build_dir, inputs)
+    if not changes and not ctx.force:
+        print("Build configuration unchanged, skipping cmake "
+              "(use --force to rerun it)")
+        return
+    if ctx.force:
+        print("Reconfiguring, forced")
+    else:
+        print("Reconfiguring:")
+        for change in changes:
+            print(" " + change)
+
+    cmake_fingerprint.remove_fingerprint(build_dir)
+    log_path = command_log_path(conf, "create-build", ctx.topic, ctx.series,
+                                ctx.variant)
+    rc = run_with_telemetry(
+            "create-build", ctx.topic, ctx.series, ctx.variant, cmake_cmd,
+            lambda cmd: run_docker_build_command(conf,
+                                                 ctx.topic,
+                                                 ctx.series,
+                                                 ctx.variant,
+                                                 "/work/build",
+                                                 cmd,
+                                                 False,
+                                                 log_path=log_path))
+    if rc == 0:
+        cmake_fingerprint.write_fingerprint(build_dir, inputs)
+    record_build(ctx.topic, ctx.series, ctx.variant,
+                 state="configured" if rc == 0 else "configure-failed",
+                 cmake_hash=cmake_fingerprint.fingerprint_hash(inputs))
+    if rc:
+        sys.exit(rc)
+
+
+def auto_parallelism_args(conf, preset):
+    """-j / -l arguments fitting the cores and memory left for the build"""
+    per_job = memory_per_job(preset, conf.build_configs[preset])
+    cpus = host_cpu_count()
+    memory = host_memory()
+    others = running_builds(os.getcwd())
+    jobs, load = build_parallelism(cpus, memory, per_job, others)
+    print("Using -j" + str(jobs) + " -l" + str(load) + " (" + str(cpus) +
+          " cores, " +
+          (str(memory // MB) + "M available" if memory else
+           "unknown memory") +
+          ", ~" + str(per_job) + "M per job, " + str(others) +
+          " other build(s) running)")
+    return ["-j" + str(jobs), "-l" + str(load)]
 
 
 def build_with(param_handler, args):
@@ -502,13 +1064,489 @@ def build_with(param_handler, args):
 
     build_tool = detect_build_tool(ctx.topic, ctx.series, ctx.variant)
 
-    run_docker_build_command(param_handler.config,
-                             ctx.topic,
-                             ctx.series,
-                             ctx.variant,
-                             "/work/build",
-                             [build_tool]
-                             + ctx.remaining_args)
+    conf = param_handler.config
+    build_args = ctx.remaining_args
+    if not has_parallelism_args(build_args):
+        build_args = auto_parallelism_args(conf, ctx.variant) + build_args
+    log_path = command_log_path(conf, "make", ctx.topic, ctx.series,
+                                ctx.variant)
+    started = time.time()
+    with running_build(os.getcwd()):
+        rc = run_with_telemetry(
+                "make", ctx.topic, ctx.series, ctx.variant,
+                [build_tool] + build_args,
+                lambda cmd: run_docker_build_command(conf,
+                                                     ctx.topic,
+                                                     ctx.series,
+                                                     ctx.variant,
+                                                     "/work/build",
+                                                     cmd,
+                                                     False,
+                                                     log_path=log_path))
+    record_build(ctx.topic, ctx.series, ctx.variant,
+                 state="built" if rc == 0 else "build-failed",
+                 last_build=started)
+    if rc:
+        sys.exit(rc)
+
+
+def build_matrix(param_handler, args):
+    from concurrent.futures import ThreadPoolExecutor
+    from .matrix import select_builds, StatusTable
+    param_handler.add_topic_arg()
+    param_handler.add_list_arg("series", [param_handler.context.series
+                                          or "*"],
+                               "Glob patterns of the series to build")
+    param_handler.add_list_arg("variants", ([param_handler.context.variant]
+                                            if param_handler.context.variant
+                                            else None),
+                               "Glob patterns of the variants to build")
+    param_handler.add_int_arg("parallel")
+    param_handler.add_remaining_args()
+    ctx = param_handler.parse(args)
+    conf = param_handler.config
+
+    builds = select_builds(conf, ctx.series, ctx.variants)
+    cpus = host_cpu_count()
+    parallel = min(len(builds), ctx.parallel or max(1, cpus // 8))
+    slot = split_resources(parallel, cpus, host_memory())
+
+    print("Building " + str(len(builds)) + " variant(s), " +
+          str(parallel) + " at a time, each with -j" + str(slot["jobs"]) +
+          " " + " ".join(docker_limit_args(slot)))
+
+    def name(build):
+        return build[0] + "-" + build[1]
+
+    def run_build(table, build):
+        series, variant = build
+        log_path = os.path.join("topics", ctx.topic,
+                                name(build) + "-matrix.log.gz")
+        if os.path.isfile(log_path):
+            os.remove(log_path)
+
+        def run_step(status, command, cmd):
+            table.set(name(build), status)
+            return run_with_telemetry(
+                    command, ctx.topic, series, variant, cmd,
+                    lambda cmd: run_docker_build_command(
+                        conf, ctx.topic, series, variant, "/work/build", cmd,
+                        False, docker_limit_args(slot), log_path, False))
+
+        try:
+            try:
+                build_tool = detect_build_tool(ctx.topic, series, variant)
+            except Exception:
+                cmake_cmd = cmake_command(conf, variant)
+                inputs = cmake_inputs(conf, variant, cmake_cmd)
+                if run_step("configuring", "create-build", cmake_cmd):
+                    table.set(name(build), "cmake failed", True)
+                    record_build(ctx.topic, series, variant,
+                                 state="configure-failed")
+                    return False
+                cmake_fingerprint.write_fingerprint(
+                        os.path.join("topics", ctx.topic, name(build)),
+                        inputs)
+                record_build(ctx.topic, series, variant,
+                             state="configured",
+                             cmake_hash=cmake_fingerprint.fingerprint_hash(
+                                 inputs))
+                build_tool = detect_build_tool(ctx.topic, series, variant)
+            jobs = slot["jobs"]
+            if slot["memory"]:
+                jobs = max(1, min(jobs, slot["memory"] //
+                                  memory_per_job(variant,
+                                                 conf.build_configs[variant])))
+            started = time.time()
+            with running_build(os.getcwd()):
+                rc = run_step("building", "make",
+                              [build_tool, "-j" + str(jobs)]
+                              + ctx.remaining_args)
+            record_build(ctx.topic, series, variant,
+                         state="built" if rc == 0 else "build-failed",
+                         last_build=started)
+        except Exception as e:
+            table.set(name(build), "error: " + str(e), True)
+            return False
+        table.set(name(build), "ok" if rc == 0 else "failed (" + str(rc) + ")",
+                  True)
+        return rc == 0
+
+    with StatusTable(map(name, builds)) as table:
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            results = list(pool.map(lambda b: run_build(table, b), builds))
+
+    failed = [name(b) for b, ok in zip(builds, results) if not ok]
+    if failed:
+        print("Logs of failed builds:")
+        for f in failed:
+            print(" " + os.path.join("topics", ctx.topic,
+                                     f + "-matrix.log.gz"))
+        sys.exit(1)
+
+
+def cache_stats(param_handler, args):
+    param_handler.add_boolean_arg("zero")
+    ctx = param_handler.parse(args)
+    conf = param_handler.config
+
+    if not conf.ccache_dir:
+        print("Compiler cache is not enabled, see set_ccache in the config")
+        return
+
+    caches = ccache.existing_caches(conf)
+    if not caches:
+        print("No compiler cache has been used yet")
+
+    for directory, key in caches:
+        print("== " + key["image"] + " " +
+              " ".join(k+"="+v for k, v in sorted(key["environment"].items()))
+              + " (" + directory + ")")
+        sys.stdout.flush()
+        run_docker_command(key["image"],
+                           [directory + ":" + ccache.CONTAINER_DIR],
+                           "/work",
+                           ccache.cache_environment(conf),
+                           ["ccache", "-z" if ctx.zero else "-s"],
+                           False)
+
+
+def list_warm_containers():
+    containers = warm_containers.list_containers()
+    if not containers:
+        print("No warm containers are running")
+    for name, status, image in containers:
+        print(name + "\t" + status + "\t" + image)
+
+
+def stop_warm_containers(param_handler, args):
+    if args == ["--all"]:
+        names = [c[0] for c in warm_containers.list_containers()]
+    else:
+        param_handler.add_topic_arg()
+        param_handler.add_series_arg()
+        param_handler.add_variant_arg()
+        ctx = param_handler.parse(args)
+        names = [warm_containers.container_name(ctx.topic, ctx.series,
+                                                ctx.variant)]
+
+    for name in names:
+        if warm_containers.stop_container(name):
+            print("Stopped " + name)
+        else:
+            print("Not running: " + name)
+
+
+def list_workspace(param_handler, args):
+    from .workspace_index import KINDS
+    param_handler.add_string_arg("topic", param_handler.context.topic)
+    param_handler.add_choice_arg("kind", KINDS)
+    param_handler.add_boolean_arg("rescan")
+    param_handler.add_boolean_arg("sizes")
+    ctx = param_handler.parse(args)
+
+    with open_index() as index:
+        if ctx.rescan:
+            index.rescan(param_handler.config)
+        rows = index.query(ctx.kind, ctx.topic)
+        # The rescan already measured every entry
+        if ctx.sizes and not ctx.rescan:
+            for row in rows:
+                index.update_size(row["path"])
+            rows = index.query(ctx.kind, ctx.topic)
+
+    def format_time(t):
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(t)) if t else ""
+
+    def format_size(size):
+        if not size:
+            return ""
+        if size < 1024 ** 3:
+            return "{:.0f}M".format(size / 1024.0 ** 2)
+        return "{:.1f}G".format(size / 1024.0 ** 3)
+
+    table = [["PATH", "KIND", "STATE", "LAST BUILD", "SIZE", "CMAKE",
+              "PORT"]]
+    for row in rows:
+        table.append([row["path"], row["kind"], row["state"] or "",
+                      format_time(row["last_build"]),
+                      format_size(row["size"]),
+                      (row["cmake_hash"] or "")[:10],
+                      str(row["port"] or "")])
+    print_table(table)
+
+
+def build_stats(param_handler, args):
+    from . import telemetry
+    param_handler.add_string_arg("topic")
+    param_handler.add_string_arg("series")
+    param_handler.add_string_arg("variant")
+    param_handler.add_choice_arg("command", ["create-build", "make",
+                                             "install", "mtr"])
+    param_handler.add_int_arg("days", 30)
+    param_handler.add_int_arg("threshold", 20)
+    param_handler.add_boolean_arg("history")
+    ctx = param_handler.parse(args)
+
+    with open_history() as history:
+        rows = history.query(ctx.command, ctx.topic, ctx.series,
+                             ctx.variant, telemetry.days_ago(ctx.days))
+    if not rows:
+        print("No recorded invocations")
+        return
+
+    def format_seconds(t):
+        return "" if t is None else "{:.0f}s".format(t)
+
+    def format_memory(m):
+        return "" if m is None else "{:.1f}G".format(m / 1024.0 ** 3)
+
+    if ctx.history:
+        table = [["STARTED", "COMMAND", "TOPIC", "SERIES", "VARIANT",
+                  "COMMIT", "WALL", "CPU", "PEAK MEM", "RC"]]
+        for row in rows:
+            table.append([time.strftime("%Y-%m-%d %H:%M",
+                                        time.localtime(row["started"])),
+                          row["command"], row["topic"] or "",
+                          row["series"] or "", row["variant"] or "",
+                          (row["commit_id"] or "")[:10],
+                          format_seconds(row["wall_time"]),
+                          format_seconds(row["cpu_time"]),
+                          format_memory(row["peak_memory"]),
+                          str(row["exit_code"])])
+        print_table(table)
+        print()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["command"], row["series"], row["variant"]),
+                          []).append(row)
+    table = [["COMMAND", "SERIES", "VARIANT", "RUNS", "FAILED", "LAST WALL",
+              "MEDIAN WALL", "LAST CPU", "MEDIAN CPU", "PEAK MEM"]]
+    for (command, series, variant), runs in sorted(groups.items()):
+        ok = [r for r in runs if r["exit_code"] == 0]
+        last = ok[-1] if ok else None
+        table.append([command, series or "", variant or "", str(len(runs)),
+                      str(len(runs) - len(ok)),
+                      format_seconds(last["wall_time"] if last else None),
+                      format_seconds(telemetry.median(
+                          [r["wall_time"] for r in ok])),
+                      format_seconds(last["cpu_time"] if last else None),
+                      format_seconds(telemetry.median(
+                          [r["cpu_time"] for r in ok
+                           if r["cpu_time"] is not None])),
+                      format_memory(max([r["peak_memory"] for r in ok
+                                         if r["peak_memory"] is not None],
+                                        default=None))])
+    print_table(table)
+
+    regressions = telemetry.find_regressions(rows, ctx.threshold / 100.0)
+    if regressions:
+        print()
+        print("Regressions (over " + str(ctx.threshold) +
+              "% compared to the previous runs):")
+        for command, series, variant, metric, last, baseline in regressions:
+            fmt = format_memory if metric == "peak_memory" else format_seconds
+            print(" " + command + " " + (series or "") + " " +
+                  (variant or "") + ": " + metric.replace("_", " ") + " " +
+                  fmt(last) + ", was " + fmt(baseline) +
+                  " (+{:.0f}%)".format((last / baseline - 1) * 100))
+
+
+def build_profile(param_handler, args):
+    from . import ninja_profile as np
+    param_handler.add_topic_arg()
+    param_handler.add_series_arg()
+    param_handler.add_variant_arg()
+    param_handler.add_int_arg("count", 10)
+    param_handler.add_string_arg("against-topic")
+    param_handler.add_string_arg("against-series")
+    param_handler.add_string_arg("against-variant")
+    param_handler.add_string_arg("against-commit")
+    ctx = param_handler.parse(args)
+    root_dir = os.getcwd()
+
+    def build_steps(topic, series, variant):
+        steps = np.read_log(os.path.join("topics", topic,
+                                         series + "-" + variant))
+        if steps is None:
+            raise MbtError("No .ninja_log in the build of " + topic + " " +
+                           series + " " + variant +
+                           ", profiles need ninja builds")
+        return np.last_build(steps)
+
+    def seconds(ms):
+        return "{:.1f}s".format(ms / 1000.0)
+
+    def print_summary(title, steps):
+        info = np.summary(steps)
+        print(title + ": " + str(info["steps"]) + " steps, wall " +
+              seconds(info["wall"]) + ", CPU " + seconds(info["cpu"]) +
+              " ({:.1f}x parallel)".format(info["parallelism"]))
+
+    def print_steps(steps):
+        for step in steps:
+            print(" " + seconds(np.duration(step)).rjust(8) + "  " +
+                  step.outputs[0])
+
+    steps = build_steps(ctx.topic, ctx.series, ctx.variant)
+    commit = source_commit(ctx.topic, ctx.series)
+    if commit:
+        np.save_profile(np.profile_path(root_dir, ctx.topic, ctx.series,
+                                        ctx.variant, commit), steps)
+
+    graph = np.read_build_graph(os.path.join("topics", ctx.topic,
+                                             ctx.series + "-" +
+                                             ctx.variant))
+    print_summary("Last build", steps)
+    for kind in ["compile", "link"]:
+        print()
+        print("Slowest " + kind + " steps:")
+        print_steps(np.slowest(steps, kind, ctx.count, graph))
+    path = np.critical_path(steps, graph)
+    print()
+    print("Critical path (" +
+          seconds(sum(np.duration(s) for s in path)) + " of steps):")
+    print_steps(reversed(path))
+
+    if ctx.against_commit:
+        other_path = np.find_profile(root_dir, ctx.topic, ctx.series,
+                                     ctx.variant, ctx.against_commit)
+        if other_path is None:
+            raise MbtError("No saved profile of commit " +
+                           ctx.against_commit)
+        other = np.load_profile(other_path)
+        other_name = "commit " + ctx.against_commit
+    elif ctx.against_topic or ctx.against_series or ctx.against_variant:
+        other_build = [ctx.against_topic or ctx.topic,
+                       ctx.against_series or ctx.series,
+                       ctx.against_variant or ctx.variant]
+        other = build_steps(*other_build)
+        other_name = " ".join(other_build)
+    else:
+        return
+
+    print()
+    print_summary("Compared to " + other_name, other)
+    print("Largest differences (" + other_name + " -> this build):")
+    for output, before, after in np.compare(np.step_durations(other),
+                                            np.step_durations(steps),
+                                            ctx.count):
+        print(" " + seconds(before).rjust(8) + " -> " +
+              seconds(after).rjust(8) + "  " + output)
+
+
+def images_command(param_handler, args):
+    from .parallel import run_parallel, default_jobs
+    action = "list"
+    if args and not args[0].startswith("-"):
+        action = args.pop(0)
+    if action not in ["sync", "list"]:
+        raise MbtError("Unknown images command: " + action)
+    param_handler.add_int_arg("jobs", default_jobs())
+    param_handler.add_boolean_arg("update")
+    ctx = param_handler.parse(args)
+    root_dir = os.getcwd()
+    names = images.config_images(param_handler.config)
+    pins = images.read_lock(root_dir)
+
+    if action == "list":
+        for image in names:
+            pinned = pins.get(image)
+            state = ("missing" if not images.local_digest(pinned or image)
+                     else "present")
+            print(image + "\t" + (pinned or "(not pinned)") + "\t" + state)
+        return
+
+    synced = {}
+
+    def sync(image):
+        def run():
+            synced[image] = images.sync_image(image, pins.get(image),
+                                              ctx.update)
+            return synced[image]
+        return run
+
+    try:
+        run_parallel([(image, sync(image)) for image in names], ctx.jobs,
+                     "image")
+    finally:
+        for image, (reference, action) in sorted(synced.items()):
+            print(" " + image + ": " + action + " " + reference)
+        new_pins = {**pins,
+                    **{image: ref for image, (ref, _) in synced.items()}}
+        # Images no longer used by any build config are dropped
+        new_pins = {k: v for k, v in new_pins.items() if k in names}
+        if new_pins != pins:
+            images.write_lock(root_dir, new_pins)
+            print("Updated " + images.LOCK_FILE)
+
+
+def workspace_status(param_handler, args):
+    from .parallel import run_parallel, default_jobs
+    from . import workspace_status as ws
+    from .workspace_index import entry_path
+    param_handler.add_string_arg("topic", param_handler.context.topic)
+    param_handler.add_int_arg("jobs", default_jobs())
+    ctx = param_handler.parse(args)
+    conf = param_handler.config
+    root_dir = os.getcwd()
+
+    worktrees = [w for w in ws.find_worktrees(conf, root_dir)
+                 if ctx.topic is None or w[1] == ctx.topic]
+
+    def scan_worktree(path, topic, series):
+        return lambda: ws.worktree_status(root_dir, path, topic, series)
+
+    statuses = run_parallel([(w[0], scan_worktree(*w)) for w in worktrees],
+                            ctx.jobs, "status", progress=False)
+    containers = ws.running_containers()
+
+    with open_index() as index:
+        entries = [e for e in index.scan(conf)
+                   if ctx.topic is None or e[1] == ctx.topic]
+        known = {r["path"]: r for r in index.query(topic=ctx.topic)}
+    built_commits = {}
+    with open_history() as history:
+        for kind, topic, series, variant, _ in entries:
+            if kind == "build":
+                row = history.last_success("make", topic, series, variant)
+                built_commits[entry_path(topic, series, variant)] = \
+                    row["commit_id"] if row else None
+
+    table = [["WORKTREE", "BRANCH", "DIRTY", "VS SERIES", "VS REMOTE"]]
+    for path, _, _ in worktrees:
+        st = statuses[path]
+        table.append([path, st["branch"],
+                      str(st["dirty"]) if st["dirty"] else "",
+                      ws.format_diff(st["series_diff"]),
+                      ws.format_diff(st["remote_diff"])])
+    print_table(table)
+
+    builds = [["BUILD", "STATE"]]
+    installations = [["INSTALLATION", "MYSQLD"]]
+    for kind, topic, series, variant, installation in entries:
+        path = entry_path(topic, series, variant, installation)
+        if kind == "build":
+            row = known.get(path)
+            source = statuses.get(entry_path(topic, series))
+            builds.append([path, ws.build_freshness(
+                row["state"] if row else None,
+                row["last_build"] if row else None,
+                built_commits[path],
+                source["head"] if source else None,
+                source["source_changed"] if source else None)])
+        elif kind == "installation":
+            container = "-".join(["mysqld", topic, series, variant,
+                                  installation])
+            installations.append([path, "running" if container in containers
+                                  else "stopped"])
+    if len(builds) > 1:
+        print()
+        print_table(builds)
+    if len(installations) > 1:
+        print()
+        print_table(installations)
 
 
 def delete_build(param_handler, args):
@@ -519,21 +1557,187 @@ def delete_build(param_handler, args):
 
     build_dir = os.path.join("topics", ctx.topic, ctx.series+"-"+ctx.variant)
     shutil.rmtree(build_dir)
+    with open_index() as index:
+        index.remove(build_dir)
+
+
+def open_mtr_results():
+    from .mtr_results import MtrResults
+    return MtrResults(os.getcwd())
+
+
+def source_commit(topic, version):
+    # Called after every make / mtr run, git is much cheaper to start than
+    # GitPython is to import
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              cwd=os.path.join("topics", topic, version),
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              universal_newlines=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_mtr_results(ctx, results):
+    with open_mtr_results() as store:
+        store.record(results, ctx.topic, ctx.series, ctx.variant,
+                     source_commit(ctx.topic, ctx.series))
+
+
+def mtr_tmpfs_command(conf, ctx, cmd):
+    """Returns the mtr command and docker args using the tmpfs, if enabled"""
+    size = tmpfs.tmpfs_size(conf.build_configs[ctx.variant], ctx.tmpfs)
+    if size is None:
+        return cmd, []
+    return tmpfs.mtr_command(cmd), tmpfs.tmpfs_args(size)
+
+
+def installed_tmpfs_command(conf, ctx, cmd):
+    """Returns the server command and docker args using the tmpfs"""
+    size = tmpfs.tmpfs_size(conf.build_configs[ctx.variant], ctx.tmpfs)
+    if size is None:
+        return cmd, []
+    return (tmpfs.mysqld_command(cmd, "--defaults-file=/work/install/etc/"
+                                 "my.cnf"),
+            tmpfs.tmpfs_args(size))
+
+
+def run_sharded_mtr(conf, ctx):
+    from concurrent.futures import ThreadPoolExecutor
+    from .matrix import StatusTable
+    from . import mtr
+    from . import telemetry
+
+    with open_mtr_results() as store:
+        durations = store.durations(ctx.series, ctx.variant)
+    commands = mtr.shard_commands(ctx.remaining_args, ctx.shards, durations)
+    build_dir = os.path.join("topics", ctx.topic, ctx.series+"-"+ctx.variant)
+    names = ["shard" + str(i) for i in range(len(commands))]
+    logs = [os.path.join(build_dir, "mysql-test", "mtr-" + n + ".log.gz")
+            for n in names]
+
+    def run_shard(table, i):
+        if os.path.isfile(logs[i]):
+            os.remove(logs[i])
+        table.set(names[i], "running")
+        cmd, docker_args = mtr_tmpfs_command(
+                conf, ctx, ["eatmydata", "./mtr"] + commands[i])
+        cmd = telemetry.wrap_command(cmd, stats[i])
+        rc = run_docker_build_command(conf,
+                                      ctx.topic,
+                                      ctx.series,
+                                      ctx.variant,
+                                      "/work/build/mysql-test",
+                                      cmd,
+                                      False,
+                                      # also keeps the shards out of the
+                                      # warm container
+                                      ["--label", "mbt.mtr-shard=" + str(i)]
+                                      + docker_args,
+                                      logs[i],
+                                      False)
+        table.set(names[i], "ok" if rc == 0 else "failed (" + str(rc) + ")",
+                  True)
+        return rc
+
+    stats = [telemetry.stats_name("mtr", "-" + n) for n in names]
+    print("Running mtr in " + str(len(commands)) + " shards")
+    started = time.time()
+    with StatusTable(names) as table:
+        with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+            rcs = list(pool.map(lambda i: run_shard(table, i),
+                                range(len(commands))))
+    record_invocation("mtr", ctx.topic, ctx.series, ctx.variant, started,
+                      max(rcs),
+                      telemetry.combine_stats(
+                          [telemetry.read_stats(build_dir, s)
+                           for s in stats]))
+
+    shard_results = [mtr.parse_log(log) for log in logs]
+    for results in shard_results:
+        record_mtr_results(ctx, results)
+    lines, failed = mtr.merge_report(shard_results)
+    print("\n".join(lines))
+    print("Shard logs: " + os.path.join(build_dir, "mysql-test",
+                                        "mtr-shard*.log.gz"))
+    return max(rcs) if any(rcs) else (1 if failed else 0)
+
+
+def affected_tests(ctx):
+    """mtr arguments selecting the tests affected by the topic changes"""
+    from . import affected
+
+    src_dir = os.path.join("topics", ctx.topic, ctx.series)
+    build_dir = src_dir + "-" + ctx.variant
+    changed = affected.changed_files(src_dir, ctx.series)
+    suites, tests, reasons = affected.select_tests(
+            changed, affected.existing_suites(src_dir),
+            affected.compiled_sources(build_dir), src_dir)
+
+    print(str(len(changed)) + " file(s) changed compared to " + ctx.series +
+          ":")
+    for reason in reasons:
+        print(" " + reason)
+    selection = affected.mtr_selection_args(suites, tests)
+    if selection:
+        print("Selected: " + " ".join(selection))
+    return selection
 
 
 def test_with_mtr(param_handler, args):
     param_handler.add_topic_arg()
     param_handler.add_series_arg()
     param_handler.add_variant_arg()
+    param_handler.add_int_arg("shards", 1)
+    param_handler.add_boolean_arg("affected")
+    param_handler.add_string_arg("tmpfs")
     param_handler.add_remaining_args()
     ctx = param_handler.parse(args)
 
-    run_docker_build_command(param_handler.config,
-                             ctx.topic,
-                             ctx.series,
-                             ctx.variant,
-                             "/work/build/mysql-test",
-                             ["eatmydata",  "./mtr"] + ctx.remaining_args)
+    conf = param_handler.config
+    if ctx.affected:
+        selection = affected_tests(ctx)
+        if not selection:
+            print("No tests are affected by the changes of the topic")
+            return
+        ctx.remaining_args = ctx.remaining_args + selection
+    if ctx.shards > 1:
+        rc = run_sharded_mtr(conf, ctx)
+        if rc:
+            sys.exit(rc)
+        return
+
+    from . import mtr
+
+    with open_mtr_results() as store:
+        mtr_args = mtr.order_tests(ctx.remaining_args,
+                                   store.durations(ctx.series, ctx.variant))
+
+    # The output is always logged, to store the results
+    log_path = (command_log_path(conf, "mtr", ctx.topic, ctx.series,
+                                 ctx.variant) or
+                os.path.join("topics", ctx.topic, ctx.series+"-"+ctx.variant,
+                             "mysql-test", "mtr-last.log.gz"))
+    if os.path.isfile(log_path):
+        os.remove(log_path)
+    cmd, docker_args = mtr_tmpfs_command(
+            conf, ctx, ["eatmydata",  "./mtr"] + mtr_args)
+    rc = run_with_telemetry(
+            "mtr", ctx.topic, ctx.series, ctx.variant, cmd,
+            lambda cmd: run_docker_build_command(conf,
+                                                 ctx.topic,
+                                                 ctx.series,
+                                                 ctx.variant,
+                                                 "/work/build/mysql-test",
+                                                 cmd,
+                                                 False,
+                                                 docker_args,
+                                                 log_path=log_path))
+    record_mtr_results(ctx, mtr.parse_log(log_path))
+    if rc:
+        sys.exit(rc)
 
 
 def asan_symbolize(param_handler, args):
@@ -552,6 +1756,7 @@ def asan_symbolize(param_handler, args):
 
 
 def cleanup_repo(conf, force=False):
+    import git
     # For some reason branch deletion doesn't work from the empty master
     repo = git.Repo("versions/"+conf.series[0])
     repo.git.worktree("prune")
@@ -564,9 +1769,13 @@ def cleanup_repo(conf, force=False):
             if "checked out at" not in e.stderr:
                 print(e)
             pass
+    with open_index() as index:
+        for path in index.prune():
+            print("Removed from index: " + path)
 
 
 def reupmerge(param_handler, args):
+    import git
     param_handler.add_topic_arg()
     ctx = param_handler.parse(args)
 
@@ -610,6 +1819,7 @@ def reupmerge(param_handler, args):
 
 
 def rebase(conf, param_handler, args):
+    import git
     param_handler.add_topic_arg()
     param_handler.add_topic_arg()
     param_handler.add_boolean_arg("gca")
@@ -649,6 +1859,13 @@ def rebase(conf, param_handler, args):
                 repo.git.cherry_pick(topic_refs[0])
 
 
+def print_table(rows):
+    # Prints the rows (lists of strings) in left aligned columns
+    widths = [max(len(r[i]) for r in rows) for i in range(len(rows[0]))]
+    for r in rows:
+        print("  ".join(c.ljust(w) for c, w in zip(r, widths)).rstrip())
+
+
 def print_help():
     # Print a usage message
     __location__ = os.path.realpath(os.path.join(os.getcwd(),
@@ -669,14 +1886,14 @@ def mbt_command():
 
     os.chdir(root.root_dir())
 
-    repo = repo_object(conf)
+    # GitPython is only loaded by the commands working with git
 
     if sys.argv[1] == "init":
-        init_mbt(conf, repo)
+        init_mbt(repo_object(conf), param_handler, sys.argv[2:])
         return
 
     if sys.argv[1] == "pull-series":
-        run_pull(repo, param_handler, sys.argv[2:])
+        run_pull(repo_object(conf), param_handler, sys.argv[2:])
         return
 
     if sys.argv[1] == "push-series":
@@ -684,13 +1901,53 @@ def mbt_command():
         return
 
     if sys.argv[1] == "create-topic":
-        create_topic(repo, param_handler, sys.argv[2:])
+        create_topic(repo_object(conf), param_handler, sys.argv[2:])
         return
 
     if sys.argv[1] == "create-build":
         create_build(param_handler, sys.argv[2:])
         return
 
+    if sys.argv[1] == "make-matrix":
+        build_matrix(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "cache-stats":
+        cache_stats(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "warm-list":
+        list_warm_containers()
+        return
+
+    if sys.argv[1] == "warm-stop":
+        stop_warm_containers(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "list":
+        list_workspace(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "status":
+        workspace_status(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "build-stats":
+        build_stats(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "bench":
+        bench(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "images":
+        images_command(param_handler, sys.argv[2:])
+        return
+
+    if sys.argv[1] == "build-profile":
+        build_profile(param_handler, sys.argv[2:])
+        return
+
     if sys.argv[1] == "delete-build":
         delete_build(param_handler, sys.argv[2:])
         return
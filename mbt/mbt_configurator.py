@@ -6,6 +6,11 @@ class MbtConfigurator:
         self.remotes = {}
         self.series = []
         self.build_configs = {}
+        self.log_dir = None
+        self.ccache_dir = None
+        self.ccache_max_size = None
+        self.warm_idle_timeout = None
+        self.resource_profiles = {}
 
     def add_remote(self, name, url):
         self.remotes[name] = url
@@ -13,11 +18,53 @@ class MbtConfigurator:
     def add_series(self, ver):
         self.series.append(ver)
 
+    def set_log_dir(self, directory):
+        """Keeps a compressed log of every build / mtr command there"""
+        self.log_dir = directory
+
+    def set_ccache(self, directory="ccache", max_size="20G"):
+        """Enables ccache for the builds, with caches stored in directory"""
+        self.ccache_dir = directory
+        self.ccache_max_size = max_size
+
+    def set_warm_containers(self, idle_timeout=1800):
+        """Runs build commands in long-lived containers.
+
+        A container is kept for every topic / series / variant, and stops
+        after idle_timeout seconds without any command.
+        """
+        self.warm_idle_timeout = idle_timeout
+
+    def add_resource_profile(self, name, cpus=None, cpuset=None,
+                             numa_node=None, memory=None, hugepages=False):
+        """Resource limits for the servers started by run-mysqld / bench.
+
+        cpus is a (fractional) cpu count, cpuset an explicit cpu list like
+        "0-7", numa_node restricts the cpus and memory to a NUMA node,
+        memory is a docker memory limit like "16g". With hugepages, the
+        server uses large pages.
+        """
+        self.resource_profiles[name] = {"cpus": cpus, "cpuset": cpuset,
+                                        "numa_node": numa_node,
+                                        "memory": memory,
+                                        "hugepages": hugepages}
+
     def set_user(self, name, email):
         self.user_name = name
         self.user_email = email
 
-    def add_build_config(self, name, image, environment=None, config=None):
+    def add_build_config(self, name, image, environment=None, config=None,
+                         tmpfs=None, memory_per_job=None,
+                         resource_profile=None):
+        """Adds a build variant.
+
+        With tmpfs (a size, e.g. "4G"), the mtr var directory and the
+        installation datadirs of the variant are memory backed.
+        memory_per_job (in MB) overrides the estimated memory use of a
+        compiler job, used to pick the parallelism of make.
+        resource_profile names the default resource profile of the servers
+        of the variant.
+        """
         if environment is None:
             environment = {}
         if config is None:
@@ -25,7 +72,10 @@ class MbtConfigurator:
         self.build_configs[name] = {
             "image": image,
             "environment": environment,
-            "config": config
+            "config": config,
+            "tmpfs": tmpfs,
+            "memory_per_job": memory_per_job,
+            "resource_profile": resource_profile
             }
 
     def has_series(self, version):
@@ -78,6 +78,18 @@ class MbtParams:
     def add_int_arg(self, name, default=None):
         self.parser.add_argument("--"+name, type=int, default=default)
 
+    def add_string_arg(self, name, default=None, help=None):
+        self.parser.add_argument("--"+name, default=default, help=help)
+
+    def add_choice_arg(self, name, choices, default=None):
+        self.parser.add_argument("--"+name, choices=choices, default=default)
+
+    def add_list_arg(self, name, default=None, help=None):
+        self.parser.add_argument("--"+name, nargs="+",
+                                 required=(default is None),
+                                 default=default,
+                                 help=help)
+
     def parse(self, args):
         self.results = self.parser.parse_args(args)
         # Work around an argparse limitation:
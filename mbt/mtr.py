@@ -0,0 +1,220 @@
+import gzip
+import re
+
+from .mbt_error import MbtError
+
+# e.g. "[ 50%] main.alias 'innodb'  w2 [ pass ]   123"
+RESULT_RE = re.compile(r"^(?:\[\s*\d+%\]\s+)?"
+                       r"(?P<test>[\w-]+\.[\w#-]+)"
+                       r"(?:\s+'(?P<combination>[^']*)')?"
+                       r"\s+(?:w\d+\s+)?"
+                       r"\[ (?P<result>[\w-]+) \]"
+                       r"(?:\s+(?P<duration>\d+))?")
+
+FAILED_RESULTS = ["fail", "retry-fail"]
+
+# mtr derives the ports from the build thread, this spacing leaves room
+# for the workers started by --parallel within a shard
+BUILD_THREAD_BASE = 100
+BUILD_THREAD_SPACING = 40
+
+
+# mtr options taking a (mandatory) value, which can also be given as the
+# next argument
+VALUE_OPTIONS = ["build-thread", "charset-for-testdb", "client-debugger",
+                 "combination", "debug-sync-timeout", "debugger",
+                 "defaults-extra-file", "defaults-file", "do-suite",
+                 "do-test", "experimental", "max-connections",
+                 "max-test-fail", "mysqld", "mysqld-env", "parallel",
+                 "port-base", "repeat", "retry", "retry-failure",
+                 "shutdown-timeout", "skip-suite", "skip-test",
+                 "skip-test-list", "start-from", "suite-timeout",
+                 "testcase-timeout", "tmpdir", "user", "valgrind-option",
+                 "valgrind-options", "vardir"]
+
+
+def split_mtr_args(args):
+    """Separates the suite list and the test names from the other options.
+
+    The values of the known options taking a value (VALUE_OPTIONS) stay
+    with their option, other arguments not starting with a dash are test
+    names. Returns (suites, tests, other_args).
+    """
+    suites = []
+    tests = []
+    other = []
+    it = iter(args)
+    for arg in it:
+        if arg.startswith("--suite=") or arg.startswith("--suites="):
+            suites += [s for s in arg.split("=", 1)[1].split(",") if s]
+        elif arg in ["--suite", "--suites"]:
+            suites += [s for s in next(it, "").split(",") if s]
+        elif arg.startswith("--") and arg[2:] in VALUE_OPTIONS:
+            other.append(arg)
+            value = next(it, None)
+            if value is not None:
+                other.append(value)
+        elif arg.startswith("-"):
+            other.append(arg)
+        else:
+            tests.append(arg)
+    return suites, tests, other
+
+
+def assign_shards(items, count):
+    """Distributes the items round robin between count shards"""
+    shards = [[] for _ in range(min(count, len(items)))]
+    for i, item in enumerate(items):
+        shards[i % len(shards)].append(item)
+    return shards
+
+
+def balance_shards(items, count, weight):
+    """Distributes the items between count shards by their weight.
+
+    Longest processing time first: the heaviest remaining item always goes
+    to the shard with the least work, and every shard lists its items
+    heaviest first.
+    """
+    shards = [[] for _ in range(min(count, len(items)))]
+    loads = [0] * len(shards)
+    for item in sorted(items, key=weight, reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(item)
+        loads[i] += weight(item)
+    return shards
+
+
+def weight_function(durations, key=lambda item: item):
+    """Returns a weight function looking up the items in durations.
+
+    Items without history are assumed to take the median known time.
+    """
+    known = sorted(durations.values())
+    default = known[len(known) // 2] if known else 1
+    return lambda item: durations.get(key(item), default)
+
+
+def weights_by_test(durations):
+    return weight_function(durations,
+                           lambda t: t if "." in t else "main." + t)
+
+
+def weights_by_suite(durations):
+    """Weight of a suite is the sum of its test durations"""
+    totals = {}
+    for test, duration in durations.items():
+        suite = test.split(".", 1)[0]
+        totals[suite] = totals.get(suite, 0) + duration
+    return weight_function(totals)
+
+
+def order_tests(args, durations):
+    """Returns the mtr arguments with the explicitly listed tests ordered
+    longest first by their historical durations.
+
+    mtr would reorder them by suite and name, so --no-reorder is added.
+    Without test names or durations, args are returned unchanged.
+    """
+    suites, tests, other = split_mtr_args(args)
+    if not tests or not durations:
+        return args
+    if suites:
+        other = other + ["--suite=" + ",".join(suites)]
+    if "--no-reorder" not in other:
+        other = other + ["--no-reorder"]
+    return other + sorted(tests, key=weights_by_test(durations),
+                          reverse=True)
+
+
+def shard_commands(args, count, durations=None):
+    """Returns the mtr arguments of every shard.
+
+    Either the suites or the test names given in args are split between
+    the shards. Each shard gets its own var directory and build thread,
+    so the shards can run at the same time.
+
+    With the historical test durations, the shards are balanced by the
+    expected run time, and explicitly listed tests run longest first.
+    """
+    suites, tests, other = split_mtr_args(args)
+    if tests:
+        if durations:
+            selections = balance_shards(tests, count,
+                                        weights_by_test(durations))
+            other = other + ["--no-reorder"]
+        else:
+            selections = assign_shards(tests, count)
+        if suites:
+            other = other + ["--suite=" + ",".join(suites)]
+    elif suites:
+        if durations:
+            shards = balance_shards(suites, count,
+                                    weights_by_suite(durations))
+        else:
+            shards = assign_shards(suites, count)
+        selections = [["--suite=" + ",".join(items)] for items in shards]
+    else:
+        raise MbtError("Sharded mtr runs need an explicit --suite list "
+                       "or test names")
+
+    commands = []
+    for i, selection in enumerate(selections):
+        commands.append(["--vardir=/work/build/mysql-test/var-shard" +
+                         str(i),
+                         "--build-thread=" +
+                         str(BUILD_THREAD_BASE + i * BUILD_THREAD_SPACING)] +
+                        other + selection)
+    return commands
+
+
+def parse_results(lines):
+    """Parses the test results from mtr output.
+
+    Returns a dict indexed by (test, combination) with (result, duration
+    in ms) values. For retried tests, the last result counts.
+    """
+    results = {}
+    for line in lines:
+        match = RESULT_RE.match(line.strip())
+        if not match:
+            continue
+        duration = match.group("duration")
+        results[(match.group("test"), match.group("combination"))] = (
+                match.group("result"),
+                int(duration) if duration else None)
+    return results
+
+
+def parse_log(path):
+    with gzip.open(path, "rt", errors="replace") as f:
+        return parse_results(f)
+
+
+def result_label(key):
+    test, combination = key
+    return test + (" '" + combination + "'" if combination else "")
+
+
+def merge_report(shard_results):
+    """Merges the per-shard results into report lines.
+
+    Returns (lines, failed) where failed is the list of failed tests.
+    """
+    counts = {}
+    failed = []
+    for i, results in enumerate(shard_results):
+        for key, (result, _) in sorted(results.items(),
+                                       key=lambda r: (r[0][0],
+                                                      r[0][1] or "")):
+            counts[result] = counts.get(result, 0) + 1
+            if result in FAILED_RESULTS:
+                failed.append(result_label(key) + " (shard " + str(i) + ")")
+
+    total = sum(counts.values())
+    lines = [str(total) + " test(s): " +
+             ", ".join(k + ": " + str(v) for k, v in sorted(counts.items()))]
+    if failed:
+        lines.append("Failed tests:")
+        lines += [" " + f for f in failed]
+    return lines, failed
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import time
+
+PASSED_RESULTS = ["pass", "retry-pass"]
+
+
+class MtrResults:
+    """Persistent store of the mtr test results of the workspace"""
+
+    def __init__(self, root_dir):
+        state_dir = os.path.join(root_dir, ".mbt")
+        os.makedirs(state_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(state_dir, "mtr.sqlite"),
+                                  timeout=30)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    test TEXT NOT NULL,
+                    combination TEXT,
+                    result TEXT NOT NULL,
+                    duration INTEGER,
+                    topic TEXT,
+                    series TEXT,
+                    variant TEXT,
+                    commit_id TEXT,
+                    recorded REAL
+                )""")
+            self.db.execute("""
+                CREATE INDEX IF NOT EXISTS results_by_test
+                ON results (series, variant, test)""")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, results, topic, series, variant, commit_id):
+        """Stores the results returned by mtr.parse_results"""
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                    "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(test, combination, result, duration, topic, series,
+                      variant, commit_id, now)
+                     for (test, combination), (result, duration)
+                     in results.items()])
+
+    def durations(self, series=None, variant=None):
+        """Average duration (ms) of the passing runs of every test.
+
+        Timings of the same series / variant are preferred, other runs are
+        only used for tests without such history.
+        """
+        query = ("SELECT test, AVG(duration) AS duration FROM results "
+                 "WHERE duration IS NOT NULL AND result IN (" +
+                 ", ".join("?" for _ in PASSED_RESULTS) + ")")
+        durations = {}
+        for filters in [[], [("series", series)],
+                        [("series", series), ("variant", variant)]]:
+            filters = [(k, v) for k, v in filters if v is not None]
+            rows = self.db.execute(
+                    query +
+                    "".join(" AND " + k + " = ?" for k, _ in filters) +
+                    " GROUP BY test",
+                    PASSED_RESULTS + [v for _, v in filters])
+            for row in rows:
+                durations[row["test"]] = row["duration"]
+        return durations
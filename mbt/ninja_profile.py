@@ -0,0 +1,276 @@
+import collections
+import json
+import os
+
+Step = collections.namedtuple("Step", ["start", "end", "outputs"])
+Edge = collections.namedtuple("Edge", ["rule", "inputs"])
+
+COMPILE_EXTENSIONS = [".o", ".obj"]
+LINK_EXTENSIONS = [".so", ".a"]
+
+PROFILES_DIR = os.path.join(".mbt", "profiles")
+
+
+def parse_log(lines):
+    """Parses a .ninja_log (v5) into steps, in the order they finished.
+
+    Commands with several outputs are logged once per output, these are
+    merged into a single step.
+    """
+    steps = []
+    index = {}
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 5:
+            continue
+        start, end = int(fields[0]), int(fields[1])
+        key = (start, end, fields[4])
+        if key in index:
+            steps[index[key]].outputs.append(fields[3])
+        else:
+            index[key] = len(steps)
+            steps.append(Step(start, end, [fields[3]]))
+    return steps
+
+
+def read_log(build_dir):
+    path = os.path.join(build_dir, ".ninja_log")
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return parse_log(f)
+
+
+def last_build(steps):
+    """The steps of the last ninja invocation.
+
+    Times are relative to the start of every invocation and steps are
+    logged as they finish, so a decreasing end time starts a new build.
+    """
+    first = 0
+    for i in range(1, len(steps)):
+        if steps[i].end < steps[i - 1].end:
+            first = i
+    return steps[first:]
+
+
+def duration(step):
+    return step.end - step.start
+
+
+def split_words(text):
+    """Splits ninja paths separated by spaces, the first unescaped colon
+    is a word of its own"""
+    words = []
+    word = ""
+    colon = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == "$" and i + 1 < len(text):
+            word += text[i + 1]
+            i += 2
+            continue
+        if c == " " or (c == ":" and not colon):
+            if word:
+                words.append(word)
+            word = ""
+            if c == ":":
+                colon = True
+                words.append(":")
+        else:
+            word += c
+        i += 1
+    if word:
+        words.append(word)
+    return words
+
+
+def parse_build_statement(statement):
+    """Returns the outputs, the rule and the inputs of a ninja build
+    statement.
+
+    The inputs are the explicit and implicit ones, order-only
+    dependencies and validations are skipped.
+    """
+    words = split_words(statement[len("build "):])
+    if ":" not in words:
+        return words, None, []
+    i = words.index(":")
+    outputs = [w for w in words[:i] if w != "|"]
+    rule = words[i + 1] if i + 1 < len(words) else None
+    inputs = []
+    for word in words[i + 2:]:
+        if word in ["||", "|@"]:
+            break
+        if word != "|":
+            inputs.append(word)
+    return outputs, rule, inputs
+
+
+def read_build_graph(build_dir):
+    """The edge (rule and inputs) building each output, from the
+    build.ninja"""
+    path = os.path.join(build_dir, "build.ninja")
+    graph = {}
+    if not os.path.isfile(path):
+        return graph
+    statement = ""
+    with open(path, errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if statement:
+                statement += line.lstrip()
+            elif line.startswith("build "):
+                statement = line
+            else:
+                continue
+            # A line ending with an escaped newline continues
+            if (len(statement) - len(statement.rstrip("$"))) % 2:
+                statement = statement[:-1]
+                continue
+            outputs, rule, inputs = parse_build_statement(statement)
+            statement = ""
+            edge = Edge(rule, inputs)
+            for output in outputs:
+                graph[output] = edge
+    return graph
+
+
+def step_kind(step, graph={}):
+    """Classifies the step by its ninja rule (CMake names them e.g.
+    CXX_COMPILER__sql_Debug, CXX_EXECUTABLE_LINKER__mysqld_Debug), or the
+    extension of its output when the rule isn't known"""
+    edge = graph.get(step.outputs[0])
+    if edge and edge.rule:
+        if "_LINKER" in edge.rule:
+            return "link"
+        if "_COMPILER" in edge.rule:
+            return "compile"
+        return "other"
+    ext = os.path.splitext(step.outputs[0])[1]
+    if ext in COMPILE_EXTENSIONS:
+        return "compile"
+    if ext in LINK_EXTENSIONS or ".so." in step.outputs[0]:
+        return "link"
+    return "other"
+
+
+def summary(steps):
+    """Wall time, summed step time (ms) and the average parallelism"""
+    if not steps:
+        return {"steps": 0, "wall": 0, "cpu": 0, "parallelism": 0}
+    wall = max(s.end for s in steps) - min(s.start for s in steps)
+    cpu = sum(duration(s) for s in steps)
+    return {"steps": len(steps), "wall": wall, "cpu": cpu,
+            "parallelism": cpu / wall if wall else 0}
+
+
+def slowest(steps, kind=None, count=10, graph={}):
+    return sorted((s for s in steps
+                   if kind is None or step_kind(s, graph) == kind),
+                  key=duration, reverse=True)[:count]
+
+
+def critical_path(steps, graph):
+    """The longest chain of dependent steps of the build, last step first.
+
+    Steps depend on the steps building their inputs, also through phony
+    edges. Outputs which weren't rebuilt end the chain, and so do the
+    steps missing from the graph. Chains are weighted by the step
+    durations of the log.
+    """
+    # Steps are identified by their position in the finish order,
+    # dependencies finish before their dependents start
+    ordered = sorted(steps, key=lambda s: (s.end, s.start))
+    by_output = {}
+    for i, step in enumerate(ordered):
+        for output in step.outputs:
+            by_output[output] = i
+    phony_deps = {}
+
+    def deps(output, seen):
+        edge = graph.get(output)
+        if edge is None:
+            return []
+        found = []
+        for i in edge.inputs:
+            if i in by_output:
+                found.append(by_output[i])
+            elif i in graph and graph[i].rule == "phony" and i not in seen:
+                seen.add(i)
+                if i not in phony_deps:
+                    phony_deps[i] = deps(i, seen)
+                found += phony_deps[i]
+        return found
+
+    length = []
+    previous = []
+    for i, step in enumerate(ordered):
+        best = None
+        for output in step.outputs:
+            for dep in deps(output, set()):
+                if dep < i and (best is None or length[dep] > length[best]):
+                    best = dep
+        length.append(duration(step) +
+                      (length[best] if best is not None else 0))
+        previous.append(best)
+    if not ordered:
+        return []
+    i = max(range(len(ordered)), key=lambda i: length[i])
+    path = []
+    while i is not None:
+        path.append(ordered[i])
+        i = previous[i]
+    return path
+
+
+def step_durations(steps):
+    return dict((s.outputs[0], duration(s)) for s in steps)
+
+
+def compare(base, other, count=10):
+    """Largest per-output duration changes between two profiles.
+
+    base and other are dicts of output -> duration, returns (output, base
+    duration, other duration) tuples, outputs only in one of them are
+    skipped.
+    """
+    common = set(base) & set(other)
+    return sorted(((o, base[o], other[o]) for o in common),
+                  key=lambda c: abs(c[2] - c[1]), reverse=True)[:count]
+
+
+def profile_path(root_dir, topic, series, variant, commit_id):
+    return os.path.join(root_dir, PROFILES_DIR,
+                        "-".join([topic, series, variant, commit_id]) +
+                        ".json")
+
+
+def save_profile(path, steps):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([[s.start, s.end, s.outputs] for s in steps], f)
+
+
+def load_profile(path):
+    with open(path) as f:
+        return [Step(*s) for s in json.load(f)]
+
+
+def find_profile(root_dir, topic, series, variant, commit):
+    """Path of the saved profile of the commit (or a prefix of its id)"""
+    directory = os.path.join(root_dir, PROFILES_DIR)
+    prefix = "-".join([topic, series, variant]) + "-"
+
+    def matches_commit(name):
+        # Variants can contain dashes, commit ids can't
+        commit_id = name[len(prefix):-len(".json")]
+        return (name.startswith(prefix) and name.endswith(".json") and
+                "-" not in commit_id and commit_id.startswith(commit))
+
+    matches = (sorted(f for f in os.listdir(directory) if matches_commit(f))
+               if os.path.isdir(directory) else [])
+    return os.path.join(directory, matches[0]) if len(matches) == 1 else None
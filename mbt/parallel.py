@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .mbt_error import MbtError
+
+
+def default_jobs():
+    return min(8, (os.cpu_count() or 1) * 2)
+
+
+def run_parallel(tasks, jobs=None, label="task", progress=True):
+    """Runs the given (name, callable) pairs on a bounded thread pool.
+
+    Prints a progress line with the elapsed time whenever an item finishes,
+    and once everything is done, the total time and a summary of the failed
+    items. With progress disabled, only the failures are reported.
+    Returns a dict with the results of the callables, indexed by the names.
+
+    Raises an MbtError if any of the tasks failed.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return {}
+
+    jobs = max(1, min(jobs or default_jobs(), len(tasks)))
+    results = {}
+    failures = {}
+    output_lock = threading.Lock()
+    total = len(tasks)
+
+    def report(done, name, status, elapsed):
+        if not progress:
+            return
+        with output_lock:
+            print("[" + str(done) + "/" + str(total) + "] " +
+                  label + " " + name + ": " + status +
+                  " ({:.1f}s)".format(elapsed))
+            sys.stdout.flush()
+
+    def timed(fn):
+        def run():
+            start = time.monotonic()
+            try:
+                return fn(), time.monotonic() - start
+            except Exception as e:
+                e.mbt_elapsed = time.monotonic() - start
+                raise
+        return run
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(timed(fn)): name for name, fn in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                results[name], elapsed = future.result()
+                report(done, name, "done", elapsed)
+            except Exception as e:
+                failures[name] = e
+                report(done, name, "FAILED", getattr(e, "mbt_elapsed", 0))
+
+    if progress:
+        print("Finished " + str(total) + " " + label + "(s) in " +
+              "{:.1f}s".format(time.monotonic() - start))
+
+    if failures:
+        print(str(len(failures)) + " of " + str(total) + " " + label +
+              "(s) failed:")
+        for name, e in failures.items():
+            print(" " + name + ": " + str(e).strip())
+        raise MbtError(label + " failed for: " + ", ".join(failures.keys()))
+
+    return results
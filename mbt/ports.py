@@ -0,0 +1,44 @@
+import socket
+
+from .mbt_error import MbtError
+
+FIRST_PORT = 10000
+LAST_PORT = 10999
+DEFAULT_PORT = 3306
+
+
+def read_port(config_file):
+    """The server port configured in a my.cnf"""
+    section = None
+    with open(config_file) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                section = line.strip("[]")
+            elif (section == "mysqld" and "=" in line and
+                  line.split("=", 1)[0].strip() == "port"):
+                return int(line.split("=", 1)[1])
+    return DEFAULT_PORT
+
+
+def port_free(port):
+    """Whether the port can be bound on the host"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind(("", port))
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
+def allocate_port(taken, first=FIRST_PORT, last=LAST_PORT,
+                  is_free=port_free):
+    """The first port not taken by another installation, and not used on
+    the host"""
+    for port in range(first, last + 1):
+        if port not in taken and is_free(port):
+            return port
+    raise MbtError("No free port between " + str(first) + " and " +
+                   str(last))
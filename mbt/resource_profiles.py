@@ -0,0 +1,103 @@
+import os
+
+from .mbt_error import MbtError
+
+FIELDS = ["cpus", "cpuset", "numa_node", "memory", "hugepages"]
+DEFAULT_PROFILE = {"cpus": "1"}
+
+
+def parse_cpulist(cpulist):
+    """Expands a cpu list like "0-3,8" into the list of cpus"""
+    cpus = []
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus += range(int(first), int(last) + 1)
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_cpulist(node):
+    path = "/sys/devices/system/node/node" + str(node) + "/cpulist"
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except IOError:
+        raise MbtError("Unknown NUMA node: " + str(node))
+
+
+def resolve_profile(config, buildconf, name=None, overrides={},
+                    default=DEFAULT_PROFILE):
+    """Merges the resource settings of a command.
+
+    Later sources override earlier ones: the default, the profile of the
+    build config, the profile given by name, then the explicit overrides
+    (None values are ignored). A NUMA node given without a cpuset replaces
+    the cpuset of the earlier sources with the cpus of the node.
+    """
+    layers = []
+    for profile_name in [buildconf.get("resource_profile"), name]:
+        if profile_name is None:
+            continue
+        if profile_name not in config.resource_profiles:
+            raise MbtError("Unknown resource profile: " + profile_name)
+        layers.append(config.resource_profiles[profile_name])
+    layers.append(overrides)
+    profile = dict(default)
+    for layer in layers:
+        layer = dict((k, v) for k, v in layer.items() if v is not None)
+        if "numa_node" in layer and "cpuset" not in layer:
+            profile.pop("cpuset", None)
+        profile.update(layer)
+    if profile.get("numa_node") is not None and not profile.get("cpuset"):
+        profile["cpuset"] = numa_cpulist(profile["numa_node"])
+    return profile
+
+
+def docker_args(profile):
+    args = []
+    if profile.get("cpus"):
+        args.append("--cpus=" + str(profile["cpus"]))
+    if profile.get("cpuset"):
+        args.append("--cpuset-cpus=" + profile["cpuset"])
+    if profile.get("numa_node") is not None:
+        args.append("--cpuset-mems=" + str(profile["numa_node"]))
+    if profile.get("memory"):
+        args.append("--memory=" + str(profile["memory"]))
+    if profile.get("hugepages"):
+        # Large pages have to be locked in memory by the server, and
+        # SHM_HUGETLB needs CAP_IPC_LOCK (the server runs as a non-root user,
+        # outside of vm.hugetlb_shm_group)
+        args += ["--ulimit", "memlock=-1:-1", "--cap-add=IPC_LOCK"]
+    return args
+
+
+def mysqld_args(profile):
+    return ["--large-pages"] if profile.get("hugepages") else []
+
+
+def effective_cpus(profile):
+    """The number of cpus the container can actually use"""
+    cpus = float(profile["cpus"]) if profile.get("cpus") else None
+    if profile.get("cpuset"):
+        count = len(parse_cpulist(profile["cpuset"]))
+        cpus = min(cpus, count) if cpus else count
+    if cpus is None:
+        cpus = len(os.sched_getaffinity(0))
+    return cpus
+
+
+def describe(profile):
+    parts = ["{:g} cpus".format(effective_cpus(profile))]
+    if profile.get("cpuset"):
+        parts.append("cpuset " + profile["cpuset"])
+    if profile.get("numa_node") is not None:
+        parts.append("NUMA node " + str(profile["numa_node"]))
+    parts.append("memory " + (str(profile["memory"])
+                              if profile.get("memory") else "unlimited"))
+    parts.append("huge pages " + ("on" if profile.get("hugepages")
+                                  else "off"))
+    return ", ".join(parts)
@@ -0,0 +1,138 @@
+import contextlib
+import itertools
+import os
+import re
+
+MB = 1024 * 1024
+
+# Estimated peak memory of a compiler job in MB, sanitizer and valgrind
+# instrumented code (and debug info) makes the translation units heavier
+MEMORY_PER_JOB = {"release": 1024, "debug": 1536, "valgrind": 2048,
+                  "sanitizer": 3072}
+SANITIZER_OPTIONS = ["WITH_ASAN", "WITH_MSAN", "WITH_TSAN", "WITH_UBSAN"]
+PARALLELISM_ARG_RE = re.compile(r"^(-j\d*|--jobs(=.*)?|-l[\d.]*|"
+                                r"--load-average(=.*)?|--max-load(=.*)?)$")
+
+BUILDS_DIR = os.path.join(".mbt", "builds")
+build_ids = itertools.count()
+
+
+def host_cpu_count():
+    """Number of cores this process is allowed to use."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def host_memory():
+    """Available memory of the host in bytes, based on /proc/meminfo.
+
+    Returns None if it can't be determined.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except IOError:
+        return None
+    for key in ["MemAvailable", "MemTotal"]:
+        if key in fields:
+            return int(fields[key].split()[0]) * 1024
+    return None
+
+
+def split_resources(count, cpus, memory):
+    """Splits the host's cores and memory evenly across count containers.
+
+    Returns a dict with the build tool parallelism (jobs), and the docker
+    cpu / memory limits for one container.
+    """
+    count = max(1, count)
+    slot = {"jobs": max(1, cpus // count),
+            "cpus": max(1.0, round(cpus / count, 2)),
+            "memory": None}
+    if memory:
+        slot["memory"] = max(512, memory // count // MB)
+    return slot
+
+
+def docker_limit_args(slot):
+    args = ["--cpus=" + str(slot["cpus"])]
+    if slot["memory"]:
+        args.append("--memory=" + str(slot["memory"]) + "m")
+    return args
+
+
+def memory_per_job(name, buildconf):
+    """Estimated memory (MB) of one compiler job of the build config"""
+    if buildconf.get("memory_per_job"):
+        return buildconf["memory_per_job"]
+    config = buildconf["config"]
+    if (any(config.get(o) == "ON" for o in SANITIZER_OPTIONS) or
+            re.search(r"[atmu]san", name)):
+        return MEMORY_PER_JOB["sanitizer"]
+    if config.get("WITH_VALGRIND") == "ON" or "valgrind" in name:
+        return MEMORY_PER_JOB["valgrind"]
+    if config.get("CMAKE_BUILD_TYPE") == "Debug":
+        return MEMORY_PER_JOB["debug"]
+    return MEMORY_PER_JOB["release"]
+
+
+def build_parallelism(cpus, memory, per_job, others=0):
+    """Returns the (jobs, load average limit) of a build.
+
+    The cores and the available memory are shared evenly with the other
+    running builds, and jobs are limited by both. The load limit keeps
+    the whole host from being oversubscribed.
+    """
+    jobs = max(1, cpus // (others + 1))
+    if memory:
+        jobs = min(jobs, max(1, memory // MB // (others + 1) // per_job))
+    return jobs, cpus
+
+
+def has_parallelism_args(args):
+    return any(PARALLELISM_ARG_RE.match(a) for a in args)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def running_builds(root_dir):
+    """Number of builds of other mbt processes in the workspace"""
+    builds_dir = os.path.join(root_dir, BUILDS_DIR)
+    count = 0
+    for marker in (os.listdir(builds_dir) if os.path.isdir(builds_dir)
+                   else []):
+        pid = int(marker.split("-", 1)[0])
+        if pid == os.getpid():
+            continue
+        if pid_alive(pid):
+            count += 1
+        else:
+            try:
+                os.remove(os.path.join(builds_dir, marker))
+            except OSError:
+                pass
+    return count
+
+
+@contextlib.contextmanager
+def running_build(root_dir):
+    """Marks a build as running for running_builds, while in the block"""
+    builds_dir = os.path.join(root_dir, BUILDS_DIR)
+    os.makedirs(builds_dir, exist_ok=True)
+    marker = os.path.join(builds_dir, str(os.getpid()) + "-" +
+                          str(next(build_ids)))
+    open(marker, "w").close()
+    try:
+        yield
+    finally:
+        os.remove(marker)
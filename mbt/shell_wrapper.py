@@ -0,0 +1,19 @@
+# Runs "$@" from a wrapper shell, leaving its exit code in $rc.
+#
+# The wrapper is the main process of the container, the only one docker
+# signals (docker stop, or the sig-proxy of the client), so the command
+# runs in the background and INT / TERM are forwarded to it as TERM. The
+# wait is repeated until the command actually exited. Background commands
+# get /dev/null as stdin, the original one is passed on explicitly.
+RUN_FORWARDING_SIGNALS = """\
+exec 3<&0
+"$@" <&3 3<&- &
+pid=$!
+exec 3<&-
+trap 'kill -TERM $pid 2>/dev/null' INT TERM
+while :; do
+  wait $pid
+  rc=$?
+  kill -0 $pid 2>/dev/null || break
+done
+"""
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import time
+
+from .shell_wrapper import RUN_FORWARDING_SIGNALS
+
+# Stats files are written into the build dir by the wrapped commands
+STATS_SUBDIR = ".mbt-stats"
+CONTAINER_STATS_DIR = "/work/build/" + STATS_SUBDIR
+
+# Runs the command and records the CPU usage and the peak memory of the
+# container cgroup, also when it's interrupted. Works with both cgroup v2
+# and v1.
+STATS_WRAPPER = """
+cpu_usage() {
+  if [ -r /sys/fs/cgroup/cpu.stat ]; then
+    sed -n "s/^usage_usec //p" /sys/fs/cgroup/cpu.stat
+  elif [ -r /sys/fs/cgroup/cpuacct/cpuacct.usage ]; then
+    echo $(( $(cat /sys/fs/cgroup/cpuacct/cpuacct.usage) / 1000 ))
+  fi
+}
+peak_memory() {
+  cat /sys/fs/cgroup/memory.peak 2>/dev/null ||
+    cat /sys/fs/cgroup/memory/memory.max_usage_in_bytes 2>/dev/null
+}
+stats=$1
+shift
+before=$(cpu_usage)
+""" + RUN_FORWARDING_SIGNALS + """\
+mkdir -p "${stats%/*}"
+echo "cpu_before=$before cpu_after=$(cpu_usage) peak=$(peak_memory)" \\
+  > "$stats"
+exit $rc
+"""
+
+
+def stats_name(command, suffix=""):
+    return command + "-" + str(os.getpid()) + suffix + ".stats"
+
+
+def wrap_command(cmd, name):
+    """Wraps cmd to write its resource usage to the named stats file"""
+    return (["sh", "-c", STATS_WRAPPER, "mbt-stats",
+             CONTAINER_STATS_DIR + "/" + name] + cmd)
+
+
+def parse_stats(content):
+    """Returns (cpu time in seconds, peak memory in bytes) of stats.
+
+    Values which couldn't be measured are None.
+    """
+    fields = dict(f.split("=", 1) for f in content.split() if "=" in f)
+
+    def number(key):
+        value = fields.get(key, "")
+        return int(value) if value.isdigit() else None
+
+    before = number("cpu_before")
+    after = number("cpu_after")
+    cpu = (after - before) / 1e6 if None not in [before, after] else None
+    return cpu, number("peak")
+
+
+def read_stats(build_dir, name):
+    """Reads and removes the stats file, returns (cpu time, peak memory)"""
+    path = os.path.join(build_dir, STATS_SUBDIR, name)
+    try:
+        with open(path) as f:
+            content = f.read()
+        os.remove(path)
+    except (IOError, OSError):
+        return None, None
+    return parse_stats(content)
+
+
+def combine_stats(stats):
+    """Total CPU time and highest peak memory of concurrent containers"""
+    cpus = [c for c, _ in stats if c is not None]
+    peaks = [p for _, p in stats if p is not None]
+    return (sum(cpus) if cpus else None), (max(peaks) if peaks else None)
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def find_regressions(rows, threshold=0.2, window=5):
+    """Compares the last successful run of every command / series / variant
+    with the median of the previous successful runs.
+
+    rows have to be ordered by their start time. Returns a list of
+    (command, series, variant, metric, last, baseline) for the metrics
+    which grew more than threshold.
+    """
+    groups = {}
+    for row in rows:
+        if row["exit_code"] != 0:
+            continue
+        key = (row["command"], row["series"], row["variant"])
+        groups.setdefault(key, []).append(row)
+
+    regressions = []
+    for key, runs in sorted(groups.items()):
+        if len(runs) < 2:
+            continue
+        last = runs[-1]
+        previous = runs[-window - 1:-1]
+        for metric in ["wall_time", "cpu_time", "peak_memory"]:
+            baseline = median([r[metric] for r in previous
+                               if r[metric] is not None])
+            if (baseline and last[metric] is not None and
+                    last[metric] > baseline * (1 + threshold)):
+                regressions.append(key + (metric, last[metric], baseline))
+    return regressions
+
+
+class BuildHistory:
+    """Persistent store of the resource usage of the build commands"""
+
+    def __init__(self, root_dir):
+        state_dir = os.path.join(root_dir, ".mbt")
+        os.makedirs(state_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(state_dir, "history.sqlite"),
+                                  timeout=30)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS invocations (
+                    command TEXT NOT NULL,
+                    topic TEXT,
+                    series TEXT,
+                    variant TEXT,
+                    commit_id TEXT,
+                    started REAL,
+                    wall_time REAL,
+                    cpu_time REAL,
+                    peak_memory INTEGER,
+                    exit_code INTEGER
+                )""")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, command, topic, series, variant, commit_id, started,
+               wall_time, cpu_time, peak_memory, exit_code):
+        with self.db:
+            self.db.execute(
+                    "INSERT INTO invocations VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (command, topic, series, variant, commit_id, started,
+                     wall_time, cpu_time, peak_memory, exit_code))
+
+    def query(self, command=None, topic=None, series=None, variant=None,
+              since=None):
+        conditions = []
+        values = []
+        for column, value in [("command", command), ("topic", topic),
+                              ("series", series), ("variant", variant)]:
+            if value is not None:
+                conditions.append(column + " = ?")
+                values.append(value)
+        if since is not None:
+            conditions.append("started >= ?")
+            values.append(since)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return self.db.execute("SELECT * FROM invocations" + where +
+                               " ORDER BY started", values).fetchall()
+
+    def last_success(self, command, topic, series, variant):
+        """The latest invocation of the command which exited with 0"""
+        return self.db.execute(
+                "SELECT * FROM invocations WHERE command = ? AND topic = ?"
+                " AND series = ? AND variant = ? AND exit_code = 0"
+                " ORDER BY started DESC LIMIT 1",
+                (command, topic, series, variant)).fetchone()
+
+
+def days_ago(days):
+    return time.time() - days * 24 * 3600
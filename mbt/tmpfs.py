@@ -0,0 +1,113 @@
+import os
+import shlex
+
+from .shell_wrapper import RUN_FORWARDING_SIGNALS
+
+MOUNT_POINT = "/work/tmpfs"
+MTR_DEFAULT_VARDIR = "/work/build/mysql-test/var"
+
+# Copies back after the command exited, also when docker stop / Ctrl-C
+# interrupted it
+COPY_BACK_WRAPPER = RUN_FORWARDING_SIGNALS + """\
+{copy_back}
+exit $rc
+"""
+
+
+def tmpfs_size(buildconf, override=None):
+    """Size of the tmpfs to use, or None if it's disabled.
+
+    The command line override takes precedence over the build config,
+    "0" disables the tmpfs.
+    """
+    size = override if override is not None else buildconf.get("tmpfs")
+    if not size or size == "0":
+        return None
+    return size
+
+
+def tmpfs_args(size):
+    return ["--tmpfs", MOUNT_POINT + ":rw,exec,size=" + size]
+
+
+def copy_command(src, dst):
+    """Shell command replacing dst with a copy of src, if it exists.
+
+    src and dst are shell words. The copy goes to a temporary directory
+    first, dst is only replaced once it succeeded.
+    """
+    return ("if [ -e {0} ]; then mkdir -p \"$(dirname {1})\" && "
+            "rm -rf {1}.mbt-new && cp -a {0} {1}.mbt-new && "
+            "{{ [ ! -e {1} ] || mv {1} {1}.mbt-old; }} && "
+            "mv {1}.mbt-new {1} && rm -rf {1}.mbt-old; fi".format(src, dst))
+
+
+def copy_commands(copies):
+    """Shell commands replacing every destination with its source"""
+    return [copy_command(shlex.quote(src), shlex.quote(dst))
+            for src, dst in copies]
+
+
+def log_copy_commands(tmp_vardir, vardir):
+    """Shell commands copying back the logs of an mtr var directory,
+    including the var/<N>/log directories of the --parallel workers"""
+    return copy_commands([(tmp_vardir + "/log", vardir + "/log")]) + [
+            "for log in {0}/[0-9]*/log; do {1}; done".format(
+                shlex.quote(tmp_vardir),
+                copy_command('"$log"', shlex.quote(vardir) +
+                             '/"${log#' + shlex.quote(tmp_vardir) +
+                             '/}"'))]
+
+
+def wrap_command(cmd, copy_in=[], copy_back=[], directories=[],
+                 copy_back_lines=[]):
+    """Wraps cmd to copy files to the tmpfs before, and back after it.
+
+    copy_in and copy_back are lists of (source, destination) paths,
+    copy_back_lines additional shell commands run after cmd. The exit
+    code of cmd is preserved.
+    """
+    script = "\n".join(["mkdir -p " +
+                        " ".join(shlex.quote(d)
+                                 for d in [MOUNT_POINT] + directories)] +
+                       copy_commands(copy_in) + [""])
+    script += COPY_BACK_WRAPPER.format(
+            copy_back="\n".join(copy_commands(copy_back) + copy_back_lines))
+    return ["sh", "-c", script, "sh"] + cmd
+
+
+def mtr_command(cmd):
+    """Moves the var directory of the mtr command to the tmpfs.
+
+    The logs of the run (test logs, server error logs, reject files, also
+    of the parallel workers) are copied back to the original var
+    directory.
+    """
+    vardir = MTR_DEFAULT_VARDIR
+    args = []
+    for arg in cmd:
+        if arg.startswith("--vardir="):
+            vardir = arg.split("=", 1)[1]
+        else:
+            args.append(arg)
+    tmp_vardir = os.path.join(MOUNT_POINT, os.path.basename(vardir))
+    return wrap_command(args + ["--vardir=" + tmp_vardir],
+                        copy_back_lines=log_copy_commands(tmp_vardir,
+                                                          vardir))
+
+
+def mysqld_command(cmd, defaults_arg):
+    """Moves the datadir and tmpdir of a server command to the tmpfs.
+
+    The datadir of the installation is copied in before the start and
+    back after the server stopped.
+    """
+    datadir = MOUNT_POINT + "/data"
+    tmpdir = MOUNT_POINT + "/tmp"
+    i = cmd.index(defaults_arg) + 1 if defaults_arg in cmd else len(cmd)
+    args = (cmd[:i] + ["--datadir=" + datadir, "--tmpdir=" + tmpdir] +
+            cmd[i:])
+    return wrap_command(args,
+                        copy_in=[("/work/install/data", datadir)],
+                        copy_back=[(datadir, "/work/install/data")],
+                        directories=[tmpdir])
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import subprocess
+
+LABEL = "mbt.warm"
+FINGERPRINT_LABEL = "mbt.fingerprint"
+
+LAST_USE = "/tmp/mbt-last-use"
+BUSY_DIR = "/tmp/mbt-busy"
+
+# Main process of a warm container: exits (and with --rm, removes the
+# container) once no command ran in it for the given number of seconds.
+# Running commands register their pid in BUSY_DIR, so long builds don't
+# count as idle time.
+IDLE_LOOP = """
+mkdir -p {busy}
+touch {last_use}
+while sleep 30; do
+  for f in {busy}/*; do
+    [ -d "/proc/${{f##*/}}" ] && touch {last_use}
+  done
+  idle=$(( $(date +%s) - $(stat -c %Y {last_use}) ))
+  [ "$idle" -ge {timeout} ] && exit 0
+done
+"""
+
+# Wrapper for the commands executed in the warm container
+EXEC_WRAPPER = ("touch {busy}/$$ {last_use}; \"$@\"; rc=$?; "
+                "rm -f {busy}/$$; touch {last_use}; exit $rc"
+                ).format(busy=BUSY_DIR, last_use=LAST_USE)
+
+
+def container_name(topic, version, preset):
+    return "mbt-build-" + topic + "-" + version + "-" + preset
+
+
+def fingerprint(image_id, volumes, env):
+    data = json.dumps({"image": image_id,
+                       "volumes": sorted(volumes),
+                       "env": env}, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def idle_loop(timeout):
+    return IDLE_LOOP.format(busy=BUSY_DIR, last_use=LAST_USE,
+                            timeout=int(timeout))
+
+
+def wrap_command(cmd):
+    return ["sh", "-c", EXEC_WRAPPER, "mbt-exec"] + cmd
+
+
+def docker(*args):
+    return subprocess.run(["/usr/bin/docker"] + list(args),
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL,
+                          universal_newlines=True)
+
+
+def image_id(image):
+    result = docker("image", "inspect", "--format", "{{.Id}}", image)
+    return result.stdout.strip() if result.returncode == 0 else image
+
+
+def container_state(name):
+    """Returns (running, fingerprint) of the container, or None"""
+    result = docker("inspect", "--format",
+                    "{{.State.Running}} {{index .Config.Labels \"" +
+                    FINGERPRINT_LABEL + "\"}}", name)
+    if result.returncode != 0:
+        return None
+    running, fp = (result.stdout.strip().split(" ", 1) + [""])[:2]
+    return running == "true", fp
+
+
+def list_containers():
+    result = docker("ps", "--filter", "label=" + LABEL,
+                    "--format", "{{.Names}}\t{{.Status}}\t{{.Image}}")
+    return [line.split("\t") for line in result.stdout.splitlines() if line]
+
+
+def stop_container(name):
+    return docker("rm", "-f", name).returncode == 0
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import time
+
+from .ports import read_port
+
+KINDS = ["checkout", "build", "installation"]
+
+
+def disk_usage(path):
+    """Disk space used by the files under path, in bytes"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def entry_path(topic, series, variant=None, installation=None):
+    name = series
+    if variant:
+        name += "-" + variant
+    if installation:
+        name += "-inst-" + installation
+    return os.path.join("topics", topic, name)
+
+
+class WorkspaceIndex:
+    """On-disk index of the topic checkouts, builds and installations.
+
+    Entries are keyed by their path relative to the workspace root, and
+    updated by the commands creating / deleting them.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        state_dir = os.path.join(root_dir, ".mbt")
+        os.makedirs(state_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(state_dir, "index.sqlite"),
+                                  timeout=30)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    path TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    topic TEXT,
+                    series TEXT,
+                    variant TEXT,
+                    installation TEXT,
+                    state TEXT,
+                    last_build REAL,
+                    size INTEGER,
+                    cmake_hash TEXT,
+                    updated REAL,
+                    port INTEGER
+                )""")
+            columns = [row["name"] for row in
+                       self.db.execute("PRAGMA table_info(entries)")]
+            if "port" not in columns:
+                self.db.execute("ALTER TABLE entries ADD COLUMN port INTEGER")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def update(self, kind, topic, series, variant=None, installation=None,
+               **fields):
+        """Creates or updates an entry.
+
+        Only the given fields are changed, e.g. state, last_build, size,
+        cmake_hash or port. Returns the path of the entry.
+        """
+        with self.db:
+            return self.write_entry(kind, topic, series, variant,
+                                    installation, fields)
+
+    def write_entry(self, kind, topic, series, variant, installation,
+                    fields):
+        path = entry_path(topic, series, variant, installation)
+        fields["updated"] = time.time()
+        self.db.execute("INSERT OR IGNORE INTO entries "
+                        "(path, kind, topic, series, variant, "
+                        "installation) VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, kind, topic, series, variant, installation))
+        self.db.execute("UPDATE entries SET " +
+                        ", ".join(k + " = ?" for k in fields) +
+                        " WHERE path = ?",
+                        list(fields.values()) + [path])
+        return path
+
+    def update_size(self, path):
+        size = disk_usage(os.path.join(self.root_dir, path))
+        with self.db:
+            self.db.execute("UPDATE entries SET size = ? WHERE path = ?",
+                            (size, path))
+
+    def remove(self, path):
+        with self.db:
+            self.db.execute("DELETE FROM entries WHERE path = ?", (path,))
+
+    def prune(self):
+        """Removes the entries which no longer exist on disk"""
+        removed = [row["path"] for row in self.query()
+                   if not os.path.isdir(os.path.join(self.root_dir,
+                                                     row["path"]))]
+        for path in removed:
+            self.remove(path)
+        return removed
+
+    def query(self, kind=None, topic=None, series=None, variant=None):
+        conditions = []
+        values = []
+        for column, value in [("kind", kind), ("topic", topic),
+                              ("series", series), ("variant", variant)]:
+            if value is not None:
+                conditions.append(column + " = ?")
+                values.append(value)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return self.db.execute("SELECT * FROM entries" + where +
+                               " ORDER BY topic, series, variant, "
+                               "installation, kind",
+                               values).fetchall()
+
+    def used_ports(self):
+        """Ports allocated to the installations"""
+        return set(row["port"] for row in
+                   self.db.execute("SELECT port FROM entries "
+                                   "WHERE port IS NOT NULL"))
+
+    def reserve_port(self, topic, series, variant, installation, allocate):
+        """Records the port allocate(used ports) returns for the
+        installation.
+
+        Reading the used ports and the reservation happen in one write
+        transaction, so concurrent installs get different ports.
+        """
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            port = allocate(self.used_ports())
+            self.write_entry("installation", topic, series, variant,
+                             installation, {"port": port})
+        return port
+
+    def scan(self, config):
+        """Lists the entries found in the directories under topics/.
+
+        Returns (kind, topic, series, variant, installation) tuples.
+        """
+        topics_dir = os.path.join(self.root_dir, "topics")
+        found = []
+        if os.path.isdir(topics_dir):
+            for topic in sorted(os.listdir(topics_dir)):
+                if not os.path.isdir(os.path.join(topics_dir, topic)):
+                    continue
+                for name in sorted(os.listdir(os.path.join(topics_dir,
+                                                           topic))):
+                    entry = self.classify(config, topic, name)
+                    if entry:
+                        found.append(entry)
+        return found
+
+    def rescan(self, config):
+        """Rebuilds the index from the directories under topics/"""
+        for kind, topic, series, variant, installation in self.scan(config):
+            known = self.query(kind, topic, series, variant)
+            path = entry_path(topic, series, variant, installation)
+            if not any(row["path"] == path for row in known):
+                self.update(kind, topic, series, variant, installation,
+                            state="found")
+            config_file = os.path.join(self.root_dir, path, "etc", "my.cnf")
+            if kind == "installation" and os.path.isfile(config_file):
+                self.update(kind, topic, series, variant, installation,
+                            port=read_port(config_file))
+            self.update_size(path)
+        self.prune()
+
+    def classify(self, config, topic, name):
+        if not os.path.isdir(os.path.join(self.root_dir, "topics", topic,
+                                          name)):
+            return None
+        parts = name.split("-", 1)
+        if not config.has_series(parts[0]):
+            return None
+        if len(parts) == 1:
+            return ("checkout", topic, parts[0], None, None)
+        instparts = parts[1].split("-inst-", 1)
+        if not config.has_build_config(instparts[0]):
+            return None
+        if len(instparts) == 2:
+            return ("installation", topic, parts[0], instparts[0],
+                    instparts[1])
+        return ("build", topic, parts[0], instparts[0], None)
@@ -0,0 +1,97 @@
+import os
+import subprocess
+
+import git
+
+
+def find_worktrees(config, root_dir):
+    """Returns (path, topic, series) for every series / topic checkout"""
+    worktrees = []
+    for ver in config.series:
+        path = os.path.join("versions", ver)
+        if os.path.isdir(os.path.join(root_dir, path)):
+            worktrees.append((path, None, ver))
+    topics_dir = os.path.join(root_dir, "topics")
+    if os.path.isdir(topics_dir):
+        for topic in sorted(os.listdir(topics_dir)):
+            for ver in config.series:
+                path = os.path.join("topics", topic, ver)
+                if os.path.isdir(os.path.join(root_dir, path)):
+                    worktrees.append((path, topic, ver))
+    return worktrees
+
+
+def ahead_behind(g, ref, other):
+    """Returns the (ahead, behind) commit counts of ref compared to other"""
+    try:
+        counts = g.rev_list("--left-right", "--count", ref + "..." + other)
+    except git.exc.GitCommandError:
+        return None
+    ahead, behind = counts.split()
+    return int(ahead), int(behind)
+
+
+def worktree_status(root_dir, path, topic, series):
+    g = git.Git(os.path.join(root_dir, path))
+    status = {"path": path, "topic": topic, "series": series}
+    status["branch"] = g.rev_parse("--abbrev-ref", "HEAD")
+    changes = [line[3:] for line in
+               g.status("--porcelain", "--untracked-files=no").splitlines()
+               if line]
+    status["dirty"] = len(changes)
+    status["series_diff"] = (ahead_behind(g, "HEAD", series)
+                             if topic else None)
+    status["remote_diff"] = ahead_behind(g, "HEAD", "HEAD@{upstream}")
+    if status["remote_diff"] is None and not topic:
+        status["remote_diff"] = ahead_behind(g, "HEAD", "origin/" + series)
+
+    status["head"] = g.rev_parse("HEAD")
+
+    # Last modification of the uncommitted changes, committed ones are
+    # compared by the commit id of the build
+    changed = None
+    for f in changes:
+        try:
+            mtime = os.stat(os.path.join(root_dir, path, f)).st_mtime
+            changed = max(changed or 0, mtime)
+        except OSError:
+            pass
+    status["source_changed"] = changed
+    return status
+
+
+def build_freshness(state, last_build, built_commit, head, source_changed):
+    """Compares a build with its sources.
+
+    built_commit is the commit of the last successful make, a build of
+    another commit is outdated even if its files are newer, e.g. after
+    checking out an older commit.
+    """
+    if state is None or last_build is None:
+        return "not built"
+    if state != "built":
+        return state
+    if built_commit is not None and head is not None and \
+            built_commit != head:
+        return "outdated"
+    if source_changed is not None and source_changed > last_build:
+        return "outdated"
+    return "up to date"
+
+
+def running_containers():
+    try:
+        result = subprocess.run(["/usr/bin/docker", "ps",
+                                 "--format", "{{.Names}}"],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                universal_newlines=True)
+    except OSError:
+        return set()
+    return set(result.stdout.split())
+
+
+def format_diff(diff):
+    if diff is None:
+        return "-"
+    return "+" + str(diff[0]) + "/-" + str(diff[1])
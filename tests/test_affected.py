@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+
+from context import mbt
+from mbt import affected
+
+assert mbt
+
+SUITES = ["main", "binlog", "innodb", "innodb_fts", "rpl", "tokudb",
+          "audit_log"]
+
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def run_git(cwd, *args):
+    subprocess.check_call(["git", "-c", "user.name=t", "-c",
+                           "user.email=t@t"] + list(args),
+                          cwd=cwd, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL)
+
+
+def test_test_of():
+    assert affected.test_of("mysql-test/t/alias.test") == "main.alias"
+    assert affected.test_of("mysql-test/r/alias.result") == "main.alias"
+    assert affected.test_of("mysql-test/suite/innodb/r/foo,zip.rdiff") == \
+        "innodb.foo"
+    assert affected.test_of("mysql-test/suite/rpl/t/rpl_x-master.opt") == \
+        "rpl.rpl_x"
+    assert affected.test_of("mysql-test/t/foo-client.opt") == "main.foo"
+    assert affected.test_of("mysql-test/t/foo-slave.test") == \
+        "main.foo-slave"
+    assert affected.test_of("mysql-test/include/have_innodb.inc") is None
+    assert affected.test_of("sql/sql_parse.cc") is None
+
+
+def test_component_suites():
+    assert affected.component_suites("storage/innobase/row/row0mysql.cc",
+                                     SUITES) == ["innodb", "innodb_fts"]
+    assert affected.component_suites("plugin/audit_log/audit_log.c",
+                                     SUITES) == ["audit_log"]
+    assert affected.component_suites("sql/rpl_slave.cc", SUITES) == ["rpl"]
+    assert affected.component_suites("sql/sql_parse.cc", SUITES) == []
+
+
+def test_select_tests():
+    changed = ["mysql-test/t/alias.test", "mysql-test/r/alias.result",
+               "mysql-test/suite/rpl/t/rpl_foo.test",
+               "storage/innobase/handler/ha_innodb.cc",
+               "storage/innobase/include/univ.i",
+               "mysql-test/suite/innodb/t/bar.test",
+               "sql/unused.cc",
+               "Docs/README"]
+    suites, tests, reasons = affected.select_tests(
+            changed, SUITES, compiled={"storage/innobase/handler/"
+                                       "ha_innodb.cc"})
+    assert suites == ["innodb", "innodb_fts"]
+    assert tests == ["main.alias", "rpl.rpl_foo"]
+    assert "sql/unused.cc: not compiled in this build" in reasons
+    assert "Docs/README: no related tests" in reasons
+    assert len(reasons) == len(changed)
+
+
+def test_select_tests_without_compile_commands():
+    suites, tests, _ = affected.select_tests(["sql/sql_parse.cc"], SUITES)
+    assert suites == ["main"]
+    assert tests == []
+
+
+def test_include_users(tmp_path):
+    src = str(tmp_path)
+    write(os.path.join(src, "mysql-test/include/have_foo.inc"))
+    write(os.path.join(src, "mysql-test/t/a.test"),
+          "--source include/have_foo.inc\nSELECT 1;\n")
+    write(os.path.join(src, "mysql-test/suite/rpl/t/b.test"),
+          "source include/have_foo.inc;\n")
+    write(os.path.join(src, "mysql-test/t/c.test"),
+          "--source include/have_foo_bar.inc\n")
+    suites, tests, reasons = affected.select_tests(
+            ["mysql-test/include/have_foo.inc"], SUITES, src_dir=src)
+    assert suites == []
+    assert tests == ["main.a", "rpl.b"]
+    assert reasons == ["mysql-test/include/have_foo.inc: sourced by 2 "
+                       "test(s)"]
+
+
+def test_suite_files(tmp_path):
+    suites, tests, _ = affected.select_tests(
+            ["mysql-test/suite/rpl/my.cnf",
+             "mysql-test/suite/rpl/t/rpl_foo.test",
+             "mysql-test/suite/innodb/include/x.inc"],
+            SUITES, src_dir=str(tmp_path))
+    assert suites == ["innodb", "rpl"]
+    assert tests == []
+
+
+def test_mtr_selection_args():
+    assert affected.mtr_selection_args([], ["main.a", "rpl.b"]) == \
+        ["main.a", "rpl.b"]
+    assert affected.mtr_selection_args(["innodb"], ["rpl.b"]) == \
+        ["--suite=innodb,rpl"]
+
+
+def test_compiled_sources(tmp_path):
+    assert affected.compiled_sources(str(tmp_path)) is None
+    write(os.path.join(str(tmp_path), "compile_commands.json"),
+          json.dumps([{"file": "/work/src/sql/sql_parse.cc"},
+                      {"file": "/work/build/sql/sql_yacc.cc"}]))
+    assert affected.compiled_sources(str(tmp_path)) == {"sql/sql_parse.cc"}
+
+
+def test_changed_files(tmp_path):
+    master = os.path.join(str(tmp_path), "master")
+    os.makedirs(master)
+    run_git(master, "init", "-q")
+    write(os.path.join(master, "a.cc"))
+    run_git(master, "add", "a.cc")
+    run_git(master, "commit", "-q", "-m", "base")
+    run_git(master, "branch", "5.7")
+    run_git(master, "checkout", "-q", "-b", "ps-5.7-foo")
+    write(os.path.join(master, "b.cc"))
+    run_git(master, "add", "b.cc")
+    run_git(master, "commit", "-q", "-m", "topic")
+    write(os.path.join(master, "a.cc"), "int a;\n")
+    write(os.path.join(master, "mysql-test/t/new.test"))
+    assert affected.changed_files(master, "5.7") == \
+        {"a.cc", "b.cc", "mysql-test/t/new.test"}
@@ -0,0 +1,80 @@
+import pytest
+from context import mbt
+from mbt import bench
+from mbt.mbt_error import MbtError
+
+assert mbt
+
+OUTPUT = """
+SQL statistics:
+    queries performed:
+        read:                            140000
+        write:                           40000
+        other:                           20000
+        total:                           200000
+    transactions:                        10000  (166.60 per sec.)
+    queries:                             200000 (3332.05 per sec.)
+    ignored errors:                      0      (0.00 per sec.)
+
+Latency histogram (values are in milliseconds)
+       value  ------------- distribution ------------- count
+       1.000 |*                                        10
+       2.000 |**********************                   800
+       4.000 |*****                                    150
+      10.000 |*                                        30
+      50.000 |                                         10
+
+Latency (ms):
+         min:                                    0.95
+         avg:                                    2.91
+         max:                                   51.20
+         95th percentile:                        4.03
+"""
+
+
+def test_parse_spec():
+    assert bench.parse_spec("foo/8.0/debug/a") == ("foo", "8.0", "debug", "a")
+    with pytest.raises(MbtError):
+        bench.parse_spec("foo/8.0/debug")
+
+
+def test_parse_output():
+    result = bench.parse_output(OUTPUT)
+    assert result == {"tps": 166.6, "qps": 3332.05, "latency_avg": 2.91,
+                      "latency_p50": 2.0, "latency_p95": 4.0,
+                      "latency_p99": 10.0}
+    with pytest.raises(MbtError):
+        bench.parse_output("FATAL: error")
+
+
+def test_confidence_interval():
+    assert bench.mean([1, 2, 3]) == 2
+    assert bench.stdev([1, 2, 3]) == 1
+    assert bench.confidence_interval([1, 2, 3]) == \
+        pytest.approx(4.303 / 3 ** 0.5)
+    assert bench.confidence_interval([1]) == float("inf")
+    assert bench.t_critical(100) == 1.96
+
+
+def test_difference_interval():
+    diff, width = bench.difference_interval([100, 101, 99], [90, 91, 89])
+    assert diff == -10
+    # equal variances and sizes: df = 4
+    assert width == pytest.approx(2.776 * (2 / 3.0) ** 0.5)
+    assert bench.difference_interval([1, 1], [2, 2]) == (1, 0.0)
+
+
+def test_run_order():
+    assert bench.run_order(3) == ["a", "b", "b", "a", "a", "b"]
+
+
+def test_report():
+    a = [{"tps": 100.0}, {"tps": 102.0}, {"tps": 98.0}]
+    b = [{"tps": 90.0}, {"tps": 91.0}, {"tps": 89.0}]
+    lines = bench.report(a, b)
+    assert lines[0][0] == "METRIC"
+    assert len(lines) == 2
+    metric, _, _, change, significance = lines[1]
+    assert metric == "tps"
+    assert change.startswith("-10.0%")
+    assert significance == "significant"
@@ -0,0 +1,92 @@
+import os
+import subprocess
+
+from context import mbt
+from mbt import build_seed
+
+assert mbt
+
+
+def run_git(cwd, *args):
+    subprocess.check_call(["git", "-c", "user.name=t", "-c",
+                           "user.email=t@t"] + list(args),
+                          cwd=cwd, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL)
+
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def make_worktrees(root):
+    base = os.path.join(root, "base")
+    os.makedirs(base)
+    run_git(base, "init", "-q")
+    for name in ["a.cc", "b.cc", "c.cc", "d.cc"]:
+        write(os.path.join(base, name), name)
+    run_git(base, "add", ".")
+    run_git(base, "commit", "-q", "-m", "base")
+    topic = os.path.join(root, "topic")
+    run_git(base, "worktree", "add", "-b", "topic", topic)
+    write(os.path.join(topic, "b.cc"), "changed")
+    run_git(topic, "commit", "-q", "-am", "topic change")
+    write(os.path.join(topic, "c.cc"), "uncommitted")
+    write(os.path.join(base, "d.cc"), "uncommitted in base")
+    return base, topic
+
+
+def test_unchanged_files(tmp_path):
+    base, topic = make_worktrees(str(tmp_path))
+    assert build_seed.unchanged_files(base, topic) == ["a.cc"]
+
+
+def test_changed_files(tmp_path):
+    base, topic = make_worktrees(str(tmp_path))
+    write(os.path.join(topic, "new.cc"), "untracked")
+    changed = build_seed.changed_files(base, topic)
+    assert changed == {"b.cc", "c.cc", "d.cc", "new.cc"}
+
+
+def test_touch_changed_files(tmp_path):
+    base, topic = make_worktrees(str(tmp_path))
+    output = os.path.join(str(tmp_path), "build", "b.o")
+    write(output, "obj")
+    os.utime(os.path.join(topic, "b.cc"), (1000, 1000))
+    changed = build_seed.changed_files(base, topic)
+    assert build_seed.touch_files(topic, changed | {"missing.cc"}) == 3
+    assert (os.stat(os.path.join(topic, "b.cc")).st_mtime >=
+            os.stat(output).st_mtime)
+
+
+def test_align_mtimes(tmp_path):
+    base, topic = make_worktrees(str(tmp_path))
+    os.utime(os.path.join(base, "a.cc"), (1000, 1000))
+    assert build_seed.align_mtimes(base, topic, ["a.cc", "missing.cc"]) == 1
+    assert os.stat(os.path.join(topic, "a.cc")).st_mtime == 1000
+
+
+def test_copy_build(tmp_path):
+    src = os.path.join(str(tmp_path), "src")
+    write(os.path.join(src, "sql", "a.o"), "obj")
+    os.utime(os.path.join(src, "sql", "a.o"), (2000, 2000))
+    dst = os.path.join(str(tmp_path), "dst")
+    build_seed.copy_build(src, dst)
+    copied = os.path.join(dst, "sql", "a.o")
+    assert os.stat(copied).st_mtime == 2000
+    assert not os.path.samefile(copied, os.path.join(src, "sql", "a.o"))
+
+
+def test_rewrite_cache_paths(tmp_path):
+    build_dir = str(tmp_path)
+    assert build_seed.rewrite_cache_paths(build_dir, [("/a/", "/b/")]) == 0
+    write(os.path.join(build_dir, "CMakeCache.txt"),
+          "CMAKE_HOME_DIRECTORY:INTERNAL=/work/src\n"
+          "FOO:PATH=/ws/topics/x/8.0-debug/foo\n")
+    assert build_seed.rewrite_cache_paths(
+            build_dir, [("/ws/topics/x/8.0-debug/",
+                         "/ws/topics/y/8.0-debug/")]) == 1
+    with open(os.path.join(build_dir, "CMakeCache.txt")) as f:
+        assert f.read() == ("CMAKE_HOME_DIRECTORY:INTERNAL=/work/src\n"
+                            "FOO:PATH=/ws/topics/y/8.0-debug/foo\n")
@@ -0,0 +1,67 @@
+import os
+
+from context import mbt
+from mbt import ccache
+from mbt.mbt_configurator import MbtConfigurator
+
+assert mbt
+
+
+def sample_config(ccache_dir=None):
+    conf = MbtConfigurator()
+    conf.add_build_config("gcc", "dutow/mbt-ubuntu-bionic",
+                          {"CC": "gcc", "CXX": "g++"})
+    conf.add_build_config("gcc-valgrind", "dutow/mbt-ubuntu-bionic",
+                          {"CXX": "g++", "CC": "gcc"},
+                          {"WITH_VALGRIND": "ON"})
+    conf.add_build_config("clang", "dutow/mbt-ubuntu-bionic",
+                          {"CC": "clang-6.0", "CXX": "clang++-6.0"})
+    conf.add_build_config("msan", "dutow/mbt-ubuntu-bionic-msan",
+                          {"CC": "clang-6.0", "CXX": "clang++-6.0"})
+    if ccache_dir:
+        conf.set_ccache(ccache_dir)
+    return conf
+
+
+def test_key_ignores_cmake_config():
+    conf = sample_config()
+    assert (ccache.cache_key(conf.build_configs["gcc"]) ==
+            ccache.cache_key(conf.build_configs["gcc-valgrind"]))
+
+
+def test_key_depends_on_compiler_and_image():
+    conf = sample_config()
+    keys = set(ccache.cache_key(conf.build_configs[v])
+               for v in ["gcc", "clang", "msan"])
+    assert len(keys) == 3
+    assert ccache.cache_key(conf.build_configs["msan"]).startswith(
+            "dutow_mbt-ubuntu-bionic-msan-")
+
+
+def test_disabled():
+    conf = sample_config()
+    assert ccache.cache_volumes(conf, conf.build_configs["gcc"]) == []
+    assert ccache.cache_environment(conf) == {}
+    assert ccache.cmake_launcher_args(conf) == []
+
+
+def test_enabled(tmp_path):
+    conf = sample_config(str(tmp_path))
+    volumes = ccache.cache_volumes(conf, conf.build_configs["gcc"])
+    assert len(volumes) == 1
+    host_dir, container_dir = volumes[0].split(":")
+    assert os.path.isdir(host_dir)
+    assert container_dir == ccache.CONTAINER_DIR
+    assert ccache.cache_environment(conf)["CCACHE_DIR"] == container_dir
+    assert "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache" in \
+        ccache.cmake_launcher_args(conf)
+
+
+def test_existing_caches(tmp_path):
+    conf = sample_config(str(tmp_path))
+    ccache.cache_dir(conf, conf.build_configs["clang"])
+    ccache.cache_dir(conf, conf.build_configs["gcc"])
+    caches = ccache.existing_caches(conf)
+    assert len(caches) == 2
+    assert set(c[1]["environment"]["CC"] for c in caches) == \
+        {"gcc", "clang-6.0"}
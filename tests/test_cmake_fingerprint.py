@@ -0,0 +1,49 @@
+import os
+
+from context import mbt
+from mbt import cmake_fingerprint as cf
+
+assert mbt
+
+INPUTS = cf.fingerprint_inputs(["cmake", "../src", "-DA=1", "-DB=2"],
+                               {"CC": "gcc"}, "sha256:1")
+
+
+def configured_build(tmp_path):
+    build_dir = str(tmp_path)
+    open(os.path.join(build_dir, "CMakeCache.txt"), "w").close()
+    cf.write_fingerprint(build_dir, INPUTS)
+    return build_dir
+
+
+def test_unconfigured(tmp_path):
+    assert cf.changed_inputs(str(tmp_path), INPUTS) == \
+        ["the build directory isn't configured"]
+    open(os.path.join(str(tmp_path), "CMakeCache.txt"), "w").close()
+    assert cf.changed_inputs(str(tmp_path), INPUTS) == \
+        ["no fingerprint of the previous configuration"]
+
+
+def test_unchanged(tmp_path):
+    build_dir = configured_build(tmp_path)
+    assert cf.changed_inputs(build_dir, dict(INPUTS)) == []
+
+
+def test_changed(tmp_path):
+    build_dir = configured_build(tmp_path)
+    inputs = cf.fingerprint_inputs(["cmake", "../src", "-DA=3", "-DC=4"],
+                                   {"CC": "clang", "CXX": "clang++"},
+                                   "sha256:2")
+    assert cf.changed_inputs(build_dir, inputs) == [
+        "cmake argument changed: -DA=1 -> 3",
+        "cmake argument removed: -DB=2",
+        "cmake argument added: -DC=4",
+        "environment changed: CC=gcc -> clang",
+        "environment changed: CXX=None -> clang++",
+        "image changed: sha256:1 -> sha256:2"]
+
+
+def test_hash():
+    assert cf.fingerprint_hash(INPUTS) == cf.fingerprint_hash(dict(INPUTS))
+    assert cf.fingerprint_hash(INPUTS) != cf.fingerprint_hash(
+            cf.fingerprint_inputs([], {}, "sha256:1"))
@@ -0,0 +1,46 @@
+import gzip
+import subprocess
+import sys
+
+from context import mbt
+from mbt.command_output import stream_output
+
+assert mbt
+
+
+def start(script):
+    return subprocess.Popen([sys.executable, "-c", script],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+
+def test_streams_both_pipes(capfd):
+    proc = start("import sys\n"
+                 "sys.stdout.write('progress 50%\\r')\n"
+                 "sys.stderr.write('warning')\n")
+    stream_output(proc)
+    proc.wait()
+    out, err = capfd.readouterr()
+    assert out == "progress 50%\r"
+    assert err == "warning"
+
+
+def test_tee_to_compressed_log(tmp_path, capfd):
+    log = str(tmp_path / "cmd.log.gz")
+    proc = start("print('x' * 200000)")
+    stream_output(proc, log)
+    proc.wait()
+    out, _ = capfd.readouterr()
+    assert out == "x" * 200000 + "\n"
+    with gzip.open(log, "rb") as f:
+        assert f.read() == b"x" * 200000 + b"\n"
+
+
+def test_log_only(tmp_path, capfd):
+    log = str(tmp_path / "cmd.log")
+    proc = start("import sys; print('out'); sys.stderr.write('err')")
+    stream_output(proc, log, echo=False)
+    proc.wait()
+    assert capfd.readouterr() == ("", "")
+    with open(log, "rb") as f:
+        assert sorted(f.read().split()) == [b"err", b"out"]
@@ -0,0 +1,72 @@
+import os
+import sys
+
+from context import mbt
+from mbt.config_cache import load_config, cache_file, read_cache
+
+assert mbt
+
+CONFIG = """
+from mbt import MbtConfigurator
+import mbt_helper
+
+
+def configure_mbt():
+    conf = MbtConfigurator()
+    conf.add_series("{series}")
+    for v in mbt_helper.VARIANTS:
+        conf.add_build_config(v, "image", {{"CC": "gcc"}}, {{"A": "B"}})
+    return conf
+"""
+
+HELPER = "VARIANTS = {variants}\n"
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    # Make sure the change is visible even with coarse mtimes
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+
+def make_workspace(tmp_path, series="5.7", variants=("a", "b")):
+    write(str(tmp_path / "mbt_config.py"), CONFIG.format(series=series))
+    write(str(tmp_path / "mbt_helper.py"),
+          HELPER.format(variants=list(variants)))
+    sys.modules.pop("mbt_helper", None)
+    return str(tmp_path)
+
+
+def test_evaluates_and_caches(tmp_path):
+    root = make_workspace(tmp_path)
+    conf = load_config(root)
+    assert conf.series == ["5.7"]
+    assert sorted(conf.build_configs) == ["a", "b"]
+    cached = read_cache(cache_file(root))
+    assert cached.series == ["5.7"]
+    assert cached.build_configs == conf.build_configs
+
+
+def test_config_change_invalidates(tmp_path):
+    root = make_workspace(tmp_path)
+    load_config(root)
+    write(str(tmp_path / "mbt_config.py"), CONFIG.format(series="8.0"))
+    assert read_cache(cache_file(root)) is None
+    assert load_config(root).series == ["8.0"]
+
+
+def test_imported_module_change_invalidates(tmp_path):
+    root = make_workspace(tmp_path)
+    load_config(root)
+    write(str(tmp_path / "mbt_helper.py"), HELPER.format(variants=["c"]))
+    sys.modules.pop("mbt_helper", None)
+    assert read_cache(cache_file(root)) is None
+    assert list(load_config(root).build_configs) == ["c"]
+
+
+def test_corrupt_cache(tmp_path):
+    root = make_workspace(tmp_path)
+    load_config(root)
+    write(cache_file(root), "garbage")
+    assert load_config(root).series == ["5.7"]
@@ -0,0 +1,59 @@
+import os
+
+from context import mbt
+from mbt import datadir_snapshots
+
+assert mbt
+
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_build_mysqld(tmp_path):
+    build_dir = str(tmp_path)
+    assert datadir_snapshots.build_mysqld(build_dir) is None
+    write(os.path.join(build_dir, "sql", "mysqld"))
+    assert (datadir_snapshots.build_mysqld(build_dir) ==
+            os.path.join(build_dir, "sql", "mysqld"))
+    write(os.path.join(build_dir, "bin", "mysqld"))
+    assert (datadir_snapshots.build_mysqld(build_dir) ==
+            os.path.join(build_dir, "bin", "mysqld"))
+
+
+def test_snapshot_key(tmp_path):
+    mysqld = os.path.join(str(tmp_path), "mysqld")
+    write(mysqld, "binary")
+    os.utime(mysqld, (1000, 1000))
+    key = datadir_snapshots.snapshot_key("abc", mysqld, [])
+    assert key == datadir_snapshots.snapshot_key("abc", mysqld, [])
+    assert key != datadir_snapshots.snapshot_key("abd", mysqld, [])
+    assert key != datadir_snapshots.snapshot_key("abc", mysqld,
+                                                 ["--lower-case=1"])
+    os.utime(mysqld, (2000, 2000))
+    assert key != datadir_snapshots.snapshot_key("abc", mysqld, [])
+
+
+def test_save_and_clone(tmp_path):
+    root = str(tmp_path)
+    datadir = os.path.join(root, "inst-a", "data")
+    write(os.path.join(datadir, "auto.cnf"), "server-uuid=x")
+    write(os.path.join(datadir, "mysql", "user.MYD"), "users")
+    assert datadir_snapshots.find_snapshot(root, "8.0", "debug", "k1") is None
+
+    old = datadir_snapshots.save_snapshot(root, "8.0", "debug", "k0",
+                                          datadir)
+    path = datadir_snapshots.save_snapshot(root, "8.0", "debug", "k1",
+                                           datadir)
+    assert datadir_snapshots.find_snapshot(root, "8.0", "debug", "k1") == path
+    assert not os.path.exists(old)
+    assert not os.path.exists(os.path.join(path, "auto.cnf"))
+
+    clone = os.path.join(root, "inst-b", "data")
+    datadir_snapshots.clone_snapshot(path, clone)
+    with open(os.path.join(clone, "mysql", "user.MYD")) as f:
+        assert f.read() == "users"
+    assert not os.path.samefile(os.path.join(clone, "mysql", "user.MYD"),
+                                os.path.join(path, "mysql", "user.MYD"))
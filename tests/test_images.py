@@ -0,0 +1,35 @@
+from context import mbt
+from mbt import images
+from mbt.mbt_configurator import MbtConfigurator
+
+assert mbt
+
+
+def test_config_images():
+    conf = MbtConfigurator()
+    conf.add_build_config("a", "dutow/mbt-debian-stretch")
+    conf.add_build_config("b", "dutow/mbt-ubuntu-artful-msan")
+    conf.add_build_config("c", "dutow/mbt-debian-stretch")
+    assert images.config_images(conf) == ["dutow/mbt-debian-stretch",
+                                          "dutow/mbt-ubuntu-artful-msan"]
+
+
+def test_repository():
+    assert images.repository("dutow/mbt-x") == "dutow/mbt-x"
+    assert images.repository("dutow/mbt-x:latest") == "dutow/mbt-x"
+    assert images.repository("dutow/mbt-x@sha256:abc") == "dutow/mbt-x"
+    assert images.repository("localhost:5000/mbt-x:1") == \
+        "localhost:5000/mbt-x"
+    assert images.repository("localhost:5000/mbt-x") == \
+        "localhost:5000/mbt-x"
+
+
+def test_lock(tmp_path):
+    root = str(tmp_path)
+    assert images.read_lock(root) == {}
+    pins = {"dutow/mbt-x": "dutow/mbt-x@sha256:abc"}
+    images.write_lock(root, pins)
+    assert images.read_lock(root) == pins
+    assert images.pinned_image("dutow/mbt-x", root) == \
+        "dutow/mbt-x@sha256:abc"
+    assert images.pinned_image("dutow/mbt-y", root) == "dutow/mbt-y"
@@ -0,0 +1,86 @@
+import os
+
+from context import mbt
+from mbt import link_install
+
+assert mbt
+
+
+def write(path, content="", mode=0o644):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    os.chmod(path, mode)
+
+
+def make_install_dir(root):
+    install_dir = os.path.join(root, "inst")
+    write(os.path.join(install_dir, "etc", "my.cnf"), "[mysqld]\nport=1\n")
+    return install_dir
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_bin_layout(tmp_path):
+    root = str(tmp_path)
+    build_dir = os.path.join(root, "build")
+    write(os.path.join(build_dir, "bin", "mysqld"), mode=0o755)
+    install_dir = make_install_dir(root)
+
+    assert link_install.link_installation(build_dir, install_dir) == 2
+    assert (os.readlink(os.path.join(install_dir, "bin")) ==
+            "/work/build/bin")
+    assert (os.readlink(os.path.join(install_dir, "lib", "plugin")) ==
+            "/work/build/plugin_output_directory")
+    assert ("lc-messages-dir=/work/build/share\n" in
+            read(os.path.join(install_dir, "etc", "link.cnf")))
+
+
+def test_sql_layout(tmp_path):
+    root = str(tmp_path)
+    build_dir = os.path.join(root, "build")
+    write(os.path.join(build_dir, "sql", "mysqld"), mode=0o755)
+    write(os.path.join(build_dir, "sql", "mysqld.cc.o"), mode=0o755)
+    write(os.path.join(build_dir, "sql", "lex_hash.h"))
+    write(os.path.join(build_dir, "client", "mysql"), mode=0o755)
+    write(os.path.join(build_dir, "storage", "example", "ha_example.so"))
+    write(os.path.join(build_dir, "plugin", "audit", "audit.so"))
+    install_dir = make_install_dir(root)
+
+    assert link_install.link_installation(build_dir, install_dir) == 5
+    assert sorted(os.listdir(os.path.join(install_dir, "bin"))) == [
+            "mysql", "mysqld"]
+    assert (os.readlink(os.path.join(install_dir, "bin", "mysqld")) ==
+            "/work/build/sql/mysqld")
+    assert (os.readlink(os.path.join(install_dir, "lib", "plugin",
+                                     "ha_example.so")) ==
+            "/work/build/storage/example/ha_example.so")
+    assert (os.readlink(os.path.join(install_dir, "scripts")) ==
+            "/work/build/scripts")
+    assert ("plugin-dir=/work/install/lib/plugin\n" in
+            read(os.path.join(install_dir, "etc", "link.cnf")))
+
+
+def test_relink_and_remove(tmp_path):
+    root = str(tmp_path)
+    build_dir = os.path.join(root, "build")
+    write(os.path.join(build_dir, "sql", "mysqld"), mode=0o755)
+    install_dir = make_install_dir(root)
+    # a copied installation is replaced
+    write(os.path.join(install_dir, "bin", "mysqld"), "copy")
+
+    link_install.link_installation(build_dir, install_dir)
+    link_install.link_installation(build_dir, install_dir)
+    config = read(os.path.join(install_dir, "etc", "my.cnf"))
+    assert config.count(link_install.INCLUDE_LINE) == 1
+    assert link_install.is_linked(install_dir)
+
+    link_install.remove_links(install_dir)
+    assert not link_install.is_linked(install_dir)
+    assert not os.path.exists(os.path.join(install_dir, "bin"))
+    assert not os.path.lexists(os.path.join(install_dir, "scripts"))
+    assert (read(os.path.join(install_dir, "etc", "my.cnf")).rstrip() ==
+            "[mysqld]\nport=1")
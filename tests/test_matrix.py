@@ -0,0 +1,58 @@
+import io
+
+import pytest
+from context import mbt
+from mbt.matrix import select_builds, StatusTable
+from mbt.mbt_configurator import MbtConfigurator
+
+assert mbt
+
+
+def sample_config():
+    conf = MbtConfigurator()
+    conf.add_series("5.6")
+    conf.add_series("5.7")
+    conf.add_series("8.0")
+    conf.add_build_config("bionic-debug-gcc", "image")
+    conf.add_build_config("bionic-release-gcc", "image")
+    conf.add_build_config("bionic-debug-clang6-asan", "image")
+    return conf
+
+
+def test_select_all_series():
+    builds = select_builds(sample_config(), ["*"], ["bionic-release-*"])
+    assert builds == [("5.6", "bionic-release-gcc"),
+                      ("5.7", "bionic-release-gcc"),
+                      ("8.0", "bionic-release-gcc")]
+
+
+def test_select_multiple_patterns():
+    builds = select_builds(sample_config(), ["5.7", "8.*"],
+                           ["*-debug-*"])
+    assert builds == [("5.7", "bionic-debug-clang6-asan"),
+                      ("5.7", "bionic-debug-gcc"),
+                      ("8.0", "bionic-debug-clang6-asan"),
+                      ("8.0", "bionic-debug-gcc")]
+
+
+def test_select_no_variant():
+    with pytest.raises(mbt.MbtError):
+        select_builds(sample_config(), ["*"], ["xenial-*"])
+
+
+def test_select_no_series():
+    with pytest.raises(mbt.MbtError):
+        select_builds(sample_config(), ["5.5"], ["*"])
+
+
+def test_status_table_prints_changes():
+    out = io.StringIO()
+    with StatusTable(["5.7-a", "8.0-a"], out) as table:
+        table.set("5.7-a", "building")
+        table.set("5.7-a", "ok", True)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("5.7-a  building")
+    assert lines[1].startswith("5.7-a  ok")
+    # final table
+    assert lines[-2].startswith("5.7-a  ok")
+    assert lines[-1].startswith("8.0-a  queued")
@@ -0,0 +1,149 @@
+import gzip
+
+import pytest
+from context import mbt
+from mbt import mtr
+
+assert mbt
+
+OUTPUT = """
+==============================================================================
+
+TEST                                      RESULT   TIME (ms) or COMMENT
+--------------------------------------------------------------------------
+
+worker[1] Using MTR_BUILD_THREAD 300, with reserved ports 13000..13009
+main.alias                               [ pass ]     23
+[ 25%] main.ctype_utf8 'innodb'      w2 [ pass ]   1345
+[ 50%] innodb.bug123                 w1 [ fail ]
+        Test ended at 2018-06-01 12:00:00
+[ 60%] innodb.bug123                 w1 [ retry-pass ]   410
+[ 75%] rpl.rpl_foo 'mix'             w2 [ skipped ]  Requires binlog
+[100%] main.broken                   w1 [ retry-fail ]
+--------------------------------------------------------------------------
+The servers were restarted 1 times
+"""
+
+
+def test_split_mtr_args():
+    assert mtr.split_mtr_args(["--suite=main,innodb", "--force",
+                               "--parallel=4", "main.alias"]) == \
+        (["main", "innodb"], ["main.alias"], ["--force", "--parallel=4"])
+
+
+def test_split_mtr_args_separate_suite():
+    assert mtr.split_mtr_args(["--suites", "rpl", "--force"]) == \
+        (["rpl"], [], ["--force"])
+
+
+def test_split_mtr_args_separate_values():
+    assert mtr.split_mtr_args(["--parallel", "4", "--retry", "2",
+                               "main.alias", "--force"]) == \
+        ([], ["main.alias"], ["--parallel", "4", "--retry", "2", "--force"])
+
+
+def test_assign_shards():
+    assert mtr.assign_shards(["a", "b", "c", "d", "e"], 2) == \
+        [["a", "c", "e"], ["b", "d"]]
+    assert mtr.assign_shards(["a"], 4) == [["a"]]
+
+
+def test_shard_commands_suites():
+    commands = mtr.shard_commands(["--suite=main,innodb,rpl", "--force"], 2)
+    assert len(commands) == 2
+    assert commands[0][-1] == "--suite=main,rpl"
+    assert commands[1][-1] == "--suite=innodb"
+    assert all("--force" in c for c in commands)
+    vardirs = set(c[0] for c in commands)
+    threads = set(c[1] for c in commands)
+    assert len(vardirs) == 2 and len(threads) == 2
+
+
+def test_shard_commands_tests():
+    commands = mtr.shard_commands(["--suite=main", "main.a", "main.b"], 2)
+    assert commands[0][-2:] == ["--suite=main", "main.a"]
+    assert commands[1][-2:] == ["--suite=main", "main.b"]
+
+
+def test_shard_commands_need_selection():
+    with pytest.raises(mbt.MbtError):
+        mtr.shard_commands(["--force"], 2)
+
+
+def test_parse_results():
+    results = mtr.parse_results(OUTPUT.splitlines())
+    assert results[("main.alias", None)] == ("pass", 23)
+    assert results[("main.ctype_utf8", "innodb")] == ("pass", 1345)
+    assert results[("innodb.bug123", None)] == ("retry-pass", 410)
+    assert results[("rpl.rpl_foo", "mix")] == ("skipped", None)
+    assert results[("main.broken", None)] == ("retry-fail", None)
+    assert len(results) == 5
+
+
+def test_parse_log(tmp_path):
+    path = str(tmp_path / "shard0.log.gz")
+    with gzip.open(path, "wt") as f:
+        f.write(OUTPUT)
+    assert len(mtr.parse_log(path)) == 5
+
+
+def test_merge_report():
+    shards = [{("main.a", None): ("pass", 10),
+               ("main.b", None): ("fail", None)},
+              {("rpl.c", "row"): ("retry-fail", None),
+               ("rpl.d", None): ("skipped", None)}]
+    lines, failed = mtr.merge_report(shards)
+    assert lines[0] == "4 test(s): fail: 1, pass: 1, retry-fail: 1, " \
+        "skipped: 1"
+    assert failed == ["main.b (shard 0)", "rpl.c 'row' (shard 1)"]
+
+
+def test_balance_shards_longest_first():
+    durations = {"main.a": 100, "main.b": 60, "main.c": 50, "main.d": 40,
+                 "main.e": 10}
+    shards = mtr.balance_shards(list(durations), 2,
+                                mtr.weights_by_test(durations))
+    assert shards == [["main.a", "main.d"], ["main.b", "main.c", "main.e"]]
+
+
+def test_weights_by_test_defaults_to_median():
+    weight = mtr.weights_by_test({"main.a": 10, "main.b": 20,
+                                  "innodb.c": 30})
+    assert weight("a") == 10
+    assert weight("innodb.c") == 30
+    assert weight("rpl.unknown") == 20
+
+
+def test_weights_by_suite():
+    weight = mtr.weights_by_suite({"main.a": 10, "main.b": 20,
+                                   "innodb.c": 5})
+    assert weight("main") == 30
+    assert weight("innodb") == 5
+
+
+def test_shard_commands_with_durations():
+    durations = {"main.slow": 1000, "main.a": 10, "main.b": 10}
+    commands = mtr.shard_commands(["main.a", "main.b", "main.slow"], 2,
+                                  durations)
+    assert commands[0][-1] == "main.slow"
+    assert commands[1][-2:] == ["main.a", "main.b"]
+    assert "--no-reorder" in commands[0]
+
+
+def test_order_tests():
+    durations = {"main.slow": 1000, "main.a": 10, "main.b": 20}
+    assert mtr.order_tests(["--force", "a", "main.b", "main.slow"],
+                           durations) == \
+        ["--force", "--no-reorder", "main.slow", "main.b", "a"]
+    assert mtr.order_tests(["--suite=main", "a"], durations) == \
+        ["--suite=main", "--no-reorder", "a"]
+    assert mtr.order_tests(["a", "main.b"], {}) == ["a", "main.b"]
+    assert mtr.order_tests(["--suite=main"], durations) == ["--suite=main"]
+
+
+def test_shard_suites_with_durations():
+    durations = {"rpl.a": 500, "rpl.b": 500, "main.a": 300,
+                 "innodb.a": 400}
+    commands = mtr.shard_commands(["--suite=main,innodb,rpl"], 2, durations)
+    assert commands[0][-1] == "--suite=rpl"
+    assert commands[1][-1] == "--suite=innodb,main"
@@ -0,0 +1,29 @@
+from context import mbt
+from mbt.mtr_results import MtrResults
+
+assert mbt
+
+
+def test_record_and_durations(tmp_path):
+    with MtrResults(str(tmp_path)) as store:
+        store.record({("main.a", None): ("pass", 100),
+                      ("main.b", None): ("fail", None),
+                      ("main.c", "innodb"): ("retry-pass", 40)},
+                     "foo", "5.7", "debug", "abc")
+        store.record({("main.a", None): ("pass", 200)},
+                     "foo", "5.7", "debug", "def")
+    with MtrResults(str(tmp_path)) as store:
+        assert store.durations() == {"main.a": 150, "main.c": 40}
+
+
+def test_durations_prefer_same_build(tmp_path):
+    with MtrResults(str(tmp_path)) as store:
+        store.record({("main.a", None): ("pass", 1000),
+                      ("main.b", None): ("pass", 10)},
+                     "foo", "8.0", "debug", "abc")
+        store.record({("main.a", None): ("pass", 100)},
+                     "foo", "5.7", "release", "abc")
+        store.record({("main.a", None): ("pass", 300)},
+                     "foo", "5.7", "debug", "abc")
+        durations = store.durations("5.7", "debug")
+    assert durations == {"main.a": 300, "main.b": 10}
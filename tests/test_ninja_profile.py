@@ -0,0 +1,131 @@
+from context import mbt
+from mbt import ninja_profile as np
+
+assert mbt
+
+LOG = """# ninja log v5
+0\t100\t0\tgen/old.h\taaaa
+50\t300\t0\tsql/old.o\tbbbb
+0\t200\t0\tinclude/x.h\t4444
+0\t200\t0\tinclude/y.h\t4444
+0\t1000\t0\tsql/a.cc.o\t1111
+0\t1500\t0\tsql/b.cc.o\t2222
+1000\t2500\t0\tsql/c.cc.o\t3333
+2500\t4000\t0\tlibsql.a\t5555
+4000\t7000\t0\tbin/mysqld\t6666
+"""
+
+
+def steps():
+    return np.parse_log(LOG.splitlines(True))
+
+
+def test_parse_log():
+    parsed = steps()
+    assert len(parsed) == 8
+    assert np.Step(0, 200, ["include/x.h", "include/y.h"]) in parsed
+
+
+def test_last_build():
+    build = np.last_build(steps())
+    assert [s.outputs[0] for s in build] == [
+        "include/x.h", "sql/a.cc.o", "sql/b.cc.o", "sql/c.cc.o",
+        "libsql.a", "bin/mysqld"]
+
+
+BUILD_NINJA = """# CMAKE generated file: DO NOT EDIT!
+rule CXX_COMPILER__sql_Debug
+  command = c++ $in
+build sql/a.cc.o: CXX_COMPILER__sql_Debug /work/src/sql/a.cc | a.h || gen
+build bin/mysqld | bin/mysqld$ debug.map: $
+    CXX_EXECUTABLE_LINKER__mysqld_Debug sql/a.cc.o
+  LINK_FLAGS = -g
+build gen/version: CUSTOM_COMMAND /work/src/VERSION
+build sql/$:odd$$.o: CXX_COMPILER__sql_Debug x.cc
+"""
+
+
+def test_read_build_graph(tmp_path):
+    assert np.read_build_graph(str(tmp_path)) == {}
+    with open(str(tmp_path / "build.ninja"), "w") as f:
+        f.write(BUILD_NINJA)
+    link = np.Edge("CXX_EXECUTABLE_LINKER__mysqld_Debug", ["sql/a.cc.o"])
+    assert np.read_build_graph(str(tmp_path)) == {
+        "sql/a.cc.o": np.Edge("CXX_COMPILER__sql_Debug",
+                              ["/work/src/sql/a.cc", "a.h"]),
+        "bin/mysqld": link,
+        "bin/mysqld debug.map": link,
+        "gen/version": np.Edge("CUSTOM_COMMAND", ["/work/src/VERSION"]),
+        "sql/:odd$.o": np.Edge("CXX_COMPILER__sql_Debug", ["x.cc"])}
+
+
+def test_step_kind():
+    kinds = dict((s.outputs[0], np.step_kind(s)) for s in steps())
+    assert kinds["sql/a.cc.o"] == "compile"
+    assert kinds["libsql.a"] == "link"
+    assert kinds["bin/mysqld"] == "other"
+    assert kinds["include/x.h"] == "other"
+    graph = {"bin/mysqld": np.Edge("CXX_EXECUTABLE_LINKER__mysqld_Debug",
+                                   []),
+             "gen/version": np.Edge("CUSTOM_COMMAND", [])}
+    assert np.step_kind(np.Step(0, 1, ["bin/mysqld"]), graph) == "link"
+    assert np.step_kind(np.Step(0, 1, ["gen/version"]), graph) == "other"
+
+
+def test_summary():
+    info = np.summary(np.last_build(steps()))
+    assert info["wall"] == 7000
+    assert info["cpu"] == 200 + 1000 + 1500 + 1500 + 1500 + 3000
+    assert np.summary([])["steps"] == 0
+
+
+def test_slowest():
+    build = np.last_build(steps())
+    assert [s.outputs[0] for s in np.slowest(build, "compile", 2)] == \
+        ["sql/b.cc.o", "sql/c.cc.o"]
+
+
+GRAPH = {
+    "include/x.h": np.Edge("CUSTOM_COMMAND", ["x.h.in"]),
+    "include/y.h": np.Edge("CUSTOM_COMMAND", ["x.h.in"]),
+    "sql/a.cc.o": np.Edge("CXX_COMPILER", ["a.cc"]),
+    "sql/b.cc.o": np.Edge("CXX_COMPILER", ["b.cc"]),
+    "sql/c.cc.o": np.Edge("CXX_COMPILER", ["c.cc", "include/x.h"]),
+    "libsql.a": np.Edge("CXX_STATIC_LIBRARY_LINKER",
+                        ["sql/a.cc.o", "sql/b.cc.o", "sql/c.cc.o"]),
+    "sql_lib": np.Edge("phony", ["libsql.a", "unchanged.a"]),
+    "bin/mysqld": np.Edge("CXX_EXECUTABLE_LINKER", ["main.o", "sql_lib"]),
+}
+
+
+def test_critical_path():
+    # c.cc.o started when a.cc.o finished, but only depends on x.h
+    path = np.critical_path(np.last_build(steps()), GRAPH)
+    assert [s.outputs[0] for s in path] == [
+        "bin/mysqld", "libsql.a", "sql/c.cc.o", "include/x.h"]
+
+
+def test_critical_path_without_graph():
+    path = np.critical_path(np.last_build(steps()), {})
+    assert [s.outputs[0] for s in path] == ["bin/mysqld"]
+    assert np.critical_path([], {}) == []
+
+
+def test_compare():
+    base = {"a.o": 100, "b.o": 200, "c.o": 50}
+    other = {"a.o": 110, "b.o": 400, "d.o": 10}
+    assert np.compare(base, other) == [("b.o", 200, 400), ("a.o", 100, 110)]
+
+
+def test_saved_profiles(tmp_path):
+    root = str(tmp_path)
+    build = np.last_build(steps())
+    path = np.profile_path(root, "foo", "8.0", "debug", "abcdef")
+    np.save_profile(path, build)
+    assert np.load_profile(path) == build
+    assert np.find_profile(root, "foo", "8.0", "debug", "abc") == path
+    assert np.find_profile(root, "foo", "8.0", "debug", "xyz") is None
+    np.save_profile(np.profile_path(root, "foo", "8.0", "debug-asan",
+                                    "abcdef"), build)
+    assert np.find_profile(root, "foo", "8.0", "debug", "abc") == path
+    assert np.find_profile(root, "foo", "8.0", "debug-asan", "abc") != path
@@ -0,0 +1,48 @@
+import pytest
+from context import mbt
+from mbt.parallel import run_parallel
+
+assert mbt
+
+
+def test_empty():
+    assert run_parallel([]) == {}
+
+
+def test_results():
+    tasks = [("a", lambda: 1), ("b", lambda: 2)]
+    assert run_parallel(tasks, 2) == {"a": 1, "b": 2}
+
+
+def test_failure_summary(capsys):
+    def fail():
+        raise Exception("broken remote")
+
+    with pytest.raises(mbt.MbtError) as e:
+        run_parallel([("ok", lambda: 1), ("bad", fail)], 2, "fetch")
+    assert "bad" in str(e.value)
+    out = capsys.readouterr().out
+    assert "1 of 2 fetch(s) failed" in out
+    assert "bad: broken remote" in out
+
+
+def test_single_worker_runs_everything():
+    seen = []
+    tasks = [(str(i), (lambda i=i: seen.append(i))) for i in range(5)]
+    run_parallel(tasks, 1)
+    assert sorted(seen) == list(range(5))
+
+
+def test_reports_timings(capsys):
+    run_parallel([("5.7", lambda: None)], 1, "checkout")
+    out = capsys.readouterr().out
+    assert "[1/1] checkout 5.7: done (" in out
+    assert "Finished 1 checkout(s) in " in out
+
+
+def test_submodule_job_count():
+    from mbt.mbt import submodule_job_count
+    assert submodule_job_count(8, 4) == 2
+    assert submodule_job_count(8, 1) == 8
+    assert submodule_job_count(2, 4) == 1
+    assert submodule_job_count(8, 0) == 8
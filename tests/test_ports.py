@@ -0,0 +1,38 @@
+import socket
+
+import pytest
+
+from context import mbt
+from mbt.mbt_error import MbtError
+from mbt.ports import read_port, allocate_port, port_free, DEFAULT_PORT
+
+assert mbt
+
+
+def test_read_port(tmp_path):
+    path = str(tmp_path / "my.cnf")
+    with open(path, "w") as f:
+        f.write("[client]\nport=10001\n[mysqld]\nport_open_timeout=5\n"
+                "port = 10002\n")
+    assert read_port(path) == 10002
+    with open(path, "w") as f:
+        f.write("[client]\nport=10001\n[mysqld]\ndatadir=/data\n")
+    assert read_port(path) == DEFAULT_PORT
+
+
+def test_allocate_port():
+    assert allocate_port(set(), is_free=lambda p: True) == 10000
+    assert allocate_port({10000, 10001}, is_free=lambda p: True) == 10002
+    assert allocate_port({10000}, is_free=lambda p: p != 10001) == 10002
+    with pytest.raises(MbtError):
+        allocate_port({10000}, 10000, 10001, is_free=lambda p: p != 10001)
+
+
+def test_port_free():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("", 0))
+    s.listen()
+    try:
+        assert not port_free(s.getsockname()[1])
+    finally:
+        s.close()
@@ -0,0 +1,72 @@
+import pytest
+from context import mbt
+from mbt import resource_profiles as rp
+from mbt.mbt_configurator import MbtConfigurator
+from mbt.mbt_error import MbtError
+
+assert mbt
+
+
+def sample_config():
+    conf = MbtConfigurator()
+    conf.add_resource_profile("bench", cpus="8", memory="16g")
+    conf.add_resource_profile("pinned", cpuset="0-3", hugepages=True)
+    conf.add_build_config("debug", "img")
+    conf.add_build_config("release", "img", resource_profile="bench")
+    return conf
+
+
+def test_parse_cpulist():
+    assert rp.parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+
+
+def test_default_profile():
+    conf = sample_config()
+    profile = rp.resolve_profile(conf, conf.build_configs["debug"])
+    assert rp.docker_args(profile) == ["--cpus=1"]
+    assert rp.mysqld_args(profile) == []
+
+
+def test_profile_precedence():
+    conf = sample_config()
+    profile = rp.resolve_profile(conf, conf.build_configs["release"])
+    assert rp.docker_args(profile) == ["--cpus=8", "--memory=16g"]
+    profile = rp.resolve_profile(conf, conf.build_configs["release"],
+                                 "pinned", {"memory": "4g", "cpus": None})
+    assert rp.docker_args(profile) == ["--cpus=8", "--cpuset-cpus=0-3",
+                                       "--memory=4g",
+                                       "--ulimit", "memlock=-1:-1",
+                                       "--cap-add=IPC_LOCK"]
+    assert rp.mysqld_args(profile) == ["--large-pages"]
+    assert rp.effective_cpus(profile) == 4
+
+
+def test_unknown_profile():
+    conf = sample_config()
+    with pytest.raises(MbtError):
+        rp.resolve_profile(conf, conf.build_configs["debug"], "missing")
+
+
+def test_numa_node():
+    profile = {"cpus": None, "cpuset": "0-7", "numa_node": 1}
+    assert rp.docker_args(profile) == ["--cpuset-cpus=0-7",
+                                       "--cpuset-mems=1"]
+
+
+def test_numa_node_override():
+    conf = sample_config()
+    profile = rp.resolve_profile(conf, conf.build_configs["debug"], "pinned",
+                                 {"numa_node": 1, "cpuset": "4-5"})
+    assert profile["cpuset"] == "4-5"
+    # The cpuset of the profile isn't kept, the cpus of the node are read
+    with pytest.raises(MbtError):
+        rp.resolve_profile(conf, conf.build_configs["debug"], "pinned",
+                           {"numa_node": 99})
+
+
+def test_describe():
+    assert rp.describe({"cpus": "2", "memory": "8g"}) == \
+        "2 cpus, memory 8g, huge pages off"
+    assert rp.describe({"cpus": "1.5", "cpuset": "0-7", "numa_node": 0,
+                        "hugepages": True}) == \
+        "1.5 cpus, cpuset 0-7, NUMA node 0, memory unlimited, huge pages on"
@@ -0,0 +1,82 @@
+import os
+import subprocess
+
+from context import mbt
+from mbt.resources import (split_resources, docker_limit_args, MB,
+                           memory_per_job, build_parallelism,
+                           has_parallelism_args, running_builds,
+                           running_build)
+
+assert mbt
+
+
+def test_split_evenly():
+    slot = split_resources(4, 32, 64 * 1024 * MB)
+    assert slot == {"jobs": 8, "cpus": 8.0, "memory": 16 * 1024}
+
+
+def test_split_more_containers_than_cores():
+    slot = split_resources(8, 4, None)
+    assert slot["jobs"] == 1
+    assert slot["cpus"] == 1.0
+    assert slot["memory"] is None
+
+
+def test_docker_limit_args():
+    slot = split_resources(2, 8, 8 * 1024 * MB)
+    assert docker_limit_args(slot) == ["--cpus=4.0", "--memory=4096m"]
+
+
+def buildconf(**config):
+    return {"image": "x", "environment": {}, "config": config}
+
+
+def test_memory_per_job():
+    assert memory_per_job("gcc-release", buildconf()) == 1024
+    assert memory_per_job("gcc-debug",
+                          buildconf(CMAKE_BUILD_TYPE="Debug")) == 1536
+    assert memory_per_job("gcc-debug-valgrind",
+                          buildconf(CMAKE_BUILD_TYPE="Debug")) == 2048
+    assert memory_per_job("clang-debug-asan", buildconf()) == 3072
+    assert memory_per_job("x", buildconf(WITH_MSAN="ON")) == 3072
+    assert memory_per_job("x", {**buildconf(), "memory_per_job": 500}) == 500
+
+
+def test_build_parallelism():
+    # limited by the cores
+    assert build_parallelism(16, 64 * 1024 * MB, 1024) == (16, 16)
+    # limited by the memory
+    assert build_parallelism(16, 8 * 1024 * MB, 2048) == (4, 16)
+    # shared with other builds
+    assert build_parallelism(16, 64 * 1024 * MB, 1024, 3) == (4, 16)
+    assert build_parallelism(4, 512 * MB, 3072, 1) == (1, 4)
+    assert build_parallelism(8, None, 1024) == (8, 8)
+
+
+def test_has_parallelism_args():
+    assert has_parallelism_args(["-j8"])
+    assert has_parallelism_args(["VERBOSE=1", "-j"])
+    assert has_parallelism_args(["--load-average=4"])
+    assert not has_parallelism_args(["install", "VERBOSE=1"])
+
+
+def test_running_builds(tmp_path):
+    root = str(tmp_path)
+    assert running_builds(root) == 0
+    os.makedirs(os.path.join(root, ".mbt", "builds"))
+    # a live process, and a stale marker
+    live = subprocess.Popen(["sleep", "60"])
+    try:
+        open(os.path.join(root, ".mbt", "builds", str(live.pid) + "-0"),
+             "w").close()
+        dead = subprocess.Popen(["true"])
+        dead.wait()
+        open(os.path.join(root, ".mbt", "builds", str(dead.pid) + "-0"),
+             "w").close()
+        with running_build(root):
+            assert running_builds(root) == 1
+        assert os.listdir(os.path.join(root, ".mbt", "builds")) == [
+                str(live.pid) + "-0"]
+    finally:
+        live.kill()
+        live.wait()
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+from context import mbt
+
+assert mbt
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Generous upper bound for importing mbt, well above the usual ~50ms but
+# far below the cost of loading GitPython eagerly
+MAX_IMPORT_SECONDS = 0.25
+
+
+def run_python(code, *flags):
+    return subprocess.run([sys.executable] + list(flags) + ["-c", code],
+                          cwd=ROOT,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE,
+                          universal_newlines=True,
+                          check=True)
+
+
+def test_import_is_lazy():
+    result = run_python("import sys\n"
+                        "import mbt\n"
+                        "print(sorted(m for m in ['git', 'concurrent.futures']"
+                        " if m in sys.modules))")
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time():
+    # Best of a few runs, to avoid noise from the first (uncached) import
+    best = None
+    for _ in range(3):
+        result = run_python("import mbt", "-X", "importtime")
+        last = result.stderr.strip().splitlines()[-1]
+        assert last.endswith("| mbt")
+        cumulative = int(last.split("|")[1]) / 1000000.0
+        best = cumulative if best is None else min(best, cumulative)
+    print("mbt import time: {:.3f}s".format(best))
+    assert best < MAX_IMPORT_SECONDS
+
+
+def test_build_bookkeeping_is_lazy(tmp_path):
+    src_dir = os.path.join(str(tmp_path), "topics", "foo", "8.0")
+    os.makedirs(src_dir)
+    subprocess.check_call(["git", "init", "-q"], cwd=src_dir)
+    subprocess.check_call(["git", "-c", "user.name=t", "-c", "user.email=t@t",
+                           "commit", "-q", "--allow-empty", "-m", "x"],
+                          cwd=src_dir)
+    code = ("import os, sys\n"
+            "sys.path.insert(0, " + repr(ROOT) + ")\n"
+            "os.chdir(" + repr(str(tmp_path)) + ")\n"
+            "from mbt import mbt\n"
+            "print(len(mbt.source_commit('foo', '8.0')))\n"
+            "print(mbt.source_commit('foo', '5.7'))\n"
+            "mbt.record_invocation('make', 'foo', '8.0', 'debug', 0, 0,\n"
+            "                      (None, None))\n"
+            "mbt.record_build('foo', '8.0', 'debug', state='built')\n"
+            "print('git' in sys.modules)\n")
+    result = run_python(code)
+    assert result.stdout.split() == ["40", "None", "False"]
@@ -0,0 +1,124 @@
+import os
+import signal
+import subprocess
+import time
+
+from context import mbt
+from mbt import telemetry
+
+assert mbt
+
+
+def test_parse_stats():
+    assert telemetry.parse_stats("cpu_before=1000000 cpu_after=3500000 "
+                                 "peak=4096\n") == (2.5, 4096)
+    assert telemetry.parse_stats("cpu_before= cpu_after= peak=\n") == \
+        (None, None)
+
+
+def test_wrapper(tmp_path):
+    stats = os.path.join(str(tmp_path), "stats", "make.stats")
+    rc = subprocess.call(["sh", "-c", telemetry.STATS_WRAPPER, "mbt-stats",
+                          stats, "sh", "-c", "exit 3"])
+    assert rc == 3
+    with open(stats) as f:
+        content = f.read()
+    assert content.startswith("cpu_before=")
+    telemetry.parse_stats(content)
+
+
+def test_wrapper_keeps_stdin(tmp_path):
+    stats = os.path.join(str(tmp_path), "make.stats")
+    result = subprocess.run(["sh", "-c", telemetry.STATS_WRAPPER,
+                             "mbt-stats", stats, "cat"],
+                            input=b"input", stdout=subprocess.PIPE)
+    assert result.stdout == b"input"
+
+
+def test_wrap_command():
+    cmd = telemetry.wrap_command(["make", "-j4"], "make-1.stats")
+    assert cmd[3:] == ["mbt-stats", "/work/build/.mbt-stats/make-1.stats",
+                       "make", "-j4"]
+
+
+def test_read_stats(tmp_path):
+    build_dir = str(tmp_path)
+    assert telemetry.read_stats(build_dir, "x.stats") == (None, None)
+    os.makedirs(os.path.join(build_dir, telemetry.STATS_SUBDIR))
+    path = os.path.join(build_dir, telemetry.STATS_SUBDIR, "x.stats")
+    with open(path, "w") as f:
+        f.write("cpu_before=0 cpu_after=2000000 peak=10\n")
+    assert telemetry.read_stats(build_dir, "x.stats") == (2.0, 10)
+    assert not os.path.exists(path)
+
+
+def test_combine_stats():
+    assert telemetry.combine_stats([(1.0, 10), (2.0, None),
+                                    (None, 30)]) == (3.0, 30)
+    assert telemetry.combine_stats([(None, None)]) == (None, None)
+
+
+def run(wall, rc=0, series="8.0", cpu=None, peak=None):
+    return {"command": "make", "series": series, "variant": "debug",
+            "wall_time": wall, "cpu_time": cpu, "peak_memory": peak,
+            "exit_code": rc}
+
+
+def test_find_regressions():
+    rows = [run(100), run(110), run(90), run(500, rc=2), run(125),
+            run(100, series="5.7"), run(100, series="5.7")]
+    assert telemetry.find_regressions(rows) == [
+        ("make", "8.0", "debug", "wall_time", 125, 100)]
+    assert telemetry.find_regressions(rows, 0.3) == []
+
+
+def test_find_regressions_window():
+    rows = [run(10)] * 5 + [run(100)] * 5 + [run(110, cpu=5, peak=2)]
+    assert telemetry.find_regressions(rows, window=5) == []
+    assert telemetry.find_regressions(rows, window=10) == [
+        ("make", "8.0", "debug", "wall_time", 110, 55.0)]
+
+
+def test_build_history(tmp_path):
+    with telemetry.BuildHistory(str(tmp_path)) as history:
+        history.record("make", "foo", "8.0", "debug", "abc", 100, 60.0,
+                       300.0, 1024, 0)
+        history.record("mtr", "foo", "8.0", "debug", "abc", 200, 30.0,
+                       None, None, 1)
+        history.record("make", "bar", "5.7", "debug", "def", 50, 60.0,
+                       300.0, 1024, 0)
+        assert [r["topic"] for r in history.query("make")] == ["bar", "foo"]
+        assert [r["command"] for r in history.query(series="8.0")] == \
+            ["make", "mtr"]
+        assert len(history.query(since=150)) == 1
+
+
+def test_last_success(tmp_path):
+    with telemetry.BuildHistory(str(tmp_path)) as history:
+        assert history.last_success("make", "foo", "8.0", "debug") is None
+        history.record("make", "foo", "8.0", "debug", "abc", 100, 60.0,
+                       50.0, 1000, 0)
+        history.record("make", "foo", "8.0", "debug", "def", 200, 60.0,
+                       50.0, 1000, 2)
+        history.record("make", "bar", "8.0", "debug", "ghi", 300, 60.0,
+                       50.0, 1000, 0)
+        row = history.last_success("make", "foo", "8.0", "debug")
+        assert row["commit_id"] == "abc"
+
+
+def test_wrapper_forwards_signals(tmp_path):
+    stats = os.path.join(str(tmp_path), "make.stats")
+    pid_file = os.path.join(str(tmp_path), "pid")
+    wrapper = subprocess.Popen(["sh", "-c", telemetry.STATS_WRAPPER,
+                                "mbt-stats", stats, "sh", "-c",
+                                "echo $$ > $0; exec sleep 30", pid_file])
+    while not os.path.isfile(pid_file) or not os.path.getsize(pid_file):
+        time.sleep(0.05)
+    with open(pid_file) as f:
+        child = int(f.read())
+    started = time.time()
+    wrapper.send_signal(signal.SIGTERM)
+    assert wrapper.wait(timeout=10) == 128 + signal.SIGTERM
+    assert time.time() - started < 5
+    assert not os.path.exists("/proc/" + str(child))
+    assert os.path.isfile(stats)
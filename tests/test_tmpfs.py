@@ -0,0 +1,108 @@
+import os
+import signal
+import subprocess
+import time
+
+from context import mbt
+from mbt import tmpfs
+
+assert mbt
+
+
+def test_tmpfs_size():
+    assert tmpfs.tmpfs_size({"tmpfs": None}) is None
+    assert tmpfs.tmpfs_size({"tmpfs": "4G"}) == "4G"
+    assert tmpfs.tmpfs_size({"tmpfs": "4G"}, "0") is None
+    assert tmpfs.tmpfs_size({}, "1G") == "1G"
+
+
+def test_tmpfs_args():
+    assert tmpfs.tmpfs_args("2G") == ["--tmpfs",
+                                      "/work/tmpfs:rw,exec,size=2G"]
+
+
+def test_mtr_command():
+    cmd = tmpfs.mtr_command(["./mtr", "--vardir=/work/build/mysql-test/"
+                             "var-shard1", "main.alias"])
+    assert cmd[:2] == ["sh", "-c"]
+    assert cmd[4:] == ["./mtr", "main.alias",
+                       "--vardir=/work/tmpfs/var-shard1"]
+    assert ("cp -a /work/tmpfs/var-shard1/log "
+            "/work/build/mysql-test/var-shard1/log.mbt-new") in cmd[2]
+
+
+def test_mysqld_command():
+    cmd = tmpfs.mysqld_command(["./bin/mysqld", "--defaults-file=my.cnf",
+                                "--gdb"], "--defaults-file=my.cnf")
+    assert cmd[4:] == ["./bin/mysqld", "--defaults-file=my.cnf",
+                       "--datadir=/work/tmpfs/data",
+                       "--tmpdir=/work/tmpfs/tmp", "--gdb"]
+
+
+def test_wrap_command_copies_back(tmp_path):
+    src = os.path.join(str(tmp_path), "src")
+    dst = os.path.join(str(tmp_path), "out", "dst")
+    os.makedirs(os.path.join(dst, "old"))
+    cmd = tmpfs.wrap_command(["sh", "-c", "mkdir -p $0 && touch $0/f && "
+                              "exit 3", src],
+                             copy_back=[(src, dst)])
+    # The mount point is outside the test directory, only run the script
+    cmd[2] = cmd[2].replace("mkdir -p " + tmpfs.MOUNT_POINT, "true", 1)
+    assert subprocess.call(cmd) == 3
+    assert os.listdir(dst) == ["f"]
+
+
+def test_wrap_command_keeps_stdin():
+    cmd = tmpfs.wrap_command(["cat"])
+    cmd[2] = cmd[2].replace("mkdir -p " + tmpfs.MOUNT_POINT, "true", 1)
+    assert subprocess.run(cmd, input=b"input",
+                          stdout=subprocess.PIPE).stdout == b"input"
+
+
+def test_failed_copy_keeps_destination(tmp_path):
+    src = os.path.join(str(tmp_path), "src")
+    dst = os.path.join(str(tmp_path), "dst")
+    os.makedirs(src)
+    os.makedirs(os.path.join(dst, "old"))
+    bin_dir = os.path.join(str(tmp_path), "bin")
+    os.makedirs(bin_dir)
+    with open(os.path.join(bin_dir, "cp"), "w") as f:
+        f.write("#!/bin/sh\nexit 1\n")
+    os.chmod(os.path.join(bin_dir, "cp"), 0o755)
+    env = dict(os.environ, PATH=bin_dir + ":" + os.environ["PATH"])
+    subprocess.call(["sh", "-c", "\n".join(
+        tmpfs.copy_commands([(src, dst)]))], env=env)
+    assert os.listdir(dst) == ["old"]
+
+
+def test_log_copy_commands(tmp_path):
+    tmp_vardir = os.path.join(str(tmp_path), "tmpfs", "var")
+    vardir = os.path.join(str(tmp_path), "var")
+    for log in ["log", "1/log", "2/log"]:
+        os.makedirs(os.path.join(tmp_vardir, log))
+        open(os.path.join(tmp_vardir, log, "mysqld.err"), "w").close()
+    os.makedirs(os.path.join(tmp_vardir, "1", "data"))
+    assert subprocess.call(["sh", "-c", "\n".join(
+        tmpfs.log_copy_commands(tmp_vardir, vardir))]) == 0
+    assert sorted(os.listdir(vardir)) == ["1", "2", "log"]
+    assert os.listdir(os.path.join(vardir, "1")) == ["log"]
+    assert os.listdir(os.path.join(vardir, "2", "log")) == ["mysqld.err"]
+
+
+def test_wrap_command_copies_back_when_stopped(tmp_path):
+    src = os.path.join(str(tmp_path), "src")
+    dst = os.path.join(str(tmp_path), "dst")
+    cmd = tmpfs.wrap_command(["sh", "-c", "mkdir -p $0 && echo $$ > $0/pid "
+                              "&& exec sleep 30", src],
+                             copy_back=[(src, dst)])
+    cmd[2] = cmd[2].replace("mkdir -p " + tmpfs.MOUNT_POINT, "true", 1)
+    # Only the wrapper gets the signal, like the main process of a
+    # container on docker stop
+    wrapper = subprocess.Popen(cmd)
+    pid_file = os.path.join(src, "pid")
+    while not os.path.isfile(pid_file) or not os.path.getsize(pid_file):
+        time.sleep(0.05)
+    wrapper.send_signal(signal.SIGTERM)
+    assert wrapper.wait(timeout=10) == 128 + signal.SIGTERM
+    with open(os.path.join(dst, "pid")) as f:
+        assert not os.path.exists("/proc/" + f.read().strip())
@@ -0,0 +1,37 @@
+from context import mbt
+from mbt import warm_containers
+
+assert mbt
+
+
+def test_container_name():
+    assert (warm_containers.container_name("foo", "5.7", "bionic-debug") ==
+            "mbt-build-foo-5.7-bionic-debug")
+
+
+def test_fingerprint_stable():
+    a = warm_containers.fingerprint("sha256:1", ["a:src", "b:build"],
+                                    {"CC": "gcc", "CXX": "g++"})
+    b = warm_containers.fingerprint("sha256:1", ["b:build", "a:src"],
+                                    {"CXX": "g++", "CC": "gcc"})
+    assert a == b
+
+
+def test_fingerprint_changes():
+    base = warm_containers.fingerprint("sha256:1", ["a:src"], {"CC": "gcc"})
+    assert base != warm_containers.fingerprint("sha256:2", ["a:src"],
+                                               {"CC": "gcc"})
+    assert base != warm_containers.fingerprint("sha256:1", ["a:src"],
+                                               {"CC": "clang"})
+
+
+def test_idle_loop_timeout():
+    script = warm_containers.idle_loop(600)
+    assert "-ge 600 ]" in script
+    assert "${f##*/}" in script
+
+
+def test_wrap_command():
+    cmd = warm_containers.wrap_command(["make", "-j8"])
+    assert cmd[:2] == ["sh", "-c"]
+    assert cmd[-2:] == ["make", "-j8"]
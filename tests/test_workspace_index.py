@@ -0,0 +1,109 @@
+import os
+
+from context import mbt
+from mbt.mbt_configurator import MbtConfigurator
+from mbt.workspace_index import WorkspaceIndex, entry_path
+
+assert mbt
+
+
+def sample_config():
+    conf = MbtConfigurator()
+    conf.add_series("5.7")
+    conf.add_series("8.0")
+    conf.add_build_config("debug-gcc", "image")
+    return conf
+
+
+def make_dirs(root, *paths):
+    for p in paths:
+        os.makedirs(os.path.join(root, p))
+
+
+def test_entry_path():
+    assert entry_path("foo", "5.7") == "topics/foo/5.7"
+    assert entry_path("foo", "5.7", "debug") == "topics/foo/5.7-debug"
+    assert (entry_path("foo", "5.7", "debug", "a") ==
+            "topics/foo/5.7-debug-inst-a")
+
+
+def test_update_keeps_other_fields(tmp_path):
+    with WorkspaceIndex(str(tmp_path)) as index:
+        index.update("build", "foo", "5.7", "debug-gcc",
+                     state="configured", cmake_hash="abc")
+        index.update("build", "foo", "5.7", "debug-gcc",
+                     state="built", last_build=1000.0)
+        rows = index.query()
+    assert len(rows) == 1
+    assert rows[0]["state"] == "built"
+    assert rows[0]["cmake_hash"] == "abc"
+    assert rows[0]["last_build"] == 1000.0
+
+
+def test_persistent(tmp_path):
+    with WorkspaceIndex(str(tmp_path)) as index:
+        index.update("checkout", "foo", "5.7", state="created")
+    with WorkspaceIndex(str(tmp_path)) as index:
+        assert [r["path"] for r in index.query()] == ["topics/foo/5.7"]
+
+
+def test_query_filters(tmp_path):
+    with WorkspaceIndex(str(tmp_path)) as index:
+        index.update("checkout", "foo", "5.7")
+        index.update("build", "foo", "5.7", "debug-gcc")
+        index.update("build", "bar", "8.0", "debug-gcc")
+        assert len(index.query(kind="build")) == 2
+        assert len(index.query(topic="foo")) == 2
+        assert len(index.query(kind="build", series="8.0")) == 1
+
+
+def test_rescan_and_prune(tmp_path):
+    root = str(tmp_path)
+    make_dirs(root,
+              "topics/foo/5.7",
+              "topics/foo/5.7-debug-gcc",
+              "topics/foo/5.7-debug-gcc-inst-a",
+              "topics/foo/5.7-unknown",
+              "topics/foo/notes")
+    with open(os.path.join(root, "topics/foo/5.7-debug-gcc/x.o"), "w") as f:
+        f.write("x" * 10000)
+
+    with WorkspaceIndex(root) as index:
+        index.update("build", "gone", "5.7", "debug-gcc")
+        index.rescan(sample_config())
+        rows = {r["path"]: r for r in index.query()}
+
+    assert sorted(rows) == ["topics/foo/5.7",
+                            "topics/foo/5.7-debug-gcc",
+                            "topics/foo/5.7-debug-gcc-inst-a"]
+    assert rows["topics/foo/5.7-debug-gcc-inst-a"]["kind"] == "installation"
+    assert rows["topics/foo/5.7-debug-gcc-inst-a"]["installation"] == "a"
+    assert rows["topics/foo/5.7-debug-gcc"]["size"] >= 10000
+
+
+def test_used_ports(tmp_path):
+    root = str(tmp_path)
+    make_dirs(root, "topics/foo/5.7-debug-gcc-inst-a/etc",
+              "topics/foo/5.7-debug-gcc-inst-b")
+    with open(os.path.join(root, "topics/foo/5.7-debug-gcc-inst-a/etc/"
+                           "my.cnf"), "w") as f:
+        f.write("[mysqld]\nport=10003\n")
+    with WorkspaceIndex(root) as index:
+        index.update("installation", "foo", "8.0", "debug-gcc", "c",
+                     port=10001)
+        index.rescan(sample_config())
+        assert index.used_ports() == {10003}
+        index.update("installation", "foo", "5.7", "debug-gcc", "b",
+                     port=10001)
+        assert index.used_ports() == {10001, 10003}
+
+
+def test_reserve_port(tmp_path):
+    root = str(tmp_path)
+    with WorkspaceIndex(root) as index, WorkspaceIndex(root) as other:
+        first = index.reserve_port("foo", "5.7", "debug-gcc", "a",
+                                   lambda taken: min({1, 2} - taken))
+        second = other.reserve_port("foo", "5.7", "debug-gcc", "b",
+                                    lambda taken: min({1, 2} - taken))
+        assert (first, second) == (1, 2)
+        assert index.query(kind="installation")[0]["port"] == 1
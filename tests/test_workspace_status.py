@@ -0,0 +1,102 @@
+import os
+import subprocess
+
+from context import mbt
+from mbt.mbt_configurator import MbtConfigurator
+from mbt import workspace_status as ws
+
+assert mbt
+
+
+def sample_config():
+    conf = MbtConfigurator()
+    conf.add_series("5.7")
+    conf.add_series("8.0")
+    return conf
+
+
+def run_git(cwd, *args):
+    subprocess.check_call(["git", "-c", "user.name=t", "-c",
+                           "user.email=t@t"] + list(args),
+                          cwd=cwd, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL)
+
+
+def make_workspace(root):
+    master = os.path.join(root, "master")
+    os.makedirs(master)
+    run_git(master, "init", "-q")
+    run_git(master, "commit", "-q", "--allow-empty", "-m", "base")
+    run_git(master, "branch", "5.7")
+    run_git(master, "worktree", "add", "../versions/5.7", "5.7")
+    run_git(master, "worktree", "add", "../topics/foo/5.7",
+            "-b", "ps-5.7-foo", "5.7")
+    topic = os.path.join(root, "topics", "foo", "5.7")
+    with open(os.path.join(topic, "a.cc"), "w") as f:
+        f.write("int a;\n")
+    run_git(topic, "add", "a.cc")
+    run_git(topic, "commit", "-q", "-m", "topic change")
+    return topic
+
+
+def test_find_worktrees(tmp_path):
+    root = str(tmp_path)
+    make_workspace(root)
+    assert ws.find_worktrees(sample_config(), root) == [
+        ("versions/5.7", None, "5.7"),
+        ("topics/foo/5.7", "foo", "5.7")]
+
+
+def test_worktree_status(tmp_path):
+    root = str(tmp_path)
+    topic = make_workspace(root)
+    with open(os.path.join(topic, "a.cc"), "w") as f:
+        f.write("int b;\n")
+
+    st = ws.worktree_status(root, "topics/foo/5.7", "foo", "5.7")
+    assert st["branch"] == "ps-5.7-foo"
+    assert st["dirty"] == 1
+    assert st["series_diff"] == (1, 0)
+    assert st["remote_diff"] is None
+    assert st["head"] == subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=topic,
+            universal_newlines=True).strip()
+    assert st["source_changed"] >= os.stat(os.path.join(topic,
+                                                        "a.cc")).st_mtime
+
+
+def test_series_worktree_status(tmp_path):
+    root = str(tmp_path)
+    make_workspace(root)
+    st = ws.worktree_status(root, "versions/5.7", None, "5.7")
+    assert st["branch"] == "5.7"
+    assert st["dirty"] == 0
+    assert st["series_diff"] is None
+    assert st["source_changed"] is None
+
+
+def test_build_freshness():
+    assert ws.build_freshness(None, None, "a", "a", None) == "not built"
+    assert ws.build_freshness("build-failed", 200, "a", "a",
+                              None) == "build-failed"
+    assert ws.build_freshness("built", 200, "a", "a", None) == "up to date"
+    assert ws.build_freshness("built", 200, "a", "a", 100) == "up to date"
+    assert ws.build_freshness("built", 50, "a", "a", 100) == "outdated"
+    # e.g. an older commit checked out after the build
+    assert ws.build_freshness("built", 200, "b", "a", None) == "outdated"
+    assert ws.build_freshness("built", 200, None, "a", None) == "up to date"
+
+
+def test_format_diff():
+    assert ws.format_diff(None) == "-"
+    assert ws.format_diff((2, 3)) == "+2/-3"
+
+
+def test_print_table(capsys):
+    from mbt.mbt import print_table
+    print_table([["BUILD", "STATE"], ["topics/foo/8.0-debug", ""],
+                 ["x", "built"]])
+    assert capsys.readouterr().out.splitlines() == [
+        "BUILD                 STATE",
+        "topics/foo/8.0-debug",
+        "x                     built"]